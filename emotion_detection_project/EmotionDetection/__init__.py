@@ -3,6 +3,19 @@ __version__ = "1.0.0"
 
 # Import the main functions to make them available at package level
 from .emotion_detector import emotion_detector, emotion_predictor
+from .emotion_detector import EmotionDetectionError
+from .batch import emotion_detector_batch, iter_emotion_detector_batch
+from .async_detector import async_emotion_detector, async_emotion_predictor
+from .document import (
+    document_emotion_detector, async_document_emotion_detector
+)
+from .incremental import incremental_emotion_detector
 
 # Make functions available when importing the package
-__all__ = ['emotion_detector', 'emotion_predictor']
+__all__ = [
+    'emotion_detector', 'emotion_predictor', 'EmotionDetectionError',
+    'emotion_detector_batch', 'iter_emotion_detector_batch',
+    'async_emotion_detector', 'async_emotion_predictor',
+    'document_emotion_detector', 'async_document_emotion_detector',
+    'incremental_emotion_detector'
+]
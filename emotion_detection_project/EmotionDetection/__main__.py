@@ -0,0 +1,9 @@
+# __main__.py
+# Entry point for: python -m EmotionDetection
+
+import sys
+
+from .cli import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+# async_detector.py
+# Asyncio counterpart of emotion_detector built on aiohttp
+
+import asyncio
+import time
+
+import aiohttp
+
+from . import cache
+from . import capture
+from . import config
+from . import metrics
+from . import micro_batch
+from . import normalize
+from . import single_flight
+from . import tracing
+from .emotion_detector import (
+    EmotionDetectionError, empty_result, format_prediction, parse_response
+)
+from .backends import fallback_result, get_backend
+
+# aiohttp sessions are bound to the event loop that created them
+_session = None
+_session_loop = None
+
+
+async def get_async_session():
+    """
+    Returns the shared aiohttp session for the running event loop.
+
+    Returns:
+        aiohttp.ClientSession: Session with a pooled, keep-alive connector
+    """
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=config.ASYNC_POOL_LIMIT,
+            limit_per_host=config.ASYNC_POOL_LIMIT_PER_HOST,
+            force_close=not config.KEEP_ALIVE
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=config.REQUEST_TIMEOUT)
+        )
+        _session_loop = loop
+    return _session
+
+
+async def close_async_session():
+    """Closes the shared aiohttp session, e.g. from an app cleanup hook."""
+    global _session, _session_loop
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
+
+
+async def async_request_emotions(text_to_analyze, timeout=None):
+    """
+    Calls the Watson NLP API without blocking the event loop.
+
+    Args:
+        text_to_analyze (str): Non-blank text to analyze
+        timeout (float): Seconds to wait (default: the session's
+                         config.REQUEST_TIMEOUT)
+
+    Returns:
+        dict: Emotion scores and dominant emotion
+
+    Raises:
+        EmotionDetectionError: If the API is unavailable or fails
+    """
+    headers = {
+        'grpc-metadata-mm-model-id': config.WATSON_MODEL_ID,
+        'Content-Type': 'application/json'
+    }
+    request_id = tracing.current_request_id()
+    if request_id is not None:
+        headers[config.TRACE_REQUEST_ID_HEADER] = request_id
+    myobj = {
+        'raw_document': {
+            'text': text_to_analyze
+        }
+    }
+
+    extra = {}
+    if timeout is not None:
+        extra['timeout'] = aiohttp.ClientTimeout(total=timeout)
+
+    metrics.UPSTREAM_REQUESTS_IN_FLIGHT.inc()
+    started_at = time.time()
+    start = time.perf_counter()
+    status_code = error = None
+    try:
+        session = await get_async_session()
+        with tracing.span('upstream'):
+            async with session.post(config.WATSON_URL, json=myobj,
+                                    headers=headers,
+                                    **extra) as response:
+                body = await response.text()
+                status_code = response.status
+    except asyncio.TimeoutError as e:
+        error = 'timeout'
+        metrics.UPSTREAM_ERRORS.inc('timeout')
+        raise EmotionDetectionError(f"API connection failed: {e}",
+                                    kind='timeout') from e
+    except aiohttp.ClientError as e:
+        error = 'connection'
+        metrics.UPSTREAM_ERRORS.inc('connection')
+        raise EmotionDetectionError(f"API connection failed: {e}",
+                                    kind='connection') from e
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.UPSTREAM_REQUESTS_IN_FLIGHT.dec()
+        metrics.UPSTREAM_REQUEST_DURATION.observe(elapsed)
+        if config.CAPTURE_PATH:
+            if status_code is not None:
+                capture.record(text_to_analyze, started_at, elapsed,
+                               status_code, body)
+            elif error is not None:
+                capture.record(text_to_analyze, started_at, elapsed,
+                               error=error)
+
+    with tracing.span('parse'):
+        return parse_response(status_code, body)
+
+
+async def async_detect_emotions(text_to_analyze, count=True):
+    """
+    Returns emotions for a text from the configured backend.
+
+    Results are served from the result cache when enabled, and concurrent
+    misses for the same text share one backend call.
+
+    Args:
+        text_to_analyze (str): Non-blank text to analyze
+        count (bool): Count the result in emotion_results_total; callers
+                      combining several results count theirs instead
+
+    Returns:
+        dict: Emotion scores and dominant emotion
+
+    Raises:
+        EmotionDetectionError: If the backend fails
+    """
+    backend = get_backend()
+    # Variants of a text share one canonical form, analyzed once and
+    # keyed by its fingerprint
+    canonical = normalize.canonicalize(text_to_analyze)
+    key = backend.result_key(canonical.fingerprint)
+    tracing.add_fingerprint(canonical.fingerprint)
+    result_cache = cache.get_cache()
+    if result_cache is not None:
+        with tracing.span('cache'):
+            result = result_cache.get(key)
+        if result is not None:
+            if count:
+                metrics.RESULTS.inc(result['dominant_emotion'])
+            return result
+
+    async def load():
+        result = await micro_batch.detect_async(backend, canonical.text)
+        if result_cache is not None:
+            result_cache.set(key, result)
+        return result
+
+    try:
+        if not config.SINGLE_FLIGHT_ENABLED:
+            result = await load()
+        else:
+            result = dict(await single_flight.get_async_group().do(key, load))
+    except EmotionDetectionError as e:
+        result = fallback_result(backend, e, canonical.text)
+        if result is None:
+            raise
+    if count:
+        metrics.RESULTS.inc(result['dominant_emotion'])
+    return result
+
+
+async def async_emotion_detector(text_to_analyze, shed_load=False):
+    """
+    Detects emotions in the given text using Watson NLP, asynchronously.
+
+    Args:
+        text_to_analyze (str): Text to analyze for emotions
+        shed_load (bool): Raise RateLimitedError when the upstream rate
+                          limit sheds the call, instead of returning
+                          None values
+
+    Returns:
+        dict: Dictionary containing emotion scores and dominant emotion,
+              or None values if input is invalid or API fails
+    """
+    # Input validation - check for blank or None text
+    if not text_to_analyze or text_to_analyze.strip() == "":
+        return empty_result()
+
+    try:
+        return await async_detect_emotions(text_to_analyze)
+    except EmotionDetectionError as e:
+        if shed_load and e.kind == 'rate_limited':
+            raise
+        print(e)
+        return empty_result()
+
+
+async def async_emotion_predictor(text_to_analyze, shed_load=False):
+    """
+    Asynchronous counterpart of emotion_predictor.
+
+    Args:
+        text_to_analyze (str): Text to analyze for emotions
+        shed_load (bool): Raise RateLimitedError when the upstream rate
+                          limit sheds the call, instead of returning
+                          None values
+
+    Returns:
+        str: Formatted string with emotion analysis results
+    """
+    result = await async_emotion_detector(text_to_analyze, shed_load)
+    with tracing.span('format'):
+        return format_prediction(result)
@@ -0,0 +1,253 @@
+# backends.py
+# Pluggable scoring backends behind emotion_detector
+#
+# 'watson' calls the remote Watson NLP API (the default); 'local' scores
+# text in-process with the built-in lexicon, with no network at all.
+# config.BACKEND selects the backend used by emotion_detector.
+
+from . import config
+from . import lexicon
+from . import rate_limit
+from . import tracing
+from .circuit_breaker import get_breaker
+from .emotion_detector import (
+    EMOTIONS, EmotionDetectionError, build_result, request_emotions
+)
+from .retry import call_with_retry, call_with_retry_async
+
+_JOY = EMOTIONS.index('joy')
+_SADNESS = EMOTIONS.index('sadness')
+
+
+class EmotionBackend:
+    """
+    Interface shared by the scoring backends.
+
+    detect() returns the standard result dictionary or raises
+    EmotionDetectionError; it is only called with non-blank text.
+    model_id identifies the model, so equal text and model_id give equal
+    results. Backends whose detect_many scores a batch in one pass set
+    supports_batching, so concurrent texts are micro-batched for them
+    (see micro_batch.py).
+    """
+
+    name = None
+    supports_batching = False
+
+    @property
+    def model_id(self):
+        raise NotImplementedError
+
+    def result_key(self, fingerprint):
+        """
+        Key of a text's result, shared by the caches and the ETags.
+
+        It is scoped by model_id, so a new model or lexicon version never
+        serves results cached (possibly on disk) for the previous one.
+
+        Args:
+            fingerprint (str): Canonical text fingerprint (normalize.py)
+
+        Returns:
+            str: Cache key
+        """
+        return f"{self.model_id}:{fingerprint}"
+
+    def detect(self, text_to_analyze):
+        raise NotImplementedError
+
+    def detect_many(self, texts):
+        """
+        Scores several texts; backends override this when they can batch.
+
+        Args:
+            texts (list): Non-blank texts to analyze
+
+        Returns:
+            list: One result dictionary or EmotionDetectionError per text
+        """
+        results = []
+        for text in texts:
+            try:
+                results.append(self.detect(text))
+            except EmotionDetectionError as e:
+                results.append(e)
+        return results
+
+    async def detect_async(self, text_to_analyze):
+        """Asynchronous detect; CPU-only backends simply run inline."""
+        return self.detect(text_to_analyze)
+
+    async def detect_many_async(self, texts):
+        """Asynchronous detect_many; CPU-only backends simply run inline."""
+        return self.detect_many(texts)
+
+
+class WatsonBackend(EmotionBackend):
+    """
+    Scores text with the remote Watson NLP EmotionPredict API.
+
+    Transient failures are retried with jittered backoff (see retry.py).
+    Every attempt first waits for the upstream rate limit (when enabled),
+    then goes through the shared circuit breaker (when enabled), so a
+    degraded upstream fails fast with CircuitOpenError. Neither shed nor
+    rejected calls are retried.
+    """
+
+    name = 'watson'
+
+    @property
+    def model_id(self):
+        return config.WATSON_MODEL_ID
+
+    def detect(self, text_to_analyze):
+        return call_with_retry(self._attempt, text_to_analyze)
+
+    def _attempt(self, text_to_analyze, timeout):
+        rate_limit.acquire(timeout)
+        if not config.BREAKER_ENABLED:
+            return request_emotions(text_to_analyze, timeout)
+        return get_breaker().call(request_emotions, text_to_analyze, timeout)
+
+    async def detect_async(self, text_to_analyze):
+        return await call_with_retry_async(self._attempt_async,
+                                           text_to_analyze)
+
+    async def _attempt_async(self, text_to_analyze, timeout):
+        # Imported here so the sync path does not need aiohttp loaded
+        from .async_detector import async_request_emotions
+        await rate_limit.acquire_async(timeout)
+        if not config.BREAKER_ENABLED:
+            return await async_request_emotions(text_to_analyze, timeout)
+        return await get_breaker().call_async(async_request_emotions,
+                                              text_to_analyze, timeout)
+
+
+class LocalBackend(EmotionBackend):
+    """
+    Offline, CPU-only lexicon scorer.
+
+    Each lexicon word adds its weights to the five emotions; after a
+    negation ("not happy") joy counts as sadness and the rest is damped.
+    Scores are normalised to sum
+    to 1, so they stay in the same 0-1 range Watson uses.
+    """
+
+    name = 'local'
+    supports_batching = True
+
+    @property
+    def model_id(self):
+        return f'local-lexicon-{lexicon.VERSION}'
+
+    def scores(self, text_to_analyze):
+        """
+        Computes raw per-emotion scores for a text.
+
+        Args:
+            text_to_analyze (str): Text to analyze
+
+        Returns:
+            dict: Score per emotion, summing to 1
+        """
+        totals = [lexicon.PRIOR[emotion] for emotion in EMOTIONS]
+        word_weights = lexicon.WORD_WEIGHTS
+        negated = 0
+
+        for token in lexicon.tokenize(text_to_analyze):
+            if token in lexicon.NEGATIONS:
+                negated = lexicon.NEGATION_WINDOW
+                continue
+            weights = word_weights.get(token)
+            if weights is None:
+                weights = word_weights.get(lexicon.stem(token))
+            if weights is not None:
+                if negated:
+                    for index, weight in enumerate(weights):
+                        totals[index] += weight * lexicon.NEGATION_WEIGHT
+                    totals[_SADNESS] += weights[_JOY] * (1 - lexicon.NEGATION_WEIGHT)
+                    totals[_JOY] -= weights[_JOY] * lexicon.NEGATION_WEIGHT
+                else:
+                    for index, weight in enumerate(weights):
+                        totals[index] += weight
+            if negated:
+                negated -= 1
+
+        total = sum(totals)
+        return {emotion: round(score / total, 6)
+                for emotion, score in zip(EMOTIONS, totals)}
+
+    def detect(self, text_to_analyze):
+        with tracing.span('score'):
+            return build_result(self.scores(text_to_analyze))
+
+    def detect_many(self, texts):
+        """
+        Scores a batch in one vectorized pass with the NumPy bulk scorer.
+
+        Scores agree with detect to float32 precision, i.e. they may
+        differ in the sixth decimal.
+
+        Args:
+            texts (list): Non-blank texts to analyze
+
+        Returns:
+            list: One result dictionary per text
+        """
+        with tracing.span('score'):
+            if len(texts) == 1:
+                # A single text is faster on the plain path
+                return [build_result(self.scores(texts[0]))]
+            # Imported here so NumPy is only loaded once batching is used
+            from .bulk import rows_to_results, score_texts
+            return list(rows_to_results(*score_texts(texts)))
+
+
+def fallback_result(backend, error, text_to_analyze):
+    """
+    Returns a fallback result when the circuit is open, if configured.
+
+    With config.BREAKER_FALLBACK = 'local', texts that cannot reach Watson
+    because the circuit is open are scored by the local engine instead.
+    Fallback results are never cached.
+
+    Args:
+        backend (EmotionBackend): Backend that failed
+        error (EmotionDetectionError): The failure
+        text_to_analyze (str): Text being analyzed
+
+    Returns:
+        dict: Local result, or None if no fallback applies
+    """
+    if (error.kind == 'circuit_open' and backend.name != 'local'
+            and config.BREAKER_FALLBACK == 'local'):
+        return get_backend('local').detect(text_to_analyze)
+    return None
+
+
+_BACKENDS = {
+    'watson': WatsonBackend,
+    'local': LocalBackend,
+}
+_instances = {}
+
+
+def get_backend(name=None):
+    """
+    Returns the backend selected by name or by config.BACKEND.
+
+    Args:
+        name (str): Backend name, 'watson' or 'local'
+
+    Returns:
+        EmotionBackend: Shared backend instance
+    """
+    if name is None:
+        name = config.BACKEND
+    name = name.lower()
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown emotion backend: {name}")
+    backend = _instances.get(name)
+    if backend is None:
+        backend = _instances.setdefault(name, _BACKENDS[name]())
+    return backend
@@ -0,0 +1,83 @@
+# batch.py
+# Concurrent batch scoring on top of the single-text detector
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config
+from .emotion_detector import (
+    EmotionDetectionError, detect_emotions, empty_result
+)
+
+
+def score_text(text):
+    """
+    Scores one text and records any failure in an 'error' key.
+
+    Args:
+        text (str): Text to analyze
+
+    Returns:
+        dict: Standard result dictionary plus 'error' (None on success)
+    """
+    if not text or not isinstance(text, str) or text.strip() == "":
+        result = empty_result()
+        result['error'] = "Blank text"
+        return result
+
+    try:
+        result = detect_emotions(text)
+        result['error'] = None
+    except EmotionDetectionError as e:
+        result = empty_result()
+        result['error'] = str(e)
+    return result
+
+
+def iter_emotion_detector_batch(texts, max_workers=None):
+    """
+    Scores texts concurrently and yields results in input order.
+
+    At most 2 * max_workers texts are in flight or buffered at once, so
+    arbitrarily long iterables are processed in constant memory.
+
+    Args:
+        texts (iterable): Texts to analyze
+        max_workers (int): Concurrency limit (default config.BATCH_MAX_WORKERS)
+
+    Yields:
+        dict: Result for each text, in the same order as `texts`
+    """
+    if max_workers is None:
+        max_workers = config.BATCH_MAX_WORKERS
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+
+    window = max_workers * 2
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for text in texts:
+            pending.append(executor.submit(score_text, text))
+            # Keep the queue bounded by waiting on the oldest text first
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def emotion_detector_batch(texts, max_workers=None):
+    """
+    Detects emotions for many texts using a bounded thread pool.
+
+    Args:
+        texts (iterable): Texts to analyze
+        max_workers (int): Concurrency limit (default config.BATCH_MAX_WORKERS)
+
+    Returns:
+        list: One result dictionary per text, in input order. Each has the
+              usual emotion keys plus 'error', which holds the failure
+              message for that text or None on success. Texts shed by
+              the upstream rate limit fail alone, like any other error,
+              so one busy moment does not discard the rest of the batch.
+    """
+    return list(iter_emotion_detector_batch(texts, max_workers=max_workers))
@@ -0,0 +1,168 @@
+# bulk.py
+# Vectorized in-process bulk scorer built on NumPy
+#
+# Scores a whole batch with the built-in lexicon in a handful of array
+# operations instead of building one dict per text. The result matches
+# LocalBackend to float32 precision.
+
+import numpy as np
+
+from . import lexicon
+from .emotion_detector import EMOTIONS, empty_result
+
+# Vocabulary: row i of WEIGHTS holds the emotion weights of word i.
+# Words are kept as bytes because the batch is tokenized as bytes.
+_VOCAB = {word.encode('ascii'): index
+          for index, word in enumerate(lexicon.WORD_WEIGHTS)}
+WEIGHTS = np.array(list(lexicon.WORD_WEIGHTS.values()), dtype=np.float32)
+PRIOR = np.array([lexicon.PRIOR[emotion] for emotion in EMOTIONS],
+                 dtype=np.float32)
+
+# Special token ids; lexicon words have ids >= 0
+_UNKNOWN = -1
+_NEGATION = -2
+_SEPARATOR = -3
+
+# Maps negated weights the same way LocalBackend does: joy moves to
+# sadness and every other emotion is damped by NEGATION_WEIGHT
+_NEGATION_MATRIX = np.diag(
+    [lexicon.NEGATION_WEIGHT] * len(EMOTIONS)).astype(np.float32)
+_NEGATION_MATRIX[EMOTIONS.index('joy'), EMOTIONS.index('joy')] = 0.0
+_NEGATION_MATRIX[EMOTIONS.index('joy'), EMOTIONS.index('sadness')] = (
+    1 - lexicon.NEGATION_WEIGHT)
+
+# Byte table that blanks everything except [a-z'] and the \x00 batch
+# separator, so bytes.split() yields the same tokens as lexicon.tokenize
+_TOKEN_BYTES = b"abcdefghijklmnopqrstuvwxyz'\x00"
+_TOKEN_TABLE = bytes(byte if byte in _TOKEN_BYTES else ord(' ')
+                     for byte in range(256))
+_NEGATIONS = frozenset(word.encode('ascii') for word in lexicon.NEGATIONS)
+
+# Memoized token -> id lookups, including stemmed fallbacks
+_token_ids = {}
+_TOKEN_IDS_MAX = 200000
+
+
+def _token_id(token):
+    """Resolves a token to its vocabulary id and memoizes it."""
+    if token == b'\x00':
+        index = _SEPARATOR
+    elif token in _NEGATIONS:
+        index = _NEGATION
+    else:
+        index = _VOCAB.get(token)
+        if index is None:
+            root = lexicon.stem(token.decode('ascii')).encode('ascii')
+            index = _VOCAB.get(root, _UNKNOWN)
+    _token_ids[token] = index
+    return index
+
+
+def score_texts(texts):
+    """
+    Scores a batch of texts with the built-in lexicon.
+
+    Equivalent to multiplying the batch's sparse document-term matrix by
+    the (vocabulary x 5) weight table, without materializing the matrix.
+
+    Args:
+        texts (list): Texts to analyze
+
+    Returns:
+        tuple: (scores, dominant) where scores is a C-contiguous float32
+               array of shape (N, 5) in EMOTIONS order, and dominant is an
+               int array of argmax indices. Blank texts get NaN scores and
+               a dominant index of -1.
+    """
+    texts = list(texts)
+    count = len(texts)
+    scores = np.empty((count, len(EMOTIONS)), dtype=np.float32)
+    dominant = np.full(count, -1, dtype=np.intp)
+    if count == 0:
+        return scores, dominant
+
+    # Tokenize the whole batch in one pass; \x00 marks text boundaries
+    joined = ' \x00 '.join(
+        (text or '').replace('\x00', ' ') for text in texts).lower()
+    tokens = joined.encode('utf-8').translate(_TOKEN_TABLE).split()
+    # Keep the memo bounded on corpora with huge vocabularies
+    if len(_token_ids) >= _TOKEN_IDS_MAX:
+        _token_ids.clear()
+    for token in set(tokens).difference(_token_ids):
+        _token_id(token)
+    ids = np.fromiter(map(_token_ids.__getitem__, tokens),
+                      dtype=np.intp, count=len(tokens))
+
+    # Document index of every token
+    is_separator = ids == _SEPARATOR
+    doc = np.cumsum(is_separator)
+
+    # A token is negated if a negation in the same text precedes it by at
+    # most NEGATION_WINDOW tokens
+    positions = np.arange(len(ids))
+    last_negation = np.maximum.accumulate(
+        np.where(ids == _NEGATION, positions, -1))
+    distance = positions - last_negation
+    negated = ((last_negation >= 0) & (distance <= lexicon.NEGATION_WINDOW)
+               & (doc[np.maximum(last_negation, 0)] == doc))
+
+    # Gather weights of lexicon words and apply negation
+    is_word = ids >= 0
+    rows = WEIGHTS[ids[is_word]]
+    word_negated = negated[is_word]
+    if word_negated.any():
+        rows[word_negated] = rows[word_negated] @ _NEGATION_MATRIX
+    word_doc = doc[is_word]
+
+    # Sum per text, one bincount per emotion column
+    totals = np.empty_like(scores)
+    for column in range(len(EMOTIONS)):
+        totals[:, column] = np.bincount(
+            word_doc, weights=rows[:, column], minlength=count)
+    totals += PRIOR
+    np.divide(totals, totals.sum(axis=1, keepdims=True), out=scores)
+    dominant[:] = scores.argmax(axis=1)
+
+    # Blank texts have no result, as with emotion_detector
+    blank = np.fromiter((not text or text.strip() == "" for text in texts),
+                        dtype=bool, count=count)
+    if blank.any():
+        scores[blank] = np.nan
+        dominant[blank] = -1
+
+    return scores, dominant
+
+
+def row_to_result(scores, dominant, index):
+    """
+    Converts one row of score_texts output to the emotion_detector dict.
+
+    Args:
+        scores (numpy.ndarray): Score matrix from score_texts
+        dominant (numpy.ndarray): Dominant index array from score_texts
+        index (int): Row to convert
+
+    Returns:
+        dict: Emotion scores and dominant emotion
+    """
+    if dominant[index] < 0:
+        return empty_result()
+    result = {emotion: round(float(score), 6)
+              for emotion, score in zip(EMOTIONS, scores[index])}
+    result['dominant_emotion'] = EMOTIONS[dominant[index]]
+    return result
+
+
+def rows_to_results(scores, dominant):
+    """
+    Lazily converts every row of score_texts output to result dicts.
+
+    Args:
+        scores (numpy.ndarray): Score matrix from score_texts
+        dominant (numpy.ndarray): Dominant index array from score_texts
+
+    Yields:
+        dict: Emotion scores and dominant emotion per text
+    """
+    for index in range(len(dominant)):
+        yield row_to_result(scores, dominant, index)
@@ -0,0 +1,534 @@
+# cache.py
+# Bounded LRU/TTL caches for emotion detection results
+#
+# Two backends share the CacheBackend interface: MemoryCache (per process)
+# and SQLiteCache (on disk, shared by every worker process on the host and
+# kept across restarts). config.CACHE_BACKEND selects which one is used.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from . import config
+from . import normalize
+
+
+def normalize_key(text_to_analyze):
+    """
+    Returns the canonical form of a text (see normalize.normalize_text).
+
+    Leading/trailing whitespace is dropped and inner runs of whitespace
+    are collapsed, so trivially different inputs share one entry. The
+    detectors key the cache on the fingerprint of this text.
+
+    Args:
+        text_to_analyze (str): Text to analyze
+
+    Returns:
+        str: Canonical text
+    """
+    return normalize.normalize_text(text_to_analyze)
+
+
+class CacheBackend:
+    """
+    Interface shared by the result cache backends.
+
+    get() returns a copy of the cached result or None, and set() ignores
+    failed results, so callers never see or store the None dictionary.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, result):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+def _is_cacheable(result):
+    """Returns True for successful results only."""
+    return result is not None and result.get('dominant_emotion') is not None
+
+
+class MemoryCache(CacheBackend):
+    """
+    Thread-safe in-process cache with LRU eviction and a TTL.
+
+    Args:
+        max_size (int): Maximum number of entries kept
+        ttl (float): Seconds an entry stays valid, 0 or None for no expiry
+    """
+
+    def __init__(self, max_size=1024, ttl=3600):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """
+        Looks up a result.
+
+        Args:
+            key (str): Backend name and text fingerprint
+
+        Returns:
+            dict: Copy of the cached result, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, result = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            # Mark as most recently used
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def set(self, key, result, expires_in=None):
+        """
+        Stores a successful result, evicting the least recently used entry.
+
+        Failed results (dominant_emotion None) are never stored.
+
+        Args:
+            key (str): Backend name and text fingerprint
+            result (dict): Result dictionary to cache
+            expires_in (float): Seconds the result has left, if less than
+                                the TTL (e.g. when copied from disk)
+        """
+        if not _is_cacheable(result):
+            return
+        ttl = self.ttl
+        if expires_in is not None:
+            ttl = min(ttl, expires_in) if ttl else expires_in
+            if ttl <= 0:
+                return
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Removes every entry and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: size, max_size, hits, misses, evictions and expirations
+        """
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+class SQLiteCache(CacheBackend):
+    """
+    On-disk cache in a SQLite database running in WAL mode.
+
+    WAL lets several processes on one host read while one writes, so all
+    workers share a single cache that also survives restarts. Entries are
+    evicted least recently used first once max_size is exceeded.
+
+    Args:
+        path (str): Database file path
+        max_size (int): Maximum number of entries kept on disk
+        ttl (float): Seconds an entry stays valid, 0 or None for no expiry
+        evict_every (int): Check the size bound every N writes
+    """
+
+    def __init__(self, path, max_size=100000, ttl=3600, evict_every=64):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evict_every = evict_every
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS results_accessed_at"
+            " ON results (accessed_at)"
+        )
+
+    def _connection(self):
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name):
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key):
+        """
+        Looks up a result.
+
+        Args:
+            key (str): Backend name and text fingerprint
+
+        Returns:
+            dict: Cached result, or None on a miss
+        """
+        return self.get_entry(key)[0]
+
+    def get_entry(self, key):
+        """
+        Looks up a result and when it expires.
+
+        Args:
+            key (str): Backend name and text fingerprint
+
+        Returns:
+            tuple: (result, expires_at as Unix time or None), or
+                   (None, None) on a miss
+        """
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT value, expires_at FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self._count('misses')
+            return None, None
+
+        now = time.time()
+        value, expires_at = row
+        if expires_at is not None and expires_at <= now:
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            self._count('expirations')
+            self._count('misses')
+            return None, None
+
+        conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?",
+                     (now, key))
+        self._count('hits')
+        return json.loads(value), expires_at
+
+    def touch(self, accessed):
+        """
+        Records uses of entries served from elsewhere (a memory tier).
+
+        Args:
+            accessed (dict): key -> Unix time the entry was last used
+        """
+        self._connection().executemany(
+            "UPDATE results SET accessed_at = MAX(accessed_at, ?)"
+            " WHERE key = ?",
+            [(when, key) for key, when in accessed.items()])
+
+    def set(self, key, result):
+        """
+        Stores a successful result; failed results are never stored.
+
+        Args:
+            key (str): Backend name and text fingerprint
+            result (dict): Result dictionary to cache
+        """
+        if not _is_cacheable(result):
+            return
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO results"
+            " (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(result), expires_at, now)
+        )
+
+        with self._counter_lock:
+            self._writes += 1
+            check = self._writes % self.evict_every == 0
+        if check:
+            self.evict()
+
+    def evict(self):
+        """Drops expired entries, then the least recently used overflow."""
+        conn = self._connection()
+        expired = conn.execute(
+            "DELETE FROM results WHERE expires_at IS NOT NULL"
+            " AND expires_at <= ?", (time.time(),)
+        ).rowcount
+        size = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        overflow = size - self.max_size
+        evicted = 0
+        if overflow > 0:
+            evicted = conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                " SELECT key FROM results ORDER BY accessed_at LIMIT ?)",
+                (overflow,)
+            ).rowcount
+        with self._counter_lock:
+            self.expirations += expired
+            self.evictions += evicted
+
+    def most_recent(self, limit):
+        """
+        Returns the most recently used unexpired entries.
+
+        Args:
+            limit (int): Maximum number of entries
+
+        Returns:
+            list: (key, result, expires_at) tuples, least recently used
+                  first; expires_at is Unix time or None
+        """
+        rows = self._connection().execute(
+            "SELECT key, value, expires_at FROM results"
+            " WHERE expires_at IS NULL OR expires_at > ?"
+            " ORDER BY accessed_at DESC LIMIT ?", (time.time(), limit)
+        ).fetchall()
+        return [(key, json.loads(value), expires_at)
+                for key, value, expires_at in reversed(rows)]
+
+    def clear(self):
+        """Removes every entry and resets the counters."""
+        self._connection().execute("DELETE FROM results")
+        with self._counter_lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+
+    def __len__(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def stats(self):
+        """
+        Returns the cache counters for this process.
+
+        Returns:
+            dict: size, max_size, hits, misses, evictions and expirations
+        """
+        size = len(self)
+        with self._counter_lock:
+            return {
+                'backend': 'sqlite',
+                'size': size,
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def close(self):
+        """Closes this thread's connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class TieredCache(CacheBackend):
+    """
+    Memory cache in front of a shared on-disk cache.
+
+    Hits are served from memory; misses fall through to disk and are
+    promoted with the time the disk entry has left, so an entry never
+    outlives its TTL. Writes go to both levels. Memory hits are recorded
+    on disk in batches, so the hottest entries are the last evicted and
+    the first warm-started.
+
+    Args:
+        memory (MemoryCache): Per-process first level
+        disk (SQLiteCache): Shared second level
+        touch_every (int): Record memory hits on disk after this many keys
+        touch_interval (float): ... or after this many seconds
+    """
+
+    def __init__(self, memory, disk, touch_every=64, touch_interval=1.0):
+        self.memory = memory
+        self.disk = disk
+        self.touch_every = touch_every
+        self.touch_interval = touch_interval
+        self._touched = {}
+        self._touched_since = time.monotonic()
+        self._touch_lock = threading.Lock()
+
+    def get(self, key):
+        result = self.memory.get(key)
+        if result is not None:
+            self._touch(key)
+            return result
+        result, expires_at = self.disk.get_entry(key)
+        if result is not None:
+            self.memory.set(key, result, _remaining(expires_at))
+        return result
+
+    def _touch(self, key):
+        """Queues a memory hit, writing the queue to disk when due."""
+        with self._touch_lock:
+            self._touched[key] = time.time()
+            if (len(self._touched) < self.touch_every
+                    and time.monotonic() - self._touched_since
+                    < self.touch_interval):
+                return
+            touched, self._touched = self._touched, {}
+            self._touched_since = time.monotonic()
+        self.disk.touch(touched)
+
+    def flush(self):
+        """Writes queued memory hits to disk now."""
+        with self._touch_lock:
+            touched, self._touched = self._touched, {}
+            self._touched_since = time.monotonic()
+        if touched:
+            self.disk.touch(touched)
+
+    def set(self, key, result):
+        self.memory.set(key, result)
+        self.disk.set(key, result)
+
+    def warm_start(self, limit=None):
+        """
+        Loads the most recently used disk entries into memory.
+
+        Args:
+            limit (int): Entries to load (default: the memory cache size)
+
+        Returns:
+            int: Number of entries loaded
+        """
+        if limit is None:
+            limit = self.memory.max_size
+        entries = self.disk.most_recent(limit)
+        for key, result, expires_at in entries:
+            self.memory.set(key, result, _remaining(expires_at))
+        return len(entries)
+
+    def clear(self):
+        with self._touch_lock:
+            self._touched = {}
+        self.memory.clear()
+        self.disk.clear()
+
+    def stats(self):
+        return {
+            'backend': 'sqlite',
+            'memory': self.memory.stats(),
+            'disk': self.disk.stats()
+        }
+
+
+def _remaining(expires_at):
+    """Seconds until a disk entry's expires_at, or None if it never does."""
+    return None if expires_at is None else expires_at - time.time()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def create_cache():
+    """
+    Builds the cache backend selected by config.CACHE_BACKEND.
+
+    'memory' gives a per-process MemoryCache. 'sqlite' gives a MemoryCache
+    in front of a SQLiteCache at config.CACHE_PATH, warm-started from disk
+    when config.CACHE_WARM_START is set.
+
+    Returns:
+        CacheBackend: New cache instance
+    """
+    memory = MemoryCache(max_size=config.CACHE_MAX_SIZE, ttl=config.CACHE_TTL)
+    backend = config.CACHE_BACKEND.lower()
+    if backend == 'memory':
+        return memory
+    if backend == 'sqlite':
+        disk = SQLiteCache(config.CACHE_PATH,
+                           max_size=config.CACHE_DISK_MAX_SIZE,
+                           ttl=config.CACHE_TTL)
+        cache = TieredCache(memory, disk)
+        if config.CACHE_WARM_START:
+            cache.warm_start()
+        return cache
+    raise ValueError(f"Unknown cache backend: {config.CACHE_BACKEND}")
+
+
+def get_cache():
+    """
+    Returns the process-wide result cache, or None if caching is disabled.
+
+    Returns:
+        CacheBackend: Shared cache built from config
+    """
+    global _cache
+    if not config.CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = create_cache()
+    return _cache
+
+
+def clear_cache():
+    """Empties the shared cache and resets its counters."""
+    if _cache is not None:
+        _cache.clear()
@@ -0,0 +1,146 @@
+# capture.py
+# Capture of upstream traffic for deterministic offline replay
+#
+# With EMOTION_CAPTURE_PATH set, every Watson call is appended to that file
+# as one compact JSON line: when it started, how long it took, the text
+# sent and the status and body received (or the kind of failure).
+# benchmarks/replay.py serves a capture back from a local stand-in with
+# the original latencies and re-sends its requests at the original pace,
+# or faster, to reproduce production load offline.
+#
+# Record keys: t = start (Unix time), d = duration (s), q = request text,
+# s = status code, r = response body, e = failure kind ('timeout' or
+# 'connection') when no response arrived.
+#
+# Each record is written with a single O_APPEND write, so worker processes
+# sharing one file never interleave their records.
+
+import json
+import logging
+import os
+import random
+import threading
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+
+class Recorder:
+    """
+    Appends capture records to a file, safely across threads and forks.
+
+    Args:
+        path (str): Capture file, created if missing
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        """
+        Appends one record.
+
+        Args:
+            record (dict): Record with the short keys described above
+        """
+        line = json.dumps(record, ensure_ascii=False,
+                          separators=(',', ':')) + '\n'
+        data = line.encode('utf-8')
+        with self._lock:
+            # A forked worker must not share its parent's descriptor
+            if self._fd is None or self._pid != os.getpid():
+                self._fd = os.open(self.path,
+                                   os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                                   0o600)
+                self._pid = os.getpid()
+            os.write(self._fd, data)
+
+    def close(self):
+        """Closes the capture file."""
+        with self._lock:
+            if self._fd is not None and self._pid == os.getpid():
+                os.close(self._fd)
+            self._fd = None
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    """
+    Returns the Recorder for config.CAPTURE_PATH, or None when capture is
+    off.
+
+    Returns:
+        Recorder: Process-wide recorder, or None
+    """
+    global _recorder
+    path = config.CAPTURE_PATH
+    if not path:
+        return None
+    recorder = _recorder
+    if recorder is None or recorder.path != path:
+        with _recorder_lock:
+            if _recorder is None or _recorder.path != path:
+                if _recorder is not None:
+                    _recorder.close()
+                _recorder = Recorder(path)
+            recorder = _recorder
+    return recorder
+
+
+def record(text, start, duration, status_code=None, body=None, error=None):
+    """
+    Captures one upstream call, if capture is on and the call is sampled.
+
+    Args:
+        text (str): Text sent upstream
+        start (float): Unix time the call started
+        duration (float): Seconds the call took
+        status_code (int): Response status, if a response arrived
+        body (str): Response body, if a response arrived
+        error (str): Failure kind when no response arrived
+    """
+    recorder = get_recorder()
+    if recorder is None:
+        return
+    rate = config.CAPTURE_SAMPLE_RATE
+    if rate < 1 and random.random() >= rate:
+        return
+
+    entry = {'t': round(start, 6), 'd': round(duration, 6), 'q': text}
+    if status_code is not None:
+        entry['s'] = status_code
+        entry['r'] = body
+    if error is not None:
+        entry['e'] = error
+    try:
+        recorder.write(entry)
+    except OSError as e:
+        # Capture is a diagnostic aid; it must never fail the analysis
+        logger.warning("Could not write capture record: %s", e)
+
+
+def read_capture(path):
+    """
+    Reads a capture file.
+
+    A final record cut short (e.g. by a crash mid-write) is skipped.
+
+    Args:
+        path (str): Capture file
+
+    Yields:
+        dict: Records in file order
+    """
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,259 @@
+# circuit_breaker.py
+# Circuit breaker that fails fast while the Watson upstream is degraded
+
+import threading
+import time
+
+from . import config
+from .emotion_detector import EmotionDetectionError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(EmotionDetectionError):
+    """Raised instead of calling the upstream while the circuit is open."""
+
+    def __init__(self, message):
+        super().__init__(message, kind='circuit_open')
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker.
+
+    Closed: calls pass through; consecutive upstream failures are counted.
+    Open: after failure_threshold failures, calls fail instantly for
+    reset_timeout seconds. Half-open: then up to half_open_max_calls trial
+    calls go through; a success closes the circuit, a failure reopens it.
+    Invalid-input errors (400) never count as failures, and a call that
+    ends without an outcome (e.g. cancelled) gives its trial slot back.
+
+    Args:
+        failure_threshold (int): Consecutive failures that open the circuit
+        reset_timeout (float): Seconds to stay open before a trial call
+        half_open_max_calls (int): Concurrent trial calls when half-open
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30,
+                 half_open_max_calls=1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_calls = 0
+        # Bumped on each move to half-open, so a slot reserved in an
+        # earlier half-open period is never released into a later one
+        self._trial_period = 0
+        self.total_failures = 0
+        self.total_successes = 0
+        self.rejected = 0
+        self.times_opened = 0
+        self.last_error = None
+
+    @property
+    def state(self):
+        """Current state, moving from open to half-open once cooled down."""
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self):
+        # Caller holds the lock
+        if (self._state == OPEN
+                and time.monotonic() - self._opened_at >= self.reset_timeout):
+            self._state = HALF_OPEN
+            self._trial_calls = 0
+            self._trial_period += 1
+
+    def _open(self):
+        # Caller holds the lock
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def allow(self):
+        """
+        Reserves permission to call the upstream.
+
+        Returns:
+            bool: True if the call may proceed, False to fail fast
+        """
+        return self._admit() is not None
+
+    def _admit(self):
+        """
+        Reserves permission to call the upstream.
+
+        Returns:
+            int: None to fail fast, 0 for a closed-circuit call, or the
+                 half-open period of a trial call, for release()
+        """
+        with self._lock:
+            self._refresh()
+            if self._state == CLOSED:
+                return 0
+            if (self._state == HALF_OPEN
+                    and self._trial_calls < self.half_open_max_calls):
+                self._trial_calls += 1
+                return self._trial_period
+            self.rejected += 1
+            return None
+
+    def release(self, ticket):
+        """
+        Gives back a trial slot whose call ended without an outcome.
+
+        Args:
+            ticket (int): Value returned by _admit() for the call
+        """
+        with self._lock:
+            if (ticket and self._state == HALF_OPEN
+                    and ticket == self._trial_period
+                    and self._trial_calls > 0):
+                self._trial_calls -= 1
+
+    def record_success(self):
+        """Records a successful upstream call."""
+        with self._lock:
+            self.total_successes += 1
+            self._failures = 0
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._trial_calls = 0
+
+    def record_failure(self, error=None):
+        """
+        Records a failed upstream call.
+
+        Args:
+            error (Exception): The failure, kept for the status endpoint
+        """
+        with self._lock:
+            self.total_failures += 1
+            self.last_error = str(error) if error is not None else None
+            if self._state == HALF_OPEN:
+                self._open()
+                return
+            self._failures += 1
+            if self._state == CLOSED and self._failures >= self.failure_threshold:
+                self._open()
+
+    def _record(self, error):
+        """Records the outcome of a call given its exception, if any."""
+        if error is None:
+            self.record_success()
+        elif isinstance(error, EmotionDetectionError) and not error.is_upstream_failure:
+            # The upstream answered; the input was the problem
+            self.record_success()
+        else:
+            self.record_failure(error)
+
+    def _reject(self):
+        raise CircuitOpenError(
+            "Circuit open: Watson API is unavailable, failing fast")
+
+    def call(self, fn, *args):
+        """
+        Calls fn(*args) through the breaker.
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        ticket = self._admit()
+        if ticket is None:
+            self._reject()
+        try:
+            result = fn(*args)
+        except Exception as e:
+            self._record(e)
+            raise
+        except BaseException:
+            # Interrupted, not failed: no outcome to record
+            self.release(ticket)
+            raise
+        self._record(None)
+        return result
+
+    async def call_async(self, fn, *args):
+        """Awaits fn(*args) through the breaker."""
+        ticket = self._admit()
+        if ticket is None:
+            self._reject()
+        try:
+            result = await fn(*args)
+        except Exception as e:
+            self._record(e)
+            raise
+        except BaseException:
+            # Cancelled, e.g. by a superseding live update: no outcome
+            self.release(ticket)
+            raise
+        self._record(None)
+        return result
+
+    def reset(self):
+        """Closes the circuit and clears all counters."""
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._opened_at = None
+            self._trial_calls = 0
+            self.total_failures = 0
+            self.total_successes = 0
+            self.rejected = 0
+            self.times_opened = 0
+            self.last_error = None
+
+    def stats(self):
+        """
+        Returns the breaker state for the status endpoint.
+
+        Returns:
+            dict: state, thresholds and counters
+        """
+        with self._lock:
+            self._refresh()
+            retry_in = None
+            if self._state == OPEN:
+                retry_in = max(0.0, self.reset_timeout
+                               - (time.monotonic() - self._opened_at))
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'retry_in': retry_in,
+                'total_failures': self.total_failures,
+                'total_successes': self.total_successes,
+                'rejected': self.rejected,
+                'times_opened': self.times_opened,
+                'last_error': self.last_error
+            }
+
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+
+def get_breaker():
+    """
+    Returns the process-wide breaker guarding the Watson upstream.
+
+    Returns:
+        CircuitBreaker: Shared breaker built from config
+    """
+    global _breaker
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(
+                    failure_threshold=config.BREAKER_FAILURE_THRESHOLD,
+                    reset_timeout=config.BREAKER_RESET_TIMEOUT,
+                    half_open_max_calls=config.BREAKER_HALF_OPEN_MAX_CALLS
+                )
+    return _breaker
@@ -0,0 +1,249 @@
+# cli.py
+# Command-line scorer for JSONL/CSV files of any size
+#
+# Usage:
+#     python -m EmotionDetection tickets.jsonl -o scored.jsonl
+#     cat reviews.csv | python -m EmotionDetection - --format csv > out.csv
+#     python -m EmotionDetection big.jsonl -o out.jsonl --checkpoint out.ckpt
+
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import deque
+
+from . import config
+from .batch import iter_emotion_detector_batch
+
+RESULT_FIELDS = ['anger', 'disgust', 'fear', 'joy', 'sadness',
+                 'dominant_emotion', 'error']
+
+
+class InvalidRecord(dict):
+    """
+    JSONL line that is not a JSON object, written out with its error.
+
+    Args:
+        line_number (int): 1-based line number in the input
+        line (str): The line as read
+        error (str): Why it could not be used
+    """
+
+    def __init__(self, line_number, line, error):
+        super().__init__(line=line_number, input=line.rstrip('\r\n'))
+        self.error = error
+
+
+def read_records(stream, fmt):
+    """
+    Lazily reads records from a JSONL or CSV stream.
+
+    A JSONL line that is malformed or not an object becomes an
+    InvalidRecord, so one bad line does not abort a long run.
+
+    Args:
+        stream (file): Text stream to read
+        fmt (str): 'jsonl' or 'csv'
+
+    Yields:
+        dict: One record per line/row
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield InvalidRecord(line_number, line, f"Invalid JSON: {e}")
+            continue
+        if not isinstance(record, dict):
+            yield InvalidRecord(line_number, line,
+                                "Record is not a JSON object")
+            continue
+        yield record
+
+
+class RecordWriter:
+    """Writes scored records incrementally as JSONL or CSV."""
+
+    def __init__(self, stream, fmt, write_header=True):
+        self.stream = stream
+        self.fmt = fmt
+        self.write_header = write_header
+        self._csv = None
+
+    def write(self, record, result):
+        """Write one record with its result fields appended."""
+        row = dict(record)
+        for field in RESULT_FIELDS:
+            row[field] = result.get(field)
+        if self.fmt == 'jsonl':
+            self.stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+            return
+        if self._csv is None:
+            self._csv = csv.DictWriter(self.stream, fieldnames=list(row),
+                                       extrasaction='ignore')
+            if self.write_header:
+                self._csv.writeheader()
+        self._csv.writerow(row)
+
+
+def load_checkpoint(path):
+    """
+    Reads a checkpoint file.
+
+    Returns:
+        dict: {'processed': records done, 'output_bytes': output size},
+              or None if there is no checkpoint yet
+    """
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, processed, output_bytes):
+    """Atomically records progress so a crashed run can resume."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'processed': processed, 'output_bytes': output_bytes}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def score_records(records, text_field, max_workers):
+    """
+    Scores records with bounded concurrency, preserving input order.
+
+    Only the records currently in flight are held in memory. An
+    InvalidRecord is not scored; its result carries its error.
+
+    Args:
+        records (iterable): Input records
+        text_field (str): Key holding the text to analyze
+        max_workers (int): Concurrency limit
+
+    Yields:
+        tuple: (record, result) in input order
+    """
+    pending = deque()
+
+    def texts():
+        for record in records:
+            pending.append(record)
+            # None keeps the record's place in order without scoring it
+            yield (None if isinstance(record, InvalidRecord)
+                   else record.get(text_field))
+
+    for result in iter_emotion_detector_batch(texts(), max_workers=max_workers):
+        record = pending.popleft()
+        if isinstance(record, InvalidRecord):
+            result['error'] = record.error
+        yield record, result
+
+
+def _detect_format(path, fmt):
+    """Picks the format from --format or the file extension."""
+    if fmt:
+        return fmt
+    if path and path.lower().endswith('.csv'):
+        return 'csv'
+    return 'jsonl'
+
+
+def build_parser():
+    """Builds the argument parser."""
+    parser = argparse.ArgumentParser(
+        prog='python -m EmotionDetection',
+        description="Score a JSONL or CSV file of texts for emotions."
+    )
+    parser.add_argument('input', help="input file, or - for stdin")
+    parser.add_argument('-o', '--output', default='-',
+                        help="output file, or - for stdout (default)")
+    parser.add_argument('--format', choices=['jsonl', 'csv'],
+                        help="input/output format (default: from extension)")
+    parser.add_argument('--text-field', default='text',
+                        help="field holding the text (default: text)")
+    parser.add_argument('--concurrency', type=int,
+                        default=config.BATCH_MAX_WORKERS,
+                        help="texts scored in parallel")
+    parser.add_argument('--backend', choices=['watson', 'local'],
+                        help="scoring backend (default: EMOTION_BACKEND)")
+    parser.add_argument('--checkpoint',
+                        help="checkpoint file for resumable runs")
+    parser.add_argument('--checkpoint-every', type=int, default=1000,
+                        help="records between checkpoints (default: 1000)")
+    return parser
+
+
+def main(argv=None):
+    """
+    Runs the command-line scorer.
+
+    Returns:
+        int: Process exit code
+    """
+    args = build_parser().parse_args(argv)
+    fmt = _detect_format(args.input if args.input != '-' else args.output,
+                         args.format)
+    if args.backend:
+        config.BACKEND = args.backend
+    if args.checkpoint and args.output == '-':
+        print("--checkpoint requires --output to be a file", file=sys.stderr)
+        return 2
+
+    # Resume: drop any partially written tail, then skip finished records
+    checkpoint = load_checkpoint(args.checkpoint)
+    skip = 0
+    if checkpoint is not None:
+        skip = checkpoint['processed']
+        with open(args.output, 'r+b') as f:
+            f.truncate(checkpoint['output_bytes'])
+
+    if args.input == '-':
+        in_stream = sys.stdin
+    else:
+        in_stream = open(args.input, encoding='utf-8', newline='')
+    if args.output == '-':
+        out_stream = sys.stdout
+    else:
+        out_stream = open(args.output, 'a' if checkpoint else 'w',
+                          encoding='utf-8', newline='')
+
+    try:
+        records = read_records(in_stream, fmt)
+        for _ in range(skip):
+            next(records, None)
+
+        writer = RecordWriter(out_stream, fmt,
+                              write_header=checkpoint is None)
+        processed = skip
+        invalid = 0
+        for record, result in score_records(records, args.text_field,
+                                            args.concurrency):
+            writer.write(record, result)
+            processed += 1
+            if isinstance(record, InvalidRecord):
+                invalid += 1
+            if args.checkpoint and processed % args.checkpoint_every == 0:
+                out_stream.flush()
+                os.fsync(out_stream.fileno())
+                save_checkpoint(args.checkpoint, processed, out_stream.tell())
+
+        out_stream.flush()
+        if args.checkpoint:
+            save_checkpoint(args.checkpoint, processed, out_stream.tell())
+    finally:
+        if in_stream is not sys.stdin:
+            in_stream.close()
+        if out_stream is not sys.stdout:
+            out_stream.close()
+
+    print(f"Scored {processed - skip} records ({processed} total)"
+          + (f", {invalid} invalid" if invalid else ""), file=sys.stderr)
+    return 0
@@ -0,0 +1,186 @@
+# config.py
+# Runtime configuration for the EmotionDetection package
+#
+# Every setting can be overridden with an environment variable so the same
+# code runs unchanged locally, in tests and on Railway/Heroku. Modules read
+# these values at call time (config.NAME), so tests can patch them.
+
+import os
+
+
+def _env_str(name, default):
+    """Read a string setting from the environment."""
+    return os.environ.get(name, default)
+
+
+def _env_int(name, default):
+    """Read an integer setting from the environment."""
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return int(value)
+
+
+def _env_float(name, default):
+    """Read a float setting from the environment."""
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return float(value)
+
+
+def _env_bool(name, default):
+    """Read a boolean setting (1/true/yes/on) from the environment."""
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Watson NLP endpoint
+WATSON_URL = _env_str(
+    'EMOTION_WATSON_URL',
+    'https://sn-watson-emotion.labs.skills.network/v1/'
+    'watson.runtime.nlp.v1/NlpService/EmotionPredict'
+)
+WATSON_MODEL_ID = _env_str(
+    'EMOTION_WATSON_MODEL_ID',
+    'emotion_aggregated-workflow_lang_en_stock'
+)
+REQUEST_TIMEOUT = _env_float('EMOTION_REQUEST_TIMEOUT', 5)
+
+# HTTP connection pool (see http_pool.py)
+POOL_CONNECTIONS = _env_int('EMOTION_POOL_CONNECTIONS', 4)
+POOL_MAXSIZE = _env_int('EMOTION_POOL_MAXSIZE', 32)
+POOL_BLOCK = _env_bool('EMOTION_POOL_BLOCK', False)
+KEEP_ALIVE = _env_bool('EMOTION_KEEP_ALIVE', True)
+
+# Batch scoring (see batch.py)
+BATCH_MAX_WORKERS = _env_int('EMOTION_BATCH_MAX_WORKERS', 8)
+
+# Asyncio client pool (see async_detector.py)
+ASYNC_POOL_LIMIT = _env_int('EMOTION_ASYNC_POOL_LIMIT', 1000)
+ASYNC_POOL_LIMIT_PER_HOST = _env_int('EMOTION_ASYNC_POOL_LIMIT_PER_HOST', 0)
+
+# Result cache (see cache.py)
+CACHE_ENABLED = _env_bool('EMOTION_CACHE_ENABLED', True)
+CACHE_MAX_SIZE = _env_int('EMOTION_CACHE_MAX_SIZE', 1024)
+CACHE_TTL = _env_float('EMOTION_CACHE_TTL', 3600)
+# 'memory' (per process) or 'sqlite' (shared on-disk store behind memory)
+CACHE_BACKEND = _env_str('EMOTION_CACHE_BACKEND', 'memory')
+CACHE_PATH = _env_str('EMOTION_CACHE_PATH', 'emotion_cache.sqlite3')
+CACHE_DISK_MAX_SIZE = _env_int('EMOTION_CACHE_DISK_MAX_SIZE', 100000)
+CACHE_WARM_START = _env_bool('EMOTION_CACHE_WARM_START', True)
+
+# Request coalescing (see single_flight.py)
+SINGLE_FLIGHT_ENABLED = _env_bool('EMOTION_SINGLE_FLIGHT_ENABLED', True)
+
+# Scoring backend (see backends.py): 'watson' or 'local'
+BACKEND = _env_str('EMOTION_BACKEND', 'watson')
+
+# Circuit breaker for the Watson upstream (see circuit_breaker.py)
+BREAKER_ENABLED = _env_bool('EMOTION_BREAKER_ENABLED', True)
+BREAKER_FAILURE_THRESHOLD = _env_int('EMOTION_BREAKER_FAILURE_THRESHOLD', 5)
+BREAKER_RESET_TIMEOUT = _env_float('EMOTION_BREAKER_RESET_TIMEOUT', 30)
+BREAKER_HALF_OPEN_MAX_CALLS = _env_int('EMOTION_BREAKER_HALF_OPEN_MAX_CALLS', 1)
+# 'none' to fail fast, or 'local' to score with the local engine instead
+BREAKER_FALLBACK = _env_str('EMOTION_BREAKER_FALLBACK', 'none')
+
+# JSON API limits (see api.py)
+API_MAX_BATCH_TEXTS = _env_int('EMOTION_API_MAX_BATCH_TEXTS', 1000)
+API_MAX_CONTENT_LENGTH = _env_int('EMOTION_API_MAX_CONTENT_LENGTH', 1024 * 1024)
+
+# HTTP caching and compression of web responses (see http_cache.py)
+RESULT_CACHE_CONTROL = _env_str('EMOTION_RESULT_CACHE_CONTROL',
+                                'public, max-age=86400')
+COMPRESSION_ENABLED = _env_bool('EMOTION_COMPRESSION_ENABLED', True)
+COMPRESSION_MIN_SIZE = _env_int('EMOTION_COMPRESSION_MIN_SIZE', 512)
+COMPRESSION_GZIP_LEVEL = _env_int('EMOTION_COMPRESSION_GZIP_LEVEL', 6)
+COMPRESSION_BROTLI_QUALITY = _env_int('EMOTION_COMPRESSION_BROTLI_QUALITY', 5)
+
+# Request tracing (see tracing.py)
+TRACING_ENABLED = _env_bool('EMOTION_TRACING_ENABLED', True)
+TRACE_REQUEST_ID_HEADER = _env_str('EMOTION_TRACE_REQUEST_ID_HEADER',
+                                   'X-Request-ID')
+# Level the servers enable trace logs at (INFO writes one line per
+# request; WARNING or higher silences them)
+TRACE_LOG_LEVEL = _env_str('EMOTION_TRACE_LOG_LEVEL', 'INFO').upper()
+# Fraction of requests run under cProfile (0 disables the profiler hook)
+TRACE_PROFILE_SAMPLE_RATE = _env_float('EMOTION_TRACE_PROFILE_SAMPLE_RATE', 0.0)
+TRACE_PROFILE_SLOWEST = _env_int('EMOTION_TRACE_PROFILE_SLOWEST', 10)
+TRACE_PROFILE_DIR = _env_str('EMOTION_TRACE_PROFILE_DIR', 'profiles')
+
+# Upstream retries and hedged requests (see retry.py)
+RETRY_ENABLED = _env_bool('EMOTION_RETRY_ENABLED', True)
+RETRY_MAX_ATTEMPTS = _env_int('EMOTION_RETRY_MAX_ATTEMPTS', 3)
+RETRY_BASE_DELAY = _env_float('EMOTION_RETRY_BASE_DELAY', 0.05)
+RETRY_MAX_DELAY = _env_float('EMOTION_RETRY_MAX_DELAY', 1.0)
+# Total seconds for all attempts of one text, backoff included
+RETRY_DEADLINE = _env_float('EMOTION_RETRY_DEADLINE', 10)
+# Each call earns RATIO retry tokens, up to RESERVE; a retry or hedge
+# spends one, so extra load stays near RATIO of the traffic in an outage
+RETRY_BUDGET_RATIO = _env_float('EMOTION_RETRY_BUDGET_RATIO', 0.2)
+RETRY_BUDGET_RESERVE = _env_float('EMOTION_RETRY_BUDGET_RESERVE', 10)
+HEDGE_ENABLED = _env_bool('EMOTION_HEDGE_ENABLED', False)
+HEDGE_PERCENTILE = _env_float('EMOTION_HEDGE_PERCENTILE', 95)
+# Hedge delay used until HEDGE_MIN_SAMPLES latencies have been seen
+HEDGE_DEFAULT_DELAY = _env_float('EMOTION_HEDGE_DEFAULT_DELAY', 0.5)
+HEDGE_MIN_SAMPLES = _env_int('EMOTION_HEDGE_MIN_SAMPLES', 20)
+HEDGE_MAX_WORKERS = _env_int('EMOTION_HEDGE_MAX_WORKERS', 32)
+
+# Upstream rate limit and admission control (see rate_limit.py)
+RATE_LIMIT_ENABLED = _env_bool('EMOTION_RATE_LIMIT_ENABLED', False)
+# Watson calls per second and the burst allowed above that rate
+RATE_LIMIT_RATE = _env_float('EMOTION_RATE_LIMIT_RATE', 10.0)
+RATE_LIMIT_BURST = _env_float('EMOTION_RATE_LIMIT_BURST', 20)
+# Longest a call may queue for a token before it is shed
+RATE_LIMIT_MAX_WAIT = _env_float('EMOTION_RATE_LIMIT_MAX_WAIT', 1.0)
+# 'memory' (per process) or 'file' (shared by all processes on the host)
+RATE_LIMIT_BACKEND = _env_str('EMOTION_RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_PATH = _env_str('EMOTION_RATE_LIMIT_PATH', 'emotion_ratelimit.state')
+
+# Micro-batching of concurrent texts (see micro_batch.py); only used with
+# backends that score batches natively
+MICRO_BATCH_ENABLED = _env_bool('EMOTION_MICRO_BATCH_ENABLED', False)
+# A batch is dispatched at MAX_SIZE texts or MAX_WAIT seconds after its
+# first text arrived, whichever comes first
+MICRO_BATCH_MAX_SIZE = _env_int('EMOTION_MICRO_BATCH_MAX_SIZE', 32)
+MICRO_BATCH_MAX_WAIT = _env_float('EMOTION_MICRO_BATCH_MAX_WAIT', 0.002)
+
+# Text canonicalization (see normalize.py). Texts equal after these steps
+# are analyzed once and share cache entries and ETags.
+NORMALIZE_UNICODE = _env_bool('EMOTION_NORMALIZE_UNICODE', True)
+# 'preserve', 'lower' or 'casefold'; folding also changes the text sent
+# upstream, which Watson may score slightly differently
+NORMALIZE_CASE = _env_str('EMOTION_NORMALIZE_CASE', 'preserve').lower()
+NORMALIZE_TRAILING_PUNCTUATION = _env_bool(
+    'EMOTION_NORMALIZE_TRAILING_PUNCTUATION', False)
+# Fingerprint size: 64 bits for logs, 128 bits where collisions matter
+FINGERPRINT_BITS = _env_int('EMOTION_FINGERPRINT_BITS', 128)
+
+# Document mode for long texts (see document.py): chunks of at most
+# CHUNK_CHARS characters, MAX_WORKERS of them scored at once
+DOCUMENT_CHUNK_CHARS = _env_int('EMOTION_DOCUMENT_CHUNK_CHARS', 2000)
+DOCUMENT_MAX_WORKERS = _env_int('EMOTION_DOCUMENT_MAX_WORKERS', 4)
+
+# Incremental analysis of edited texts (see incremental.py): sentence
+# results kept for reuse across edits, with the result cache's TTL
+INCREMENTAL_CACHE_SIZE = _env_int('EMOTION_INCREMENTAL_CACHE_SIZE', 10000)
+
+# Live analysis over WebSocket (see live.py and server_async.py): updates
+# are analyzed once the client has paused for DEBOUNCE seconds
+LIVE_DEBOUNCE = _env_float('EMOTION_LIVE_DEBOUNCE', 0.25)
+LIVE_HEARTBEAT = _env_float('EMOTION_LIVE_HEARTBEAT', 30)
+LIVE_MAX_CONNECTIONS = _env_int('EMOTION_LIVE_MAX_CONNECTIONS', 10000)
+
+# Upstream traffic capture for offline replay (see capture.py and
+# benchmarks/replay.py). Off unless a path is set; captures contain the
+# analyzed texts, so treat the file like any other store of user data.
+CAPTURE_PATH = _env_str('EMOTION_CAPTURE_PATH', '')
+CAPTURE_SAMPLE_RATE = _env_float('EMOTION_CAPTURE_SAMPLE_RATE', 1.0)
+
+# Metrics shared by worker processes (see metrics.py): with a directory
+# set, each process saves its metrics there every FLUSH_INTERVAL seconds
+# and /metrics merges every process's file. gunicorn.conf.py sets it.
+METRICS_DIR = _env_str('EMOTION_METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = _env_float('EMOTION_METRICS_FLUSH_INTERVAL', 1.0)
@@ -0,0 +1,355 @@
+# document.py
+# Document mode: long texts are chunked, scored concurrently and aggregated
+#
+# Watson takes one raw_document per call, and long inputs (transcripts,
+# long reviews) are slow, time out or are rejected outright. Document mode
+# splits a text on paragraph, then sentence, then word boundaries into
+# chunks of at most DOCUMENT_CHUNK_CHARS characters, scores the chunks
+# concurrently through the usual detect pipeline (cache, coalescing,
+# retries, rate limit) and averages their scores weighted by chunk length.
+# Chunks that fail are left out of the average rather than failing the
+# document; only a document whose every chunk failed raises.
+
+import asyncio
+import contextvars
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config
+from . import metrics
+from . import tracing
+from .emotion_detector import (
+    EMOTIONS, EmotionDetectionError, build_result, detect_emotions,
+    empty_result
+)
+from .async_detector import async_detect_emotions
+
+# Boundaries tried in order when a span is too long for one chunk
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?…])\s+')
+_WORD_BREAK = re.compile(r'\s+')
+_BREAKS = (_PARAGRAPH_BREAK, _SENTENCE_BREAK, _WORD_BREAK)
+
+# A chunk is the span text[start:end] of the document
+Chunk = namedtuple('Chunk', ('start', 'end', 'text'))
+
+
+def _strip(text, start, end):
+    """Narrows text[start:end] to exclude surrounding whitespace."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _units(text, start, end, max_chars, breaks):
+    """Yields spans of at most max_chars, split at the coarsest boundary."""
+    if end - start <= max_chars:
+        yield start, end
+        return
+    if not breaks:
+        # A single word longer than a chunk is cut where it must be
+        for cut in range(start, end, max_chars):
+            yield cut, min(cut + max_chars, end)
+        return
+
+    for piece_start, piece_end in _pieces(text, start, end, breaks[0]):
+        yield from _units(text, piece_start, piece_end, max_chars,
+                          breaks[1:])
+
+
+def _pieces(text, start, end, pattern):
+    """Yields the non-blank spans of text[start:end] between matches."""
+    pieces = []
+    for match in pattern.finditer(text, start, end):
+        pieces.append((start, match.start()))
+        start = match.end()
+    pieces.append((start, end))
+    for piece_start, piece_end in pieces:
+        piece_start, piece_end = _strip(text, piece_start, piece_end)
+        if piece_start < piece_end:
+            yield piece_start, piece_end
+
+
+def split_chunks(text, max_chars=None):
+    """
+    Splits a text into chunks on paragraph and sentence boundaries.
+
+    Adjacent paragraphs and sentences are packed into one chunk while it
+    stays within max_chars. A paragraph too long for a chunk is split into
+    sentences, and a sentence too long for a chunk into words.
+
+    Args:
+        text (str): Text to split
+        max_chars (int): Maximum chunk length
+                         (default: config.DOCUMENT_CHUNK_CHARS)
+
+    Returns:
+        list: Chunk (start, end, text) named tuples in document order
+    """
+    if max_chars is None:
+        max_chars = config.DOCUMENT_CHUNK_CHARS
+    if max_chars < 1:
+        raise ValueError("max_chars must be at least 1")
+
+    start, end = _strip(text, 0, len(text))
+    spans = _pack(_units(text, start, end, max_chars, _BREAKS), max_chars)
+    return [Chunk(start, end, text[start:end]) for start, end in spans]
+
+
+def _pack(units, max_chars):
+    """Merges adjacent spans while the merged span fits in max_chars."""
+    spans = []
+    for unit_start, unit_end in units:
+        if spans and unit_end - spans[-1][0] <= max_chars:
+            spans[-1] = (spans[-1][0], unit_end)
+        else:
+            spans.append((unit_start, unit_end))
+    return spans
+
+
+def split_sentences(text, max_chars=None):
+    """
+    Splits a text into its sentences, without packing them.
+
+    Each sentence is one chunk, so an edit elsewhere in the text leaves
+    it unchanged. Sentences longer than max_chars are split as in
+    split_chunks.
+
+    Args:
+        text (str): Text to split
+        max_chars (int): Maximum chunk length
+                         (default: config.DOCUMENT_CHUNK_CHARS)
+
+    Returns:
+        list: Chunk (start, end, text) named tuples in document order
+    """
+    if max_chars is None:
+        max_chars = config.DOCUMENT_CHUNK_CHARS
+    if max_chars < 1:
+        raise ValueError("max_chars must be at least 1")
+
+    start, end = _strip(text, 0, len(text))
+    spans = []
+    for paragraph in _pieces(text, start, end, _PARAGRAPH_BREAK):
+        for sentence in _pieces(text, *paragraph, _SENTENCE_BREAK):
+            words = _units(text, *sentence, max_chars, (_WORD_BREAK,))
+            spans.extend(_pack(words, max_chars))
+    return [Chunk(start, end, text[start:end]) for start, end in spans]
+
+
+def aggregate(chunks, outcomes, include_chunks=False):
+    """
+    Combines per-chunk results into one document result.
+
+    Each emotion is the average of the successful chunks' scores,
+    weighted by chunk length.
+
+    Args:
+        chunks (list): Chunks from split_chunks
+        outcomes (list): Per chunk, a result dict or EmotionDetectionError
+        include_chunks (bool): Add the per-chunk breakdown under 'chunks'
+
+    Returns:
+        dict: Standard result dictionary plus 'coverage', the fraction of
+              the document's characters that were scored
+
+    Raises:
+        EmotionDetectionError: The first chunk's error, if every chunk
+                               failed
+    """
+    totals = dict.fromkeys(EMOTIONS, 0.0)
+    scored = 0
+    for chunk, outcome in zip(chunks, outcomes):
+        if isinstance(outcome, EmotionDetectionError):
+            continue
+        weight = len(chunk.text)
+        for emotion in EMOTIONS:
+            totals[emotion] += outcome[emotion] * weight
+        scored += weight
+    if not scored:
+        raise outcomes[0]
+
+    result = build_result({emotion: total / scored
+                           for emotion, total in totals.items()})
+    result['coverage'] = scored / sum(len(chunk.text) for chunk in chunks)
+    if include_chunks:
+        result['chunks'] = [_breakdown(chunk, outcome)
+                            for chunk, outcome in zip(chunks, outcomes)]
+    return result
+
+
+def _breakdown(chunk, outcome):
+    """Per-chunk entry of a document result."""
+    if isinstance(outcome, EmotionDetectionError):
+        entry = empty_result()
+        entry['error'] = str(outcome)
+    else:
+        entry = {key: outcome[key] for key in empty_result()}
+        entry['error'] = None
+    entry['start'] = chunk.start
+    entry['end'] = chunk.end
+    return entry
+
+
+def _score(text):
+    """Scores one chunk, returning its error instead of raising it."""
+    try:
+        # The document's combined result is counted, not each chunk's
+        return detect_emotions(text, count=False)
+    except EmotionDetectionError as e:
+        return e
+
+
+def score_texts(texts, max_workers=None):
+    """
+    Scores texts concurrently through detect_emotions.
+
+    The results are not counted in emotion_results_total; the caller
+    counts the result it builds from them.
+
+    Args:
+        texts (list): Non-blank texts to analyze
+        max_workers (int): Texts scored at once
+                           (default: config.DOCUMENT_MAX_WORKERS)
+
+    Returns:
+        list: Per text, a result dict or the EmotionDetectionError raised
+    """
+    if max_workers is None:
+        max_workers = config.DOCUMENT_MAX_WORKERS
+    with tracing.span('chunk_scoring'):
+        if len(texts) <= 1 or max_workers <= 1:
+            return [_score(text) for text in texts]
+        with ThreadPoolExecutor(
+                max_workers=min(max_workers, len(texts))) as executor:
+            # Each text runs in a copy of the caller's context, so its
+            # spans and fingerprint land in the request's trace
+            futures = [executor.submit(contextvars.copy_context().run,
+                                       _score, text)
+                       for text in texts]
+            return [future.result() for future in futures]
+
+
+def detect_document(text, include_chunks=False, max_chars=None,
+                    max_workers=None):
+    """
+    Returns emotions for a long text, scored chunk by chunk.
+
+    Args:
+        text (str): Non-blank text to analyze
+        include_chunks (bool): Add the per-chunk breakdown under 'chunks'
+        max_chars (int): Maximum chunk length
+                         (default: config.DOCUMENT_CHUNK_CHARS)
+        max_workers (int): Chunks scored at once
+                           (default: config.DOCUMENT_MAX_WORKERS)
+
+    Returns:
+        dict: Standard result dictionary plus 'coverage' (and 'chunks')
+
+    Raises:
+        EmotionDetectionError: If every chunk failed
+    """
+    chunks = split_chunks(text, max_chars)
+    outcomes = score_texts([chunk.text for chunk in chunks], max_workers)
+    result = aggregate(chunks, outcomes, include_chunks)
+    metrics.RESULTS.inc(result['dominant_emotion'])
+    return result
+
+
+async def async_detect_document(text, include_chunks=False, max_chars=None,
+                                max_workers=None):
+    """
+    Asynchronous counterpart of detect_document.
+
+    Args:
+        text (str): Non-blank text to analyze
+        include_chunks (bool): Add the per-chunk breakdown under 'chunks'
+        max_chars (int): Maximum chunk length
+                         (default: config.DOCUMENT_CHUNK_CHARS)
+        max_workers (int): Chunks scored at once
+                           (default: config.DOCUMENT_MAX_WORKERS)
+
+    Returns:
+        dict: Standard result dictionary plus 'coverage' (and 'chunks')
+
+    Raises:
+        EmotionDetectionError: If every chunk failed
+    """
+    if max_workers is None:
+        max_workers = config.DOCUMENT_MAX_WORKERS
+    chunks = split_chunks(text, max_chars)
+    limit = asyncio.Semaphore(max(1, max_workers))
+
+    async def score(chunk_text):
+        async with limit:
+            try:
+                return await async_detect_emotions(chunk_text, count=False)
+            except EmotionDetectionError as e:
+                return e
+
+    with tracing.span('chunk_scoring'):
+        outcomes = await asyncio.gather(
+            *(score(chunk.text) for chunk in chunks))
+    result = aggregate(chunks, outcomes, include_chunks)
+    metrics.RESULTS.inc(result['dominant_emotion'])
+    return result
+
+
+def document_emotion_detector(text_to_analyze, include_chunks=False,
+                              shed_load=False):
+    """
+    Detects emotions in a text of any length using document mode.
+
+    Args:
+        text_to_analyze (str): Text to analyze for emotions
+        include_chunks (bool): Add the per-chunk breakdown under 'chunks'
+        shed_load (bool): Raise RateLimitedError when the upstream rate
+                          limit shed every chunk, instead of returning
+                          None values
+
+    Returns:
+        dict: Emotion scores, dominant emotion and 'coverage', or None
+              values if input is invalid or every chunk failed
+    """
+    if not text_to_analyze or text_to_analyze.strip() == "":
+        return empty_result()
+
+    try:
+        return detect_document(text_to_analyze, include_chunks)
+    except EmotionDetectionError as e:
+        if shed_load and e.kind == 'rate_limited':
+            raise
+        print(e)
+        return empty_result()
+
+
+async def async_document_emotion_detector(text_to_analyze,
+                                          include_chunks=False,
+                                          shed_load=False):
+    """
+    Asynchronous counterpart of document_emotion_detector.
+
+    Args:
+        text_to_analyze (str): Text to analyze for emotions
+        include_chunks (bool): Add the per-chunk breakdown under 'chunks'
+        shed_load (bool): Raise RateLimitedError when the upstream rate
+                          limit shed every chunk, instead of returning
+                          None values
+
+    Returns:
+        dict: Emotion scores, dominant emotion and 'coverage', or None
+              values if input is invalid or every chunk failed
+    """
+    if not text_to_analyze or text_to_analyze.strip() == "":
+        return empty_result()
+
+    try:
+        return await async_detect_document(text_to_analyze, include_chunks)
+    except EmotionDetectionError as e:
+        if shed_load and e.kind == 'rate_limited':
+            raise
+        print(e)
+        return empty_result()
@@ -3,158 +3,323 @@
 
 import requests
 import json
+import time
 
-def emotion_detector(text_to_analyze):
+from . import cache
+from . import capture
+from . import config
+from . import http_pool
+from . import metrics
+from . import micro_batch
+from . import normalize
+from . import single_flight
+from . import tracing
+
+# The five emotions returned by the Watson emotion model
+EMOTIONS = ('anger', 'disgust', 'fear', 'joy', 'sadness')
+
+
+class EmotionDetectionError(Exception):
     """
-    Detects emotions in the given text using Watson NLP.
-    
+    Raised when emotions cannot be detected for a text.
+
     Args:
-        text_to_analyze (str): Text to analyze for emotions
-    
+        message (str): Human-readable description
+        kind (str): Failure category: 'connection', 'timeout', 'parse',
+                    'bad_request', 'server_error' or 'api_error'
+        status_code (int): HTTP status code, if a response was received
+    """
+
+    def __init__(self, message, kind=None, status_code=None):
+        super().__init__(message)
+        self.kind = kind
+        self.status_code = status_code
+
+    @property
+    def is_upstream_failure(self):
+        """True if the failure points at the upstream, not the input."""
+        return self.kind != 'bad_request'
+
+
+def empty_result():
+    """
+    Returns the result dictionary used for invalid input or API failures.
+
     Returns:
-        dict: Dictionary containing emotion scores and dominant emotion,
-              or None values if input is invalid or API fails
+        dict: Dictionary with every emotion and dominant_emotion set to None
     """
-    # Input validation - check for blank or None text
-    if not text_to_analyze or text_to_analyze.strip() == "":
-        return {
-            'anger': None,
-            'disgust': None,
-            'fear': None,
-            'joy': None,
-            'sadness': None,
-            'dominant_emotion': None
-        }
-    
-    # Watson NLP API URL and headers
-    url = 'https://sn-watson-emotion.labs.skills.network/v1/watson.runtime.nlp.v1/NlpService/EmotionPredict'
-    headers = {
-        'grpc-metadata-mm-model-id': 'emotion_aggregated-workflow_lang_en_stock',
-        'Content-Type': 'application/json'
+    return {
+        'anger': None,
+        'disgust': None,
+        'fear': None,
+        'joy': None,
+        'sadness': None,
+        'dominant_emotion': None
     }
-    
-    # Request payload
-    myobj = {
-        'raw_document': {
-            'text': text_to_analyze
-        }
+
+
+def build_result(emotion_scores):
+    """
+    Builds the standard result dictionary from raw emotion scores.
+
+    Args:
+        emotion_scores (dict): Mapping of each emotion to its score
+
+    Returns:
+        dict: Emotion scores plus the dominant emotion
+    """
+    # Get individual emotion scores
+    anger_score = emotion_scores['anger']
+    disgust_score = emotion_scores['disgust']
+    fear_score = emotion_scores['fear']
+    joy_score = emotion_scores['joy']
+    sadness_score = emotion_scores['sadness']
+
+    # Find the dominant emotion
+    emotion_scores = {
+        'anger': anger_score,
+        'disgust': disgust_score,
+        'fear': fear_score,
+        'joy': joy_score,
+        'sadness': sadness_score
     }
-    
-    # Make the API request
-    try:
-        response = requests.post(url, json=myobj, headers=headers, timeout=5)
-    except (requests.exceptions.RequestException, requests.exceptions.Timeout) as e:
-        # If API is unavailable, return None values
-        print(f"API connection failed: {e}")
-        return {
-            'anger': None,
-            'disgust': None,
-            'fear': None,
-            'joy': None,
-            'sadness': None,
-            'dominant_emotion': None
-        }
-    
+
+    dominant_emotion = max(emotion_scores, key=emotion_scores.get)
+
+    # Return formatted response
+    return {
+        'anger': anger_score,
+        'disgust': disgust_score,
+        'fear': fear_score,
+        'joy': joy_score,
+        'sadness': sadness_score,
+        'dominant_emotion': dominant_emotion
+    }
+
+
+def parse_response(status_code, text):
+    """
+    Turns a Watson EmotionPredict HTTP response into a result dictionary.
+
+    Args:
+        status_code (int): HTTP status code of the response
+        text (str): Raw response body
+
+    Returns:
+        dict: Emotion scores and dominant emotion
+
+    Raises:
+        EmotionDetectionError: If the status code or body signals a failure
+    """
     # Handle the response based on status code
-    if response.status_code == 200:
+    if status_code == 200:
+        metrics.UPSTREAM_RESPONSES.inc('200')
         # Successful response - parse the JSON
         try:
-            formatted_response = json.loads(response.text)
-            
+            formatted_response = json.loads(text)
+
             # Extract emotion scores
             emotions = formatted_response['emotionPredictions'][0]['emotion']
-            
-            # Get individual emotion scores
-            anger_score = emotions['anger']
-            disgust_score = emotions['disgust']
-            fear_score = emotions['fear']
-            joy_score = emotions['joy']
-            sadness_score = emotions['sadness']
-            
-            # Find the dominant emotion
-            emotion_scores = {
-                'anger': anger_score,
-                'disgust': disgust_score,
-                'fear': fear_score,
-                'joy': joy_score,
-                'sadness': sadness_score
-            }
-            
-            dominant_emotion = max(emotion_scores, key=emotion_scores.get)
-            
-            # Return formatted response
-            return {
-                'anger': anger_score,
-                'disgust': disgust_score,
-                'fear': fear_score,
-                'joy': joy_score,
-                'sadness': sadness_score,
-                'dominant_emotion': dominant_emotion
-            }
-        except (json.JSONDecodeError, KeyError) as e:
-            print(f"Error parsing response: {e}")
-            return {
-                'anger': None,
-                'disgust': None,
-                'fear': None,
-                'joy': None,
-                'sadness': None,
-                'dominant_emotion': None
-            }
-    
-    elif response.status_code == 400:
+            return build_result(emotions)
+        except (json.JSONDecodeError, KeyError, IndexError, TypeError) as e:
+            metrics.UPSTREAM_ERRORS.inc('parse')
+            raise EmotionDetectionError(f"Error parsing response: {e}",
+                                        kind='parse', status_code=200) from e
+
+    elif status_code == 400:
         # Bad Request - Invalid input (e.g., blank text, malformed request)
-        print(f"Bad Request (400): Invalid input provided to the API")
-        return {
-            'anger': None,
-            'disgust': None,
-            'fear': None,
-            'joy': None,
-            'sadness': None,
-            'dominant_emotion': None
-        }
-    
-    elif response.status_code == 500:
+        metrics.UPSTREAM_RESPONSES.inc('400')
+        raise EmotionDetectionError(
+            "Bad Request (400): Invalid input provided to the API",
+            kind='bad_request', status_code=400)
+
+    elif status_code == 500:
         # Internal Server Error
-        print(f"Internal Server Error (500): API server error")
-        return {
-            'anger': None,
-            'disgust': None,
-            'fear': None,
-            'joy': None,
-            'sadness': None,
-            'dominant_emotion': None
-        }
-    
+        metrics.UPSTREAM_RESPONSES.inc('500')
+        raise EmotionDetectionError(
+            "Internal Server Error (500): API server error",
+            kind='server_error', status_code=500)
+
     else:
         # Handle other error cases
-        print(f"API Error {response.status_code}: {response.text}")
-        return {
-            'anger': None,
-            'disgust': None,
-            'fear': None,
-            'joy': None,
-            'sadness': None,
-            'dominant_emotion': None
+        metrics.UPSTREAM_RESPONSES.inc('other')
+        raise EmotionDetectionError(f"API Error {status_code}: {text}",
+                                    kind='api_error', status_code=status_code)
+
+
+def request_emotions(text_to_analyze, timeout=None):
+    """
+    Calls the Watson NLP API and parses its response.
+
+    Unlike emotion_detector, failures are raised instead of being turned
+    into the None dictionary, so callers can see what went wrong.
+
+    Args:
+        text_to_analyze (str): Non-blank text to analyze
+        timeout (float): Seconds to wait (default: config.REQUEST_TIMEOUT)
+
+    Returns:
+        dict: Emotion scores and dominant emotion
+
+    Raises:
+        EmotionDetectionError: If the API is unavailable or fails
+    """
+    # Watson NLP API URL and headers
+    url = config.WATSON_URL
+    headers = {
+        'grpc-metadata-mm-model-id': config.WATSON_MODEL_ID,
+        'Content-Type': 'application/json'
+    }
+    # Lets upstream logs be matched to our request
+    request_id = tracing.current_request_id()
+    if request_id is not None:
+        headers[config.TRACE_REQUEST_ID_HEADER] = request_id
+
+    # Request payload
+    myobj = {
+        'raw_document': {
+            'text': text_to_analyze
         }
+    }
+
+    # Make the API request over the shared keep-alive session
+    metrics.UPSTREAM_REQUESTS_IN_FLIGHT.inc()
+    started_at = time.time()
+    start = time.perf_counter()
+    response = error = None
+    try:
+        session = http_pool.get_session()
+        with tracing.span('upstream'):
+            response = session.post(url, json=myobj, headers=headers,
+                                    timeout=(config.REQUEST_TIMEOUT
+                                             if timeout is None else timeout))
+    except requests.exceptions.Timeout as e:
+        error = 'timeout'
+        metrics.UPSTREAM_ERRORS.inc('timeout')
+        raise EmotionDetectionError(f"API connection failed: {e}",
+                                    kind='timeout') from e
+    except requests.exceptions.RequestException as e:
+        error = 'connection'
+        metrics.UPSTREAM_ERRORS.inc('connection')
+        raise EmotionDetectionError(f"API connection failed: {e}",
+                                    kind='connection') from e
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.UPSTREAM_REQUESTS_IN_FLIGHT.dec()
+        metrics.UPSTREAM_REQUEST_DURATION.observe(elapsed)
+        if config.CAPTURE_PATH:
+            if response is not None:
+                capture.record(text_to_analyze, started_at, elapsed,
+                               response.status_code, response.text)
+            elif error is not None:
+                capture.record(text_to_analyze, started_at, elapsed,
+                               error=error)
+
+    with tracing.span('parse'):
+        return parse_response(response.status_code, response.text)
+
 
-def emotion_predictor(text_to_analyze):
+def detect_emotions(text_to_analyze, count=True):
     """
-    Wrapper function that formats the emotion detection output.
-    
+    Returns emotions for a text from the configured backend.
+
+    Results are served from the result cache when enabled, and concurrent
+    misses for the same text are coalesced into one backend call whose
+    result (or error) is shared by every caller.
+
+    Args:
+        text_to_analyze (str): Non-blank text to analyze
+        count (bool): Count the result in emotion_results_total; callers
+                      combining several results count theirs instead
+
+    Returns:
+        dict: Emotion scores and dominant emotion
+
+    Raises:
+        EmotionDetectionError: If the backend fails
+    """
+    # Imported here because backends builds on this module
+    from .backends import fallback_result, get_backend
+    backend = get_backend()
+
+    # Variants of a text share one canonical form, analyzed once and
+    # keyed by its fingerprint; keys are scoped by model so switching
+    # backends or models never mixes results
+    canonical = normalize.canonicalize(text_to_analyze)
+    key = backend.result_key(canonical.fingerprint)
+    tracing.add_fingerprint(canonical.fingerprint)
+    result_cache = cache.get_cache()
+    if result_cache is not None:
+        with tracing.span('cache'):
+            result = result_cache.get(key)
+        if result is not None:
+            if count:
+                metrics.RESULTS.inc(result['dominant_emotion'])
+            return result
+
+    def load():
+        result = micro_batch.detect(backend, canonical.text)
+        if result_cache is not None:
+            result_cache.set(key, result)
+        return result
+
+    try:
+        if not config.SINGLE_FLIGHT_ENABLED:
+            result = load()
+        else:
+            # Every caller gets its own copy of the shared result
+            result = dict(single_flight.get_group().do(key, load))
+    except EmotionDetectionError as e:
+        result = fallback_result(backend, e, canonical.text)
+        if result is None:
+            raise
+    if count:
+        metrics.RESULTS.inc(result['dominant_emotion'])
+    return result
+
+
+def emotion_detector(text_to_analyze, shed_load=False):
+    """
+    Detects emotions in the given text using Watson NLP, or the backend
+    selected by config.BACKEND.
+
     Args:
         text_to_analyze (str): Text to analyze for emotions
-    
+        shed_load (bool): Raise RateLimitedError when the upstream rate
+                          limit sheds the call, instead of returning
+                          None values
+
+    Returns:
+        dict: Dictionary containing emotion scores and dominant emotion,
+              or None values if input is invalid or API fails
+    """
+    # Input validation - check for blank or None text
+    if not text_to_analyze or text_to_analyze.strip() == "":
+        return empty_result()
+
+    try:
+        return detect_emotions(text_to_analyze)
+    except EmotionDetectionError as e:
+        if shed_load and e.kind == 'rate_limited':
+            raise
+        # If API is unavailable or fails, return None values
+        print(e)
+        return empty_result()
+
+def format_prediction(result):
+    """
+    Formats an emotion_detector result as the user-facing sentence.
+
+    Args:
+        result (dict): Result dictionary from emotion_detector
+
     Returns:
         str: Formatted string with emotion analysis results
     """
-    # Get the raw emotion detection results
-    result = emotion_detector(text_to_analyze)
-    
     # Handle the case where API is unavailable
     if result['dominant_emotion'] is None:
         return "Invalid text! Please try again!"
-    
+
     # Format the output string
     anger = result['anger']
     disgust = result['disgust']
@@ -162,9 +327,28 @@ def emotion_predictor(text_to_analyze):
     joy = result['joy']
     sadness = result['sadness']
     dominant_emotion = result['dominant_emotion']
-    
+
     formatted_output = f"For the given statement, the system response is 'anger': {anger}, "
     formatted_output += f"'disgust': {disgust}, 'fear': {fear}, 'joy': {joy} and 'sadness': {sadness}. "
     formatted_output += f"The dominant emotion is {dominant_emotion}."
-    
+
     return formatted_output
+
+def emotion_predictor(text_to_analyze, shed_load=False):
+    """
+    Wrapper function that formats the emotion detection output.
+
+    Args:
+        text_to_analyze (str): Text to analyze for emotions
+        shed_load (bool): Raise RateLimitedError when the upstream rate
+                          limit sheds the call, instead of returning
+                          None values
+
+    Returns:
+        str: Formatted string with emotion analysis results
+    """
+    # Get the raw emotion detection results
+    result = emotion_detector(text_to_analyze, shed_load)
+
+    with tracing.span('format'):
+        return format_prediction(result)
@@ -0,0 +1,84 @@
+# http_pool.py
+# Shared, keep-alive HTTP session for calls to the Watson NLP API
+
+import atexit
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import config
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_session(pool_connections=None, pool_maxsize=None,
+                   pool_block=None, keep_alive=None):
+    """
+    Creates a requests.Session backed by a tuned connection pool.
+
+    Args:
+        pool_connections (int): Number of per-host pools to keep
+        pool_maxsize (int): Maximum open connections kept per host
+        pool_block (bool): Block when the per-host limit is reached
+                           instead of opening throwaway connections
+        keep_alive (bool): Reuse connections between requests
+
+    Returns:
+        requests.Session: Configured session
+    """
+    if pool_connections is None:
+        pool_connections = config.POOL_CONNECTIONS
+    if pool_maxsize is None:
+        pool_maxsize = config.POOL_MAXSIZE
+    if pool_block is None:
+        pool_block = config.POOL_BLOCK
+    if keep_alive is None:
+        keep_alive = config.KEEP_ALIVE
+
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    # Ask the server to close the socket after each response
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+
+    return session
+
+
+def get_session():
+    """
+    Returns the process-wide session, creating it on first use.
+
+    The underlying urllib3 pool is thread-safe, so the same session is
+    shared by every Flask worker thread.
+
+    Returns:
+        requests.Session: Shared session
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def close_session():
+    """Closes the shared session and releases its pooled connections."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+# Release pooled sockets when the interpreter shuts down
+atexit.register(close_session)
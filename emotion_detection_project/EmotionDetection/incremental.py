@@ -0,0 +1,129 @@
+# incremental.py
+# Incremental re-analysis of edited texts with sentence-level caching
+#
+# An editor re-submits the whole text after every keystroke or edit, yet
+# most of its sentences are unchanged. Incremental mode splits the text
+# into sentences, serves every sentence seen before from a sentence cache
+# keyed by its fingerprint, sends only new or changed sentences to the
+# backend, and recombines all sentence scores into document scores exactly
+# as document mode does (length-weighted averaging).
+
+import threading
+
+from . import config
+from . import metrics
+from . import normalize
+from .backends import get_backend
+from .cache import MemoryCache
+from .document import aggregate, score_texts, split_sentences
+from .emotion_detector import EmotionDetectionError, empty_result
+
+_sentence_cache = None
+_sentence_cache_lock = threading.Lock()
+
+
+def get_sentence_cache():
+    """
+    Returns the process-wide sentence cache, creating it on first use.
+
+    Returns:
+        MemoryCache: LRU of config.INCREMENTAL_CACHE_SIZE sentence results
+    """
+    global _sentence_cache
+    if _sentence_cache is None:
+        with _sentence_cache_lock:
+            if _sentence_cache is None:
+                _sentence_cache = MemoryCache(
+                    max_size=config.INCREMENTAL_CACHE_SIZE,
+                    ttl=config.CACHE_TTL)
+    return _sentence_cache
+
+
+def clear_sentence_cache():
+    """Removes every cached sentence result."""
+    get_sentence_cache().clear()
+
+
+def detect_incremental(text, include_sentences=False, max_workers=None):
+    """
+    Returns emotions for a text, re-scoring only unseen sentences.
+
+    Args:
+        text (str): Non-blank text to analyze
+        include_sentences (bool): Add the per-sentence breakdown under
+                                  'chunks'
+        max_workers (int): Sentences scored at once
+                           (default: config.DOCUMENT_MAX_WORKERS)
+
+    Returns:
+        dict: Standard result dictionary plus 'coverage' and
+              'reuse_ratio', the fraction of sentences served from the
+              sentence cache
+
+    Raises:
+        EmotionDetectionError: If every sentence failed
+    """
+    backend = get_backend()
+    sentence_cache = get_sentence_cache()
+    sentences = split_sentences(text)
+
+    outcomes = [None] * len(sentences)
+    # Sentences to score, by key; a sentence repeated in the text is
+    # scored once
+    missing = {}
+    for i, sentence in enumerate(sentences):
+        canonical = normalize.canonicalize(sentence.text)
+        key = backend.result_key(canonical.fingerprint)
+        outcomes[i] = sentence_cache.get(key)
+        if outcomes[i] is None:
+            missing.setdefault(key, (canonical.text, []))[1].append(i)
+
+    scored = score_texts([canonical_text for canonical_text, _
+                          in missing.values()], max_workers)
+    for (key, (_, indexes)), outcome in zip(missing.items(), scored):
+        if not isinstance(outcome, EmotionDetectionError):
+            sentence_cache.set(key, outcome)
+        for i in indexes:
+            outcomes[i] = outcome
+
+    # A new sentence repeated within the text counts as reused after its
+    # first occurrence, so reused + scored is always the sentence count
+    reused = len(sentences) - len(missing)
+    metrics.INCREMENTAL_SENTENCES.inc('reused', amount=reused)
+    metrics.INCREMENTAL_SENTENCES.inc('scored', amount=len(missing))
+    metrics.INCREMENTAL_REUSE_RATIO.observe(reused / len(sentences))
+
+    result = aggregate(sentences, outcomes, include_sentences)
+    result['reuse_ratio'] = reused / len(sentences)
+    metrics.RESULTS.inc(result['dominant_emotion'])
+    return result
+
+
+def incremental_emotion_detector(text_to_analyze, include_sentences=False,
+                                 shed_load=False):
+    """
+    Detects emotions in an edited text, re-scoring only what changed.
+
+    Args:
+        text_to_analyze (str): Text to analyze for emotions
+        include_sentences (bool): Add the per-sentence breakdown under
+                                  'chunks'
+        shed_load (bool): Raise RateLimitedError when the upstream rate
+                          limit shed every new sentence, instead of
+                          returning None values
+
+    Returns:
+        dict: Emotion scores, dominant emotion, 'coverage' and
+              'reuse_ratio', or None values if input is invalid or every
+              sentence failed
+    """
+    if not text_to_analyze or text_to_analyze.strip() == "":
+        return empty_result()
+
+    try:
+        return detect_incremental(text_to_analyze, include_sentences)
+    except EmotionDetectionError as e:
+        if shed_load and e.kind == 'rate_limited':
+            raise
+        print(e)
+        return empty_result()
@@ -0,0 +1,120 @@
+# lexicon.py
+# Built-in emotion lexicon used by the local, offline scoring engines
+
+import hashlib
+import re
+
+from .emotion_detector import EMOTIONS
+
+# Word weights per emotion. Weights are relative evidence, not
+# probabilities; a word may contribute to more than one emotion.
+LEXICON = {
+    'anger': {
+        'angry': 1.0, 'anger': 1.0, 'mad': 0.9, 'furious': 1.0, 'rage': 1.0,
+        'outraged': 1.0, 'annoyed': 0.7, 'annoying': 0.7, 'irritated': 0.7,
+        'irritating': 0.7, 'frustrated': 0.7, 'frustrating': 0.7,
+        'hostile': 0.8, 'livid': 1.0, 'infuriating': 1.0, 'resent': 0.8,
+        'hate': 0.5, 'hated': 0.5, 'unacceptable': 0.6, 'ridiculous': 0.5,
+        'scam': 0.6, 'rude': 0.6, 'worst': 0.4, 'fed': 0.3, 'yell': 0.7,
+        'shouting': 0.6, 'damn': 0.6, 'stupid': 0.5, 'useless': 0.5,
+    },
+    'disgust': {
+        'disgust': 1.0, 'disgusted': 1.0, 'disgusting': 1.0, 'gross': 0.9,
+        'nasty': 0.8, 'revolting': 1.0, 'repulsive': 1.0, 'vile': 0.9,
+        'sickening': 0.9, 'yuck': 0.9, 'filthy': 0.8, 'dirty': 0.5,
+        'rotten': 0.7, 'awful': 0.4, 'horrible': 0.4, 'hate': 0.7,
+        'hated': 0.7, 'despise': 0.8, 'loathe': 0.9, 'creepy': 0.5,
+        'smelly': 0.6, 'stinks': 0.7, 'moldy': 0.7, 'greasy': 0.4,
+    },
+    'fear': {
+        'afraid': 1.0, 'fear': 1.0, 'scared': 1.0, 'frightened': 1.0,
+        'terrified': 1.0, 'anxious': 0.8, 'anxiety': 0.8, 'worried': 0.7,
+        'worry': 0.7, 'nervous': 0.7, 'panic': 0.9, 'dread': 0.9,
+        'horror': 0.8, 'threat': 0.6, 'danger': 0.6, 'dangerous': 0.6,
+        'unsafe': 0.7, 'alarming': 0.6, 'uneasy': 0.6, 'creepy': 0.4,
+        'nightmare': 0.6, 'risk': 0.3, 'helpless': 0.5, 'tense': 0.4,
+    },
+    'joy': {
+        'happy': 1.0, 'glad': 1.0, 'joy': 1.0, 'joyful': 1.0, 'love': 0.9,
+        'loved': 0.9, 'lovely': 0.8, 'great': 0.6, 'good': 0.4,
+        'wonderful': 0.9, 'amazing': 0.9, 'awesome': 0.8, 'excellent': 0.8,
+        'fantastic': 0.9, 'delighted': 1.0, 'pleased': 0.8, 'excited': 0.8,
+        'thrilled': 0.9, 'thanks': 0.5, 'thank': 0.5, 'grateful': 0.8,
+        'enjoy': 0.8, 'enjoyed': 0.8, 'fun': 0.7, 'beautiful': 0.7,
+        'perfect': 0.7, 'nice': 0.5, 'best': 0.5, 'like': 0.2,
+        'smile': 0.7, 'laugh': 0.7, 'cheerful': 0.9, 'proud': 0.6,
+    },
+    'sadness': {
+        'sad': 1.0, 'sadness': 1.0, 'unhappy': 1.0, 'depressed': 1.0,
+        'miserable': 1.0, 'heartbroken': 1.0, 'cry': 0.8, 'crying': 0.8,
+        'tears': 0.7, 'lonely': 0.9, 'alone': 0.5, 'grief': 1.0,
+        'sorrow': 1.0, 'sorry': 0.5, 'regret': 0.7, 'disappointed': 0.7,
+        'disappointing': 0.7, 'lost': 0.5, 'loss': 0.6, 'miss': 0.5,
+        'missed': 0.4, 'hurt': 0.6, 'pain': 0.6, 'gloomy': 0.8,
+        'hopeless': 0.9, 'down': 0.3, 'upset': 0.6, 'died': 0.7,
+    },
+}
+
+# Small baseline so texts without lexicon words still get scores
+PRIOR = {
+    'anger': 0.05,
+    'disgust': 0.05,
+    'fear': 0.05,
+    'joy': 0.08,
+    'sadness': 0.05,
+}
+
+# Words that negate the next few words: negated joy counts as sadness and
+# every other emotion is damped by NEGATION_WEIGHT
+NEGATIONS = frozenset([
+    'not', 'no', 'never', 'nothing', "don't", "doesn't", "didn't",
+    "isn't", "wasn't", "aren't", "can't", "won't", 'without',
+])
+NEGATION_WINDOW = 3
+NEGATION_WEIGHT = 0.5
+
+_TOKEN_RE = re.compile(r"[a-z']+")
+
+
+def tokenize(text):
+    """
+    Splits text into lowercase word tokens.
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        list: Word tokens
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _build_word_table():
+    """Maps each word to its per-emotion weights in EMOTIONS order."""
+    table = {}
+    for index, emotion in enumerate(EMOTIONS):
+        for word, weight in LEXICON[emotion].items():
+            weights = table.setdefault(word, [0.0] * len(EMOTIONS))
+            weights[index] = weight
+    return {word: tuple(weights) for word, weights in table.items()}
+
+
+# word -> (anger, disgust, fear, joy, sadness) weights
+WORD_WEIGHTS = _build_word_table()
+
+# Changes whenever the lexicon or scoring constants change, so results of
+# different lexicon versions are never confused
+VERSION = hashlib.sha256(repr((
+    sorted(WORD_WEIGHTS.items()), sorted(PRIOR.items()), sorted(NEGATIONS),
+    NEGATION_WINDOW, NEGATION_WEIGHT
+)).encode('utf-8')).hexdigest()[:12]
+
+
+def stem(word):
+    """Strips a few common suffixes for words missing from the table."""
+    for suffix in ('ing', 'ed', 'ly', 's'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            root = word[:-len(suffix)]
+            if root in WORD_WEIGHTS:
+                return root
+    return word
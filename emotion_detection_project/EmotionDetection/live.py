@@ -0,0 +1,123 @@
+# live.py
+# Live analysis sessions: debounced, cancellable analysis of text updates
+#
+# A live client (an editor, a text box analyzed as the user types) sends
+# every version of its text over one long-lived connection. A LiveSession
+# waits until updates pause for LIVE_DEBOUNCE seconds before analyzing,
+# cancels an analysis as soon as a newer update supersedes it and sends
+# back only the scores of the latest text. The session knows nothing about
+# the transport: server_async.py drives it from a WebSocket.
+
+import asyncio
+
+from . import config
+from . import metrics
+from . import tracing
+from .async_detector import async_detect_emotions
+from .emotion_detector import EmotionDetectionError, empty_result
+
+
+class LiveSession:
+    """
+    Debounces one client's text updates and streams back their scores.
+
+    Each message sent is the standard result dictionary plus 'seq', the
+    sequence number of the update it answers, and 'error' (None on
+    success). Updates superseded before their analysis finished get no
+    message at all.
+
+    Args:
+        send (callable): Coroutine function called with each message dict
+        debounce (float): Quiet seconds before analyzing
+                          (default: config.LIVE_DEBOUNCE)
+        request_id (str): Connection's request ID, reused by the trace
+                          of every analysis so logs can be joined on it
+    """
+
+    def __init__(self, send, debounce=None, request_id=None):
+        self._send = send
+        self.debounce = config.LIVE_DEBOUNCE if debounce is None else debounce
+        self.request_id = request_id
+        self._task = None
+        self._seq = 0
+
+    def update(self, text, seq=None):
+        """
+        Replaces the text to analyze, superseding any pending update.
+
+        Args:
+            text (str): Latest version of the client's text
+            seq (int): Client's sequence number for this update
+                       (default: one more than the previous update's)
+        """
+        self._seq = self._seq + 1 if seq is None else seq
+        metrics.LIVE_UPDATES.inc('received')
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = asyncio.ensure_future(self._run(text, self._seq))
+
+    async def close(self):
+        """Cancels any pending or running analysis."""
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self, text, seq):
+        """Debounces, analyzes and sends the result of one update."""
+        try:
+            await asyncio.sleep(self.debounce)
+        except asyncio.CancelledError:
+            metrics.LIVE_UPDATES.inc('debounced')
+            raise
+        try:
+            message = await self._analyze(text)
+        except asyncio.CancelledError:
+            metrics.LIVE_UPDATES.inc('cancelled')
+            raise
+        message['seq'] = seq
+        metrics.LIVE_UPDATES.inc('analyzed')
+        # A newer update must not interrupt a half-written message, and a
+        # send outliving this task must not leave its error unretrieved
+        sending = asyncio.ensure_future(self._send(message))
+        sending.add_done_callback(_retrieve_exception)
+        try:
+            await asyncio.shield(sending)
+        except ConnectionError:
+            # The client disconnected; the server closes the session
+            pass
+
+    async def _analyze(self, text):
+        """Scores text in its own trace, returning the message to send."""
+        trace = token = None
+        if config.TRACING_ENABLED:
+            # Each analysis is traced and logged on its own, rather than
+            # piling up in the connection's trace
+            trace, token = tracing.start_trace(self.request_id)
+        error = None
+        status = 'cancelled'
+        try:
+            if not text or text.strip() == "":
+                result, error = empty_result(), "Blank text"
+            else:
+                result = await async_detect_emotions(text)
+            status = 'ok'
+        except EmotionDetectionError as e:
+            result, error = empty_result(), str(e)
+            status = 'error'
+        finally:
+            if trace is not None:
+                tracing.finish_trace(token)
+                tracing.log_trace(trace, route='live', method='WS',
+                                  status=status)
+        result['error'] = error
+        return result
+
+
+def _retrieve_exception(task):
+    """Marks a finished task's exception as retrieved."""
+    if not task.cancelled():
+        task.exception()
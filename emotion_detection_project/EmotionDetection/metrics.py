@@ -0,0 +1,485 @@
+# metrics.py
+# Low-overhead Prometheus-style metrics for the server's /metrics endpoint
+#
+# Every thread records into its own dictionary, so the hot path takes no
+# lock: an update is a thread-local lookup plus a dict increment. A
+# scrape sums the per-thread dictionaries. Values recorded by threads
+# that have since exited are folded into a shared total, so thread churn
+# does not grow memory.
+#
+# Worker processes (gunicorn) each keep their own values. With
+# METRICS_DIR set, every process saves a snapshot of its values to
+# <dir>/metrics-<pid>.json every METRICS_FLUSH_INTERVAL seconds, and a
+# scrape of any worker merges all the snapshots, as prometheus_client's
+# multiprocess mode does. When a worker exits, its gauges are dropped and
+# its counters and histograms are folded into metrics-dead.json, so the
+# totals never go down and recycled workers leave no files behind.
+
+import fcntl
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from . import config
+
+# Latency buckets in seconds, as in the Prometheus client libraries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75,
+                   1.0, 2.5, 5.0, 7.5, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+# Values of finished threads
+_retired = {}
+_metrics = []
+
+
+def _shard():
+    """Returns the calling thread's value dictionary."""
+    try:
+        return _local.values
+    except AttributeError:
+        values = _local.values = {}
+        with _shards_lock:
+            _shards.append((threading.current_thread(), values))
+        return values
+
+
+class Metric:
+    """
+    Base class of the metric types.
+
+    Args:
+        name (str): Metric name
+        documentation (str): HELP text
+        labelnames (tuple): Label names, in the order values are passed
+    """
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _metrics.append(self)
+
+    def _merge(self, total, value):
+        return total + value
+
+    def _samples(self, labels, value):
+        yield self.name, labels, value
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    type = 'counter'
+
+    def inc(self, *labelvalues, amount=1):
+        """Adds amount to the series for labelvalues."""
+        values = _shard()
+        key = (self, labelvalues)
+        values[key] = values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that goes up and down, such as requests in flight."""
+
+    type = 'gauge'
+
+    def inc(self, *labelvalues, amount=1):
+        """Adds amount to the series for labelvalues."""
+        values = _shard()
+        key = (self, labelvalues)
+        values[key] = values.get(key, 0) + amount
+
+    def dec(self, *labelvalues, amount=1):
+        """Subtracts amount from the series for labelvalues."""
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values in fixed buckets.
+
+    Args:
+        buckets (tuple): Sorted upper bounds; +Inf is added automatically
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labelvalues):
+        """Records one observation for labelvalues."""
+        values = _shard()
+        key = (self, labelvalues)
+        cell = values.get(key)
+        if cell is None:
+            # One count per bucket, one for +Inf, then the running sum
+            cell = values[key] = [0] * (len(self.buckets) + 2)
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def time(self, *labelvalues):
+        """Context manager that observes the duration of its block."""
+        return _Timer(self, labelvalues)
+
+    def _merge(self, total, value):
+        return [a + b for a, b in zip(total, value)]
+
+    def _samples(self, labels, value):
+        cumulative = 0
+        bounds = [_format_value(bound) for bound in self.buckets] + ['+Inf']
+        for bound, count in zip(bounds, value):
+            cumulative += count
+            yield self.name + '_bucket', labels + (('le', bound),), cumulative
+        yield self.name + '_sum', labels, value[-1]
+        yield self.name + '_count', labels, cumulative
+
+
+class _Timer:
+    """Times a block into a histogram."""
+
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start,
+                               *self.labelvalues)
+
+
+def collect():
+    """
+    Sums the values recorded by every thread.
+
+    Returns:
+        dict: (metric, labelvalues) -> merged value
+    """
+    with _shards_lock:
+        totals = {key: _copy(value) for key, value in _retired.items()}
+        alive = []
+        for thread, values in _shards:
+            # copy() is atomic, so the owner can keep writing meanwhile
+            snapshot = values.copy()
+            for key, value in snapshot.items():
+                total = totals.get(key)
+                totals[key] = (_copy(value) if total is None
+                               else key[0]._merge(total, value))
+            if thread.is_alive():
+                alive.append((thread, values))
+            else:
+                # The owner is gone, so its values can no longer change
+                for key, value in snapshot.items():
+                    total = _retired.get(key)
+                    _retired[key] = (_copy(value) if total is None
+                                     else key[0]._merge(total, value))
+        _shards[:] = alive
+    return totals
+
+
+def _copy(value):
+    return list(value) if isinstance(value, list) else value
+
+
+def get_value(metric, *labelvalues):
+    """
+    Returns the current value of one series, mostly for tests.
+
+    Returns:
+        The count, gauge value or histogram cells; None if never recorded
+    """
+    return collect().get((metric, labelvalues))
+
+
+def reset():
+    """Clears every recorded value."""
+    with _shards_lock:
+        _retired.clear()
+        for _, values in _shards:
+            values.clear()
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == int(value) and abs(value) < 1e15:
+            return f'{value:.1f}'
+        return repr(value)
+    return str(value)
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def _snapshot_path(directory, pid):
+    return os.path.join(directory, f'metrics-{pid}.json')
+
+
+def _dump(path, totals):
+    """Atomically writes totals to path."""
+    entries = [[metric.name, list(labelvalues), value]
+               for (metric, labelvalues), value in totals.items()]
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, separators=(',', ':'))
+    os.replace(temporary, path)
+
+
+def _load(path):
+    """Reads totals written by _dump; metrics this process lacks are skipped."""
+    by_name = {metric.name: metric for metric in _metrics}
+    try:
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        # Removed since the directory was listed
+        return {}
+    totals = {}
+    for name, labelvalues, value in entries:
+        metric = by_name.get(name)
+        if metric is not None:
+            totals[(metric, tuple(labelvalues))] = value
+    return totals
+
+
+def _merge_into(totals, values):
+    for key, value in values.items():
+        total = totals.get(key)
+        totals[key] = (_copy(value) if total is None
+                       else key[0]._merge(total, value))
+
+
+class _DirectoryLock:
+    """flock on the metrics directory: shared to read, exclusive to compact."""
+
+    def __init__(self, directory, mode):
+        self.path = os.path.join(directory, '.lock')
+        self.mode = mode
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self.fd, self.mode)
+        return self
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+
+
+def write_snapshot():
+    """Saves this process's values to METRICS_DIR, if set."""
+    directory = config.METRICS_DIR
+    if directory:
+        _dump(_snapshot_path(directory, os.getpid()), collect())
+
+
+def _flush_forever(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_snapshot()
+        except OSError:
+            # The next flush tries again; metrics must not kill a worker
+            pass
+
+
+def start_flusher():
+    """
+    Starts the daemon thread saving this process's snapshot periodically.
+
+    Call it in each worker process after fork (see gunicorn.conf.py).
+    """
+    if not config.METRICS_DIR:
+        return
+    write_snapshot()
+    thread = threading.Thread(target=_flush_forever,
+                              args=(config.METRICS_FLUSH_INTERVAL,),
+                              name='metrics-flusher', daemon=True)
+    thread.start()
+
+
+def mark_process_dead(pid):
+    """
+    Folds an exited worker's counters and histograms into the dead total.
+
+    Its gauges are dropped: requests it had in flight are over.
+
+    Args:
+        pid (int): Process ID of the exited worker
+    """
+    directory = config.METRICS_DIR
+    if not directory:
+        return
+    path = _snapshot_path(directory, pid)
+    with _DirectoryLock(directory, fcntl.LOCK_EX):
+        if not os.path.exists(path):
+            return
+        dead_path = os.path.join(directory, 'metrics-dead.json')
+        totals = _load(dead_path)
+        _merge_into(totals, {key: value for key, value in _load(path).items()
+                             if key[0].type != 'gauge'})
+        _dump(dead_path, totals)
+        os.remove(path)
+
+
+def clear_directory():
+    """Removes every snapshot, e.g. when a new server starts."""
+    directory = config.METRICS_DIR
+    if not directory:
+        return
+    with _DirectoryLock(directory, fcntl.LOCK_EX):
+        for name in os.listdir(directory):
+            # Snapshots, and temporary files of processes killed mid-write
+            if name.startswith('metrics-'):
+                os.remove(os.path.join(directory, name))
+
+
+def collect_all():
+    """
+    Sums the values of every process sharing METRICS_DIR.
+
+    Without METRICS_DIR, this is collect(). Other processes' values are
+    up to METRICS_FLUSH_INTERVAL seconds old; this one's are current.
+
+    Returns:
+        dict: (metric, labelvalues) -> merged value
+    """
+    directory = config.METRICS_DIR
+    if not directory:
+        return collect()
+    totals = collect()
+    own = os.path.basename(_snapshot_path(directory, os.getpid()))
+    with _DirectoryLock(directory, fcntl.LOCK_SH):
+        for name in os.listdir(directory):
+            if (name.startswith('metrics-') and name.endswith('.json')
+                    and name != own):
+                _merge_into(totals, _load(os.path.join(directory, name)))
+    return totals
+
+
+def render():
+    """
+    Renders every metric in the Prometheus text exposition format.
+
+    With METRICS_DIR set, the values of all worker processes are summed.
+
+    Returns:
+        str: The /metrics response body
+    """
+    totals = collect_all()
+    series = {}
+    for (metric, labelvalues), value in totals.items():
+        series.setdefault(metric, []).append((labelvalues, value))
+
+    lines = []
+    for metric in _metrics:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for labelvalues, value in sorted(series.get(metric, ()),
+                                         key=lambda item: item[0]):
+            labels = tuple(zip(metric.labelnames, labelvalues))
+            for name, sample_labels, sample in metric._samples(labels, value):
+                if sample_labels:
+                    label_text = ','.join(f'{key}="{_escape(val)}"'
+                                          for key, val in sample_labels)
+                    name = f'{name}{{{label_text}}}'
+                lines.append(f'{name} {_format_value(sample)}')
+    return '\n'.join(lines) + '\n'
+
+
+# HTTP layer, recorded by the web servers
+HTTP_REQUESTS = Counter(
+    'emotion_http_requests_total',
+    'HTTP requests handled, by route, method and status code.',
+    ('route', 'method', 'status'))
+HTTP_REQUEST_DURATION = Histogram(
+    'emotion_http_request_duration_seconds',
+    'Time spent handling HTTP requests, by route.',
+    ('route',))
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    'emotion_http_requests_in_flight',
+    'HTTP requests currently being handled, by route.',
+    ('route',))
+
+# Watson upstream
+UPSTREAM_REQUEST_DURATION = Histogram(
+    'emotion_upstream_request_duration_seconds',
+    'Latency of Watson NLP API calls, including failed ones.')
+UPSTREAM_REQUESTS_IN_FLIGHT = Gauge(
+    'emotion_upstream_requests_in_flight',
+    'Watson NLP API calls currently waiting for a response.')
+UPSTREAM_RESPONSES = Counter(
+    'emotion_upstream_responses_total',
+    'Watson NLP API responses by status code class (200, 400, 500, other).',
+    ('status',))
+UPSTREAM_ERRORS = Counter(
+    'emotion_upstream_errors_total',
+    'Failed Watson NLP API calls by kind (timeout, connection, parse).',
+    ('kind',))
+UPSTREAM_RETRIES = Counter(
+    'emotion_upstream_retries_total',
+    'Watson NLP API calls retried, by the error kind that caused the retry.',
+    ('kind',))
+UPSTREAM_HEDGES = Counter(
+    'emotion_upstream_hedges_total',
+    'Hedged Watson NLP API requests sent, or skipped for lack of threads.',
+    ('event',))
+RETRY_BUDGET_EXHAUSTED = Counter(
+    'emotion_retry_budget_exhausted_total',
+    'Retries or hedges skipped because the retry budget was empty.',
+    ('kind',))
+RATE_LIMIT_WAIT = Histogram(
+    'emotion_rate_limit_wait_seconds',
+    'Time Watson NLP API calls queued for a rate limit token.')
+RATE_LIMIT_REJECTED = Counter(
+    'emotion_rate_limit_rejected_total',
+    'Watson NLP API calls shed by the rate limiter.')
+
+# Micro-batching
+MICRO_BATCH_SIZE = Histogram(
+    'emotion_micro_batch_size',
+    'Texts per dispatched micro-batch.',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+MICRO_BATCH_WAIT = Histogram(
+    'emotion_micro_batch_wait_seconds',
+    'Time from a micro-batch opening until it was dispatched.',
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1))
+
+# Incremental analysis
+INCREMENTAL_SENTENCES = Counter(
+    'emotion_incremental_sentences_total',
+    'Sentences of incremental analyses, reused from cache or scored.',
+    ('outcome',))
+INCREMENTAL_REUSE_RATIO = Histogram(
+    'emotion_incremental_reuse_ratio',
+    'Fraction of sentences served from cache per incremental analysis.',
+    buckets=(0, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99))
+
+# Live analysis
+LIVE_CONNECTIONS = Gauge(
+    'emotion_live_connections',
+    'Open live analysis WebSocket connections.')
+LIVE_UPDATES = Counter(
+    'emotion_live_updates_total',
+    'Live text updates by outcome (received, debounced, cancelled, analyzed).',
+    ('outcome',))
+
+# Results
+RESULTS = Counter(
+    'emotion_results_total',
+    'Successful analyses by dominant emotion.',
+    ('dominant_emotion',))
@@ -0,0 +1,345 @@
+# micro_batch.py
+# Micro-batching: concurrent single-text detections share one backend call
+#
+# The first text to arrive opens a batch and waits up to
+# MICRO_BATCH_MAX_WAIT for company. The batch is dispatched as soon as it
+# holds MICRO_BATCH_MAX_SIZE texts or the window closes, with one
+# backend.detect_many call whose results are handed back to each waiting
+# caller. Only backends with a native batch path (supports_batching) are
+# batched; for the others one call per text is already optimal.
+
+import asyncio
+import threading
+import time
+
+from . import config
+from . import metrics
+from . import tracing
+
+
+class _Batch:
+    """Texts collected in one window and the callers waiting on them."""
+
+    def __init__(self):
+        self.texts = []
+        self.waiters = []
+        self.opened = time.perf_counter()
+        self.full = threading.Event()
+
+
+class _Waiter:
+    """
+    One caller's slot in a batch (thread version).
+
+    A bare lock, created held and released by the leader, is a much
+    cheaper one-shot signal than threading.Event.
+    """
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Lock()
+        self.done.acquire()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Collects concurrent detect calls into batches (thread version).
+
+    The caller that opens a batch becomes its leader: it waits for the
+    window to close, runs the batch for everyone and wakes the others,
+    so no dispatcher thread is needed.
+
+    Args:
+        detect_many (callable): Scores a list of texts, returning one
+                                result dict or EmotionDetectionError each
+        max_size (int): Texts that dispatch a batch immediately
+        max_wait (float): Seconds the first text waits for company
+    """
+
+    def __init__(self, detect_many, max_size, max_wait):
+        self.detect_many = detect_many
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._open = None
+        self.batches = 0
+        self.texts = 0
+
+    def submit(self, text_to_analyze):
+        """
+        Scores one text as part of the current batch.
+
+        Args:
+            text_to_analyze (str): Non-blank text to analyze
+
+        Returns:
+            dict: Emotion scores and dominant emotion
+
+        Raises:
+            EmotionDetectionError: If the backend failed for this text
+        """
+        waiter = _Waiter()
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            batch.texts.append(text_to_analyze)
+            batch.waiters.append(waiter)
+            if len(batch.texts) >= self.max_size:
+                self._open = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.max_wait)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+            self._run(batch)
+        else:
+            waiter.done.acquire()
+
+        if waiter.error is not None:
+            raise waiter.error
+        return waiter.result
+
+    def _run(self, batch):
+        """Scores a closed batch and wakes its callers."""
+        _observe(batch)
+        with self._lock:
+            self.batches += 1
+            self.texts += len(batch.texts)
+        woken = 0
+        try:
+            try:
+                results = self.detect_many(batch.texts)
+                _check_count(results, batch)
+            except Exception as e:
+                results = [e] * len(batch.texts)
+            for waiter, result in zip(batch.waiters, results):
+                if isinstance(result, Exception):
+                    waiter.error = result
+                else:
+                    waiter.result = result
+                waiter.done.release()
+                woken += 1
+        finally:
+            # Never leave a caller blocked, even if the leader is interrupted
+            for waiter in batch.waiters[woken:]:
+                waiter.error = RuntimeError("micro-batch was abandoned")
+                waiter.done.release()
+
+    def stats(self):
+        """
+        Returns the batching window and counters.
+
+        Returns:
+            dict: max_size, max_wait_ms, batches, texts and mean batch size
+        """
+        with self._lock:
+            return _stats(self)
+
+
+class AsyncMicroBatcher:
+    """
+    Asyncio version of MicroBatcher for use on one event loop.
+
+    A timer, not a caller, dispatches the batch, so a cancelled caller
+    never strands the others.
+
+    Args:
+        detect_many (callable): Coroutine function scoring a list of texts
+        max_size (int): Texts that dispatch a batch immediately
+        max_wait (float): Seconds the first text waits for company
+    """
+
+    def __init__(self, detect_many, max_size, max_wait):
+        self.detect_many = detect_many
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._open = None
+        self._timer = None
+        # The loop only holds weak references to tasks
+        self._tasks = set()
+        self.batches = 0
+        self.texts = 0
+
+    async def submit(self, text_to_analyze):
+        """
+        Scores one text as part of the current batch.
+
+        Returns:
+            dict: Emotion scores and dominant emotion
+
+        Raises:
+            EmotionDetectionError: If the backend failed for this text
+        """
+        loop = asyncio.get_running_loop()
+        batch = self._open
+        if batch is None:
+            batch = self._open = _Batch()
+            self._timer = loop.call_later(self.max_wait, self._dispatch, batch)
+        future = loop.create_future()
+        batch.texts.append(text_to_analyze)
+        batch.waiters.append(future)
+        if len(batch.texts) >= self.max_size:
+            self._timer.cancel()
+            self._dispatch(batch)
+        return await future
+
+    def _dispatch(self, batch):
+        """Closes a batch and starts scoring it."""
+        if self._open is batch:
+            self._open = None
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        _observe(batch)
+        self.batches += 1
+        self.texts += len(batch.texts)
+        try:
+            try:
+                results = await self.detect_many(batch.texts)
+                _check_count(results, batch)
+            except Exception as e:
+                results = [e] * len(batch.texts)
+            for future, result in zip(batch.waiters, results):
+                # A caller that was cancelled no longer wants its result
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            for future in batch.waiters:
+                if not future.done():
+                    future.set_exception(
+                        RuntimeError("micro-batch was abandoned"))
+
+    def stats(self):
+        """Returns the batching window and counters."""
+        return _stats(self)
+
+
+def _check_count(results, batch):
+    """Raises unless there is one result per text of the batch."""
+    if len(results) != len(batch.texts):
+        raise RuntimeError(f"detect_many returned {len(results)} results "
+                           f"for {len(batch.texts)} texts")
+
+
+def _observe(batch):
+    """Records a dispatched batch's size and window in the metrics."""
+    metrics.MICRO_BATCH_SIZE.observe(len(batch.texts))
+    metrics.MICRO_BATCH_WAIT.observe(time.perf_counter() - batch.opened)
+
+
+def _stats(batcher, *others):
+    # Batchers of one backend share a window, so their counters add up
+    batches = sum(b.batches for b in (batcher,) + others)
+    texts = sum(b.texts for b in (batcher,) + others)
+    return {
+        'max_size': batcher.max_size,
+        'max_wait_ms': round(batcher.max_wait * 1e3, 3),
+        'batches': batches,
+        'texts': texts,
+        'mean_size': round(texts / batches, 2) if batches else None
+    }
+
+
+_batchers = {}
+_async_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(backend):
+    """
+    Returns the process-wide batcher of a backend.
+
+    Args:
+        backend (EmotionBackend): Backend with supports_batching set
+
+    Returns:
+        MicroBatcher: Shared batcher built from config
+    """
+    batcher = _batchers.get(backend.name)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(backend.name)
+            if batcher is None:
+                batcher = _batchers[backend.name] = MicroBatcher(
+                    backend.detect_many, config.MICRO_BATCH_MAX_SIZE,
+                    config.MICRO_BATCH_MAX_WAIT)
+    return batcher
+
+
+def get_async_batcher(backend):
+    """
+    Returns the asyncio batcher of a backend for the running event loop.
+
+    Args:
+        backend (EmotionBackend): Backend with supports_batching set
+
+    Returns:
+        AsyncMicroBatcher: Batcher built from config
+    """
+    key = (backend.name, asyncio.get_running_loop())
+    batcher = _async_batchers.get(key)
+    if batcher is None:
+        # Batchers of closed loops are useless, so drop them
+        for stale in [k for k in _async_batchers if k[1].is_closed()]:
+            del _async_batchers[stale]
+        batcher = _async_batchers[key] = AsyncMicroBatcher(
+            backend.detect_many_async, config.MICRO_BATCH_MAX_SIZE,
+            config.MICRO_BATCH_MAX_WAIT)
+    return batcher
+
+
+def detect(backend, text_to_analyze):
+    """
+    Scores a text through the backend's batcher when batching applies.
+
+    Args:
+        backend (EmotionBackend): Backend to score with
+        text_to_analyze (str): Non-blank text to analyze
+
+    Returns:
+        dict: Emotion scores and dominant emotion
+    """
+    if not (config.MICRO_BATCH_ENABLED and backend.supports_batching):
+        return backend.detect(text_to_analyze)
+    with tracing.span('batch'):
+        return get_batcher(backend).submit(text_to_analyze)
+
+
+async def detect_async(backend, text_to_analyze):
+    """Asynchronous detect: awaits the backend or its asyncio batcher."""
+    if not (config.MICRO_BATCH_ENABLED and backend.supports_batching):
+        return await backend.detect_async(text_to_analyze)
+    with tracing.span('batch'):
+        return await get_async_batcher(backend).submit(text_to_analyze)
+
+
+def batch_stats():
+    """
+    Returns the stats of every batcher, for /status.
+
+    The asyncio batchers of a backend (one per event loop) are reported
+    together under "<backend name> (asyncio)".
+
+    Returns:
+        dict: Backend name -> batcher stats
+    """
+    stats = {name: batcher.stats() for name, batcher in list(_batchers.items())}
+    by_name = {}
+    for (name, _), batcher in list(_async_batchers.items()):
+        by_name.setdefault(name, []).append(batcher)
+    for name, batchers in by_name.items():
+        stats[f"{name} (asyncio)"] = _stats(*batchers)
+    return stats
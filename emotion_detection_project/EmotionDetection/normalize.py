@@ -0,0 +1,97 @@
+# normalize.py
+# Text canonicalization and fingerprints for caching and deduplication
+#
+# Inputs that differ only in Unicode form, whitespace and (by policy)
+# case or trailing punctuation are reduced to one canonical text. That
+# text is what gets analyzed, and its fingerprint, a short stable hash,
+# is what caches, request coalescing and ETags key on. Equal fingerprints
+# therefore always mean equal results.
+
+import hashlib
+import unicodedata
+from collections import namedtuple
+
+from . import config
+
+CASE_POLICIES = ('preserve', 'lower', 'casefold')
+
+# Sentence-final punctuation dropped by NORMALIZE_TRAILING_PUNCTUATION
+TRAILING_PUNCTUATION = '.!?…;:,'
+
+Canonical = namedtuple('Canonical', ('text', 'fingerprint'))
+
+
+def normalize_text(text, case=None, trailing_punctuation=None):
+    """
+    Canonicalizes a text.
+
+    Applies, in order: Unicode NFC, whitespace collapse (leading and
+    trailing whitespace dropped, inner runs become one space), the case
+    policy and optionally trailing punctuation removal. ASCII texts skip
+    the Unicode step, which is most of the cost for short inputs.
+
+    Args:
+        text (str): Text to normalize
+        case (str): 'preserve', 'lower' or 'casefold'
+                    (default: config.NORMALIZE_CASE)
+        trailing_punctuation (bool): Drop trailing punctuation
+                    (default: config.NORMALIZE_TRAILING_PUNCTUATION)
+
+    Returns:
+        str: Canonical text
+    """
+    if case is None:
+        case = config.NORMALIZE_CASE
+    if trailing_punctuation is None:
+        trailing_punctuation = config.NORMALIZE_TRAILING_PUNCTUATION
+
+    if config.NORMALIZE_UNICODE and not text.isascii():
+        if not unicodedata.is_normalized('NFC', text):
+            text = unicodedata.normalize('NFC', text)
+    text = ' '.join(text.split())
+    if case == 'lower':
+        text = text.lower()
+    elif case == 'casefold':
+        text = text.casefold()
+    elif case != 'preserve':
+        raise ValueError(f"Unknown case policy: {case}")
+    if trailing_punctuation:
+        # A text of nothing but punctuation keeps it, so it never goes blank
+        text = text.rstrip(TRAILING_PUNCTUATION).rstrip() or text
+    return text
+
+
+def fingerprint(canonical_text, bits=None):
+    """
+    Stable fingerprint of an already canonical text.
+
+    BLAKE2b, which is keyless here and identical across processes,
+    machines and Python versions (unlike hash()).
+
+    Args:
+        canonical_text (str): Output of normalize_text
+        bits (int): 64 or 128 (default: config.FINGERPRINT_BITS)
+
+    Returns:
+        str: Lowercase hex digest, 16 or 32 characters
+    """
+    if bits is None:
+        bits = config.FINGERPRINT_BITS
+    if bits not in (64, 128):
+        raise ValueError(f"Fingerprints are 64 or 128 bits, not {bits}")
+    return hashlib.blake2b(canonical_text.encode('utf-8'),
+                           digest_size=bits // 8).hexdigest()
+
+
+def canonicalize(text):
+    """
+    Normalizes a text and fingerprints the result.
+
+    Args:
+        text (str): Text to analyze
+
+    Returns:
+        Canonical: (text, fingerprint) named tuple
+    """
+    canonical_text = normalize_text(text)
+    return Canonical(canonical_text, fingerprint(canonical_text))
@@ -0,0 +1,290 @@
+# rate_limit.py
+# Token-bucket rate limiter and admission control for the Watson upstream
+#
+# Every upstream attempt (retries and hedges included) takes one token.
+# Tokens refill at RATE_LIMIT_RATE per second up to RATE_LIMIT_BURST.
+# When the bucket is empty a call reserves the next free token and waits
+# for it, so waiting calls form a queue; a call whose turn would come
+# later than RATE_LIMIT_MAX_WAIT is shed at once with RateLimitedError
+# instead of tying up its thread.
+
+import asyncio
+import os
+import struct
+import threading
+import time
+
+from . import config
+from . import metrics
+from .emotion_detector import EmotionDetectionError
+
+
+class RateLimitedError(EmotionDetectionError):
+    """
+    Raised instead of calling the upstream when the rate limit sheds a call.
+
+    Args:
+        retry_after (float): Seconds until a call would likely be admitted
+    """
+
+    def __init__(self, retry_after):
+        super().__init__(
+            "Rate limit exceeded: too many Watson API calls, try again later",
+            kind='rate_limited', status_code=503)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket shared by the threads of one process.
+
+    Reservations may take the balance below zero: -n tokens means n calls
+    are already queued for future tokens, so the next caller waits behind
+    them.
+
+    Args:
+        rate (float): Tokens added per second
+        burst (float): Bucket capacity, i.e. calls allowed at once
+    """
+
+    name = 'memory'
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self.admitted = 0
+        self.rejected = 0
+
+    def _take(self, tokens, updated, now, max_wait):
+        """
+        Reserves one token from a bucket state.
+
+        Returns:
+            tuple: (wait, tokens); wait is None if the call is shed
+        """
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+        if wait > max_wait:
+            return None, tokens
+        return wait, tokens - 1
+
+    def reserve(self, max_wait):
+        """
+        Reserves one token without waiting for it.
+
+        Args:
+            max_wait (float): Longest acceptable wait in seconds
+
+        Returns:
+            float: Seconds to wait before calling, or None if shed
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait, self._tokens = self._take(self._tokens, self._updated,
+                                            now, max_wait)
+            self._updated = now
+            if wait is None:
+                self.rejected += 1
+            else:
+                self.admitted += 1
+            return wait
+
+    def _available(self):
+        """Current token balance; the caller holds the lock."""
+        return min(self.burst, self._tokens
+                   + (time.monotonic() - self._updated) * self.rate)
+
+    def retry_after(self):
+        """Seconds until the queue ahead of a new call has drained."""
+        with self._lock:
+            return max(0.0, (1 - self._available()) / self.rate)
+
+    def reset(self):
+        """Refills the bucket and clears the counters."""
+        with self._lock:
+            self._tokens = self.burst
+            self._updated = time.monotonic()
+            self.admitted = 0
+            self.rejected = 0
+
+    def stats(self):
+        """
+        Returns the limiter state for the status endpoint.
+
+        Returns:
+            dict: Backend, rate, burst, available tokens and counters
+        """
+        with self._lock:
+            return {
+                'backend': self.name,
+                'rate': self.rate,
+                'burst': self.burst,
+                'tokens': round(self._available(), 3),
+                'admitted': self.admitted,
+                'rejected': self.rejected
+            }
+
+
+class FileTokenBucket(TokenBucket):
+    """
+    Token bucket shared by every process on the host through a small file.
+
+    The bucket state is two doubles at the start of the file, updated
+    under an exclusive flock, so all gunicorn workers draw from one
+    budget. Times are wall-clock, since monotonic clocks are not
+    comparable across processes. POSIX only.
+
+    Args:
+        rate (float): Tokens added per second
+        burst (float): Bucket capacity
+        path (str): State file, created if missing
+    """
+
+    name = 'file'
+    _STATE = struct.Struct('<dd')
+
+    def __init__(self, rate, burst, path):
+        super().__init__(rate, burst)
+        self.path = path
+        self._fd = None
+        self._pid = None
+
+    def _file(self):
+        # A forked child shares its parent's open file, and with it the
+        # flock, so every process opens its own
+        if self._pid != os.getpid():
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+        return self._fd
+
+    def reserve(self, max_wait):
+        import fcntl
+        with self._lock:
+            fd = self._file()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                data = os.pread(fd, self._STATE.size, 0)
+                if len(data) == self._STATE.size:
+                    tokens, updated = self._STATE.unpack(data)
+                else:
+                    tokens, updated = self.burst, now
+                wait, tokens = self._take(tokens, updated, now, max_wait)
+                os.pwrite(fd, self._STATE.pack(tokens, now), 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            if wait is None:
+                self.rejected += 1
+            else:
+                self.admitted += 1
+            return wait
+
+    def _available(self):
+        import fcntl
+        fd = self._file()
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        try:
+            data = os.pread(fd, self._STATE.size, 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        if len(data) != self._STATE.size:
+            return self.burst
+        tokens, updated = self._STATE.unpack(data)
+        return min(self.burst, tokens + (time.time() - updated) * self.rate)
+
+    def reset(self):
+        with self._lock:
+            os.pwrite(self._file(), self._STATE.pack(self.burst, time.time()),
+                      0)
+            self.admitted = 0
+            self.rejected = 0
+
+
+def _admit(limiter, timeout):
+    """
+    Reserves a token or sheds the call.
+
+    Returns:
+        float: Seconds to wait before the call
+
+    Raises:
+        RateLimitedError: If the wait would exceed RATE_LIMIT_MAX_WAIT
+    """
+    max_wait = config.RATE_LIMIT_MAX_WAIT
+    if timeout is not None:
+        max_wait = min(max_wait, timeout)
+    wait = limiter.reserve(max_wait)
+    if wait is None:
+        metrics.RATE_LIMIT_REJECTED.inc()
+        raise RateLimitedError(limiter.retry_after())
+    metrics.RATE_LIMIT_WAIT.observe(wait)
+    return wait
+
+
+def acquire(timeout=None):
+    """
+    Waits for the rate limit to admit one upstream call.
+
+    Args:
+        timeout (float): The call's own timeout; caps the wait
+
+    Raises:
+        RateLimitedError: If the call is shed
+    """
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return
+    wait = _admit(limiter, timeout)
+    if wait:
+        time.sleep(wait)
+
+
+async def acquire_async(timeout=None):
+    """Asynchronous acquire: waits without blocking the event loop."""
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return
+    wait = _admit(limiter, timeout)
+    if wait:
+        await asyncio.sleep(wait)
+
+
+def create_rate_limiter():
+    """
+    Builds the rate limiter selected by config.RATE_LIMIT_BACKEND.
+
+    Returns:
+        TokenBucket: 'memory' (per process) or 'file' (per host) bucket
+    """
+    backend = config.RATE_LIMIT_BACKEND.lower()
+    if backend == 'memory':
+        return TokenBucket(config.RATE_LIMIT_RATE, config.RATE_LIMIT_BURST)
+    if backend == 'file':
+        return FileTokenBucket(config.RATE_LIMIT_RATE,
+                               config.RATE_LIMIT_BURST,
+                               config.RATE_LIMIT_PATH)
+    raise ValueError(f"Unknown rate limit backend: {config.RATE_LIMIT_BACKEND}")
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """
+    Returns the process-wide rate limiter, or None if rate limiting is off.
+
+    Returns:
+        TokenBucket: Shared limiter built from config
+    """
+    global _limiter
+    if not config.RATE_LIMIT_ENABLED:
+        return None
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = create_rate_limiter()
+    return _limiter
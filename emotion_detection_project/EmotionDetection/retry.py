@@ -0,0 +1,437 @@
+# retry.py
+# Retries with jittered backoff and hedged requests for upstream calls
+#
+# A Watson call is idempotent, so a transient failure (connection reset,
+# timeout, 500/502/503/504/429) is retried after an exponentially growing,
+# fully jittered delay, within a total deadline per text. Optionally a
+# second, hedged request is sent when the first is slower than the recent
+# p95 latency, and whichever answers first wins. Retries and hedges both
+# spend tokens from one process-wide budget, so they cannot multiply the
+# load on an upstream that is already failing.
+
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from . import config
+from . import metrics
+from .emotion_detector import EmotionDetectionError
+
+# Error kinds worth another attempt; 'api_error' only for these statuses
+RETRYABLE_KINDS = frozenset(['connection', 'timeout', 'server_error'])
+RETRYABLE_STATUSES = frozenset([429, 502, 503, 504])
+
+# Do not start an attempt with less time than this left on the deadline
+_MIN_ATTEMPT_TIME = 0.05
+
+
+def is_retryable(error):
+    """
+    Whether a failed upstream call may succeed if tried again.
+
+    Args:
+        error (EmotionDetectionError): The failure
+
+    Returns:
+        bool: True for transient network and server errors
+    """
+    if error.kind in RETRYABLE_KINDS:
+        return True
+    return error.kind == 'api_error' and error.status_code in RETRYABLE_STATUSES
+
+
+def backoff_delay(retry_number):
+    """
+    Full-jitter exponential backoff.
+
+    Args:
+        retry_number (int): 1 for the first retry, 2 for the second, ...
+
+    Returns:
+        float: Seconds to wait, uniform in [0, min(max, base * 2**(n-1))]
+    """
+    ceiling = min(config.RETRY_MAX_DELAY,
+                  config.RETRY_BASE_DELAY * 2 ** (retry_number - 1))
+    return random.uniform(0, ceiling)
+
+
+class RetryBudget:
+    """
+    Process-wide allowance for retries and hedged requests.
+
+    Every call deposits `ratio` tokens, up to `reserve`; every retry or
+    hedge withdraws one. Healthy traffic keeps the budget full, while in
+    an outage extra requests are held to about `ratio` of the call rate.
+
+    Args:
+        ratio (float): Tokens earned per call
+        reserve (float): Maximum (and initial) number of tokens
+    """
+
+    def __init__(self, ratio=0.2, reserve=10):
+        self.ratio = ratio
+        self.reserve = reserve
+        self._lock = threading.Lock()
+        self._tokens = reserve
+        self.withdrawn = 0
+        self.rejected = 0
+
+    def deposit(self):
+        """Credits one call."""
+        with self._lock:
+            self._tokens = min(self.reserve, self._tokens + self.ratio)
+
+    def withdraw(self):
+        """
+        Takes one token for a retry or hedge.
+
+        Returns:
+            bool: True if the extra request may be sent
+        """
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.withdrawn += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def reset(self):
+        """Refills the budget and clears the counters."""
+        with self._lock:
+            self._tokens = self.reserve
+            self.withdrawn = 0
+            self.rejected = 0
+
+    def stats(self):
+        """
+        Returns the budget state for the status endpoint.
+
+        Returns:
+            dict: tokens, ratio, reserve and counters
+        """
+        with self._lock:
+            return {
+                'tokens': round(self._tokens, 3),
+                'ratio': self.ratio,
+                'reserve': self.reserve,
+                'withdrawn': self.withdrawn,
+                'rejected': self.rejected
+            }
+
+
+class LatencyTracker:
+    """
+    Recent successful upstream latencies, for the hedge delay.
+
+    The percentile is recomputed every `refresh` samples rather than on
+    every call, so reading it is O(1).
+
+    Args:
+        window (int): Number of recent latencies kept
+        refresh (int): Samples between percentile recomputations
+    """
+
+    def __init__(self, window=1000, refresh=50):
+        self._samples = deque(maxlen=window)
+        self._refresh = refresh
+        self._since_refresh = 0
+        self._lock = threading.Lock()
+        self._percentiles = {}
+
+    def record(self, seconds):
+        """Records one successful call's latency."""
+        with self._lock:
+            self._samples.append(seconds)
+            self._since_refresh += 1
+            if self._since_refresh >= self._refresh:
+                self._since_refresh = 0
+                self._percentiles.clear()
+
+    def percentile(self, percent, min_samples=1):
+        """
+        Returns a recent latency percentile.
+
+        Args:
+            percent (float): Percentile, 0-100
+            min_samples (int): Samples needed for a meaningful answer
+
+        Returns:
+            float: Latency in seconds, or None with too few samples
+        """
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            value = self._percentiles.get(percent)
+            if value is None:
+                ordered = sorted(self._samples)
+                index = min(len(ordered) - 1,
+                            int(len(ordered) * percent / 100))
+                value = self._percentiles[percent] = ordered[index]
+            return value
+
+    def reset(self):
+        """Forgets all samples."""
+        with self._lock:
+            self._samples.clear()
+            self._since_refresh = 0
+            self._percentiles.clear()
+
+
+def hedge_delay():
+    """Seconds to wait for the first request before sending a hedge."""
+    delay = get_latency_tracker().percentile(config.HEDGE_PERCENTILE,
+                                             config.HEDGE_MIN_SAMPLES)
+    return config.HEDGE_DEFAULT_DELAY if delay is None else delay
+
+
+def _timed(fn, *args):
+    """Calls fn and records its latency if it succeeds."""
+    start = time.perf_counter()
+    result = fn(*args)
+    get_latency_tracker().record(time.perf_counter() - start)
+    return result
+
+
+async def _timed_async(fn, *args):
+    """Awaits fn and records its latency if it succeeds."""
+    start = time.perf_counter()
+    result = await fn(*args)
+    get_latency_tracker().record(time.perf_counter() - start)
+    return result
+
+
+_hedge_pool = None
+_hedge_slots = None
+_hedge_pool_lock = threading.Lock()
+
+
+def _get_hedge_pool():
+    """Returns the thread pool that runs hedged synchronous calls."""
+    global _hedge_pool, _hedge_slots
+    if _hedge_pool is None:
+        with _hedge_pool_lock:
+            if _hedge_pool is None:
+                # Counts idle pool threads, so a call never queues for one
+                _hedge_slots = threading.Semaphore(config.HEDGE_MAX_WORKERS)
+                _hedge_pool = ThreadPoolExecutor(
+                    max_workers=config.HEDGE_MAX_WORKERS,
+                    thread_name_prefix='emotion-hedge')
+    return _hedge_pool
+
+
+def _reserve_thread():
+    """Claims an idle hedge pool thread, returning False if none is idle."""
+    _get_hedge_pool()
+    return _hedge_slots.acquire(blocking=False)
+
+
+def _submit(fn, *args):
+    """Starts fn on the pool thread claimed by _reserve_thread."""
+    # Each call runs in a copy of the caller's context, so tracing spans
+    # and the request ID follow it into the pool thread
+    future = _get_hedge_pool().submit(contextvars.copy_context().run,
+                                      _timed, fn, *args)
+    future.add_done_callback(lambda _: _hedge_slots.release())
+    return future
+
+
+def _hedged(fn, args, timeout, deadline):
+    """
+    Runs fn, sending a second copy if the first is slower than p95.
+
+    The first successful answer wins. The slower request cannot be
+    interrupted and finishes in the background, but its result is unused.
+    When the pool has no idle thread the request runs in the caller's
+    thread without a hedge, rather than queueing for one.
+    """
+    if not _reserve_thread():
+        metrics.UPSTREAM_HEDGES.inc('skipped')
+        return _timed(fn, *args, timeout)
+
+    pending = {_submit(fn, *args, timeout)}
+    done, pending = wait(pending, timeout=hedge_delay())
+    remaining = deadline - time.monotonic()
+    if not done and remaining >= _MIN_ATTEMPT_TIME:
+        if not _reserve_thread():
+            metrics.UPSTREAM_HEDGES.inc('skipped')
+        elif not get_retry_budget().withdraw():
+            _hedge_slots.release()
+            metrics.RETRY_BUDGET_EXHAUSTED.inc('hedge')
+        else:
+            metrics.UPSTREAM_HEDGES.inc('sent')
+            pending.add(_submit(fn, *args, min(timeout, remaining)))
+
+    error = None
+    try:
+        while True:
+            for future in done:
+                try:
+                    return future.result()
+                except EmotionDetectionError as e:
+                    error = e
+            if not pending:
+                raise error
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+    finally:
+        # Only stops a loser that has not started yet; a running request
+        # cannot be interrupted
+        for future in pending:
+            future.cancel()
+
+
+def call_with_retry(fn, *args):
+    """
+    Calls fn(*args, timeout) with retries and optional hedging.
+
+    Args:
+        fn (callable): Upstream call taking a per-attempt timeout as its
+                       last argument and raising EmotionDetectionError
+        *args: Leading arguments for fn
+
+    Returns:
+        The first successful result
+
+    Raises:
+        EmotionDetectionError: The last error, once retries are exhausted
+    """
+    budget = get_retry_budget()
+    budget.deposit()
+    deadline = time.monotonic() + config.RETRY_DEADLINE
+    retries = 0
+    while True:
+        timeout = min(config.REQUEST_TIMEOUT, deadline - time.monotonic())
+        try:
+            if config.HEDGE_ENABLED:
+                return _hedged(fn, args, timeout, deadline)
+            return _timed(fn, *args, timeout)
+        except EmotionDetectionError as e:
+            delay = _next_delay(e, retries, deadline)
+            if delay is None:
+                raise
+        retries += 1
+        time.sleep(delay)
+
+
+async def _hedged_async(fn, args, timeout, deadline):
+    """
+    Awaits fn, sending a second copy if the first is slower than p95.
+
+    The first successful answer wins and the other request is cancelled.
+    """
+    pending = {asyncio.ensure_future(_timed_async(fn, *args, timeout))}
+    done, pending = await asyncio.wait(pending, timeout=hedge_delay())
+    if not done:
+        remaining = deadline - time.monotonic()
+        if remaining >= _MIN_ATTEMPT_TIME and get_retry_budget().withdraw():
+            metrics.UPSTREAM_HEDGES.inc('sent')
+            pending.add(asyncio.ensure_future(
+                _timed_async(fn, *args, min(timeout, remaining))))
+        elif remaining >= _MIN_ATTEMPT_TIME:
+            metrics.RETRY_BUDGET_EXHAUSTED.inc('hedge')
+
+    error = None
+    try:
+        while True:
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                if not isinstance(task.exception(), EmotionDetectionError):
+                    raise task.exception()
+                error = task.exception()
+            if not pending:
+                raise error
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call_with_retry_async(fn, *args):
+    """
+    Asynchronous call_with_retry: awaits fn(*args, timeout).
+
+    Returns:
+        The first successful result
+
+    Raises:
+        EmotionDetectionError: The last error, once retries are exhausted
+    """
+    budget = get_retry_budget()
+    budget.deposit()
+    deadline = time.monotonic() + config.RETRY_DEADLINE
+    retries = 0
+    while True:
+        timeout = min(config.REQUEST_TIMEOUT, deadline - time.monotonic())
+        try:
+            if config.HEDGE_ENABLED:
+                return await _hedged_async(fn, args, timeout, deadline)
+            return await _timed_async(fn, *args, timeout)
+        except EmotionDetectionError as e:
+            delay = _next_delay(e, retries, deadline)
+            if delay is None:
+                raise
+        retries += 1
+        await asyncio.sleep(delay)
+
+
+def _next_delay(error, retries, deadline):
+    """
+    Decides whether to retry after a failed attempt.
+
+    Returns:
+        float: Backoff delay before the next attempt, or None to give up
+    """
+    if not config.RETRY_ENABLED or not is_retryable(error):
+        return None
+    if retries + 1 >= config.RETRY_MAX_ATTEMPTS:
+        return None
+    delay = backoff_delay(retries + 1)
+    if time.monotonic() + delay + _MIN_ATTEMPT_TIME > deadline:
+        return None
+    if not get_retry_budget().withdraw():
+        metrics.RETRY_BUDGET_EXHAUSTED.inc('retry')
+        return None
+    metrics.UPSTREAM_RETRIES.inc(error.kind)
+    return delay
+
+
+_budget = None
+_tracker = None
+_singletons_lock = threading.Lock()
+
+
+def get_retry_budget():
+    """
+    Returns the process-wide retry budget.
+
+    Returns:
+        RetryBudget: Shared budget built from config
+    """
+    global _budget
+    if _budget is None:
+        with _singletons_lock:
+            if _budget is None:
+                _budget = RetryBudget(config.RETRY_BUDGET_RATIO,
+                                      config.RETRY_BUDGET_RESERVE)
+    return _budget
+
+
+def get_latency_tracker():
+    """
+    Returns the process-wide upstream latency tracker.
+
+    Returns:
+        LatencyTracker: Shared tracker
+    """
+    global _tracker
+    if _tracker is None:
+        with _singletons_lock:
+            if _tracker is None:
+                _tracker = LatencyTracker()
+    return _tracker
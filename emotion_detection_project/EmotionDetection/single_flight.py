@@ -0,0 +1,171 @@
+# single_flight.py
+# Request coalescing: concurrent callers for the same key share one call
+
+import asyncio
+import threading
+
+
+class _Call:
+    """One in-flight call and the callers waiting on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls that share a key (thread version).
+
+    The first caller for a key runs the function; callers that arrive
+    while it is running wait and receive the same result or exception.
+    Nothing is remembered once the call finishes, so errors are never
+    cached.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.saved = 0
+
+    def do(self, key, fn, *args):
+        """
+        Runs fn(*args) once per key among concurrent callers.
+
+        Args:
+            key (str): Deduplication key
+            fn (callable): Function to run
+            *args: Arguments for fn
+
+        Returns:
+            The value returned by fn
+
+        Raises:
+            Any exception raised by fn, in every waiting caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.saved += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.calls += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn(*args)
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        """
+        Returns the coalescing counters.
+
+        Returns:
+            dict: upstream calls made, calls saved and calls in flight
+        """
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'saved': self.saved,
+                'in_flight': len(self._calls)
+            }
+
+
+class _AsyncCall:
+    """One in-flight coroutine and the number of callers awaiting it."""
+
+    def __init__(self, future):
+        self.future = future
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """
+    Asyncio version of SingleFlight for use on one event loop.
+
+    A cancelled caller stops waiting without disturbing the others. Once
+    the last caller of a key is cancelled, nobody wants the result any
+    more, so the shared call itself is cancelled too.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.calls = 0
+        self.saved = 0
+
+    async def do(self, key, fn, *args):
+        """
+        Awaits fn(*args) once per key among concurrent callers.
+
+        Args:
+            key (str): Deduplication key
+            fn (callable): Coroutine function to run
+            *args: Arguments for fn
+
+        Returns:
+            The value returned by fn
+        """
+        call = self._calls.get(key)
+        if call is not None:
+            self.saved += 1
+        else:
+            self.calls += 1
+            call = _AsyncCall(asyncio.ensure_future(fn(*args)))
+            self._calls[key] = call
+            call.future.add_done_callback(lambda _: self._forget(key, call))
+
+        call.waiters += 1
+        try:
+            # Shield so one cancelled waiter does not cancel the others
+            return await asyncio.shield(call.future)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.future.done():
+                # Only reached by cancellation: the last waiter has left
+                self._forget(key, call)
+                call.future.cancel()
+
+    def _forget(self, key, call):
+        """Drops call from the in-flight table unless replaced already."""
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self):
+        """Returns the coalescing counters."""
+        return {
+            'calls': self.calls,
+            'saved': self.saved,
+            'in_flight': len(self._calls)
+        }
+
+
+_group = SingleFlight()
+
+# Coalesces identical in-flight texts on the event loop
+_async_group = AsyncSingleFlight()
+
+
+def get_group():
+    """Returns the process-wide SingleFlight used by emotion_detector."""
+    return _group
+
+
+def get_async_group():
+    """Returns the AsyncSingleFlight used by async_emotion_detector."""
+    return _async_group
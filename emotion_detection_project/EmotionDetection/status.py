@@ -0,0 +1,38 @@
+# status.py
+# Runtime status snapshot for the server's /status endpoint
+
+from . import cache
+from . import config
+from . import incremental
+from . import micro_batch
+from . import single_flight
+from .rate_limit import get_rate_limiter
+from .retry import get_retry_budget
+from .circuit_breaker import get_breaker
+
+
+def get_status():
+    """
+    Collects the state of the upstream protection layers.
+
+    Returns:
+        dict: Backend name, circuit breaker, cache, thread and asyncio
+              coalescing, retry budget, rate limit, micro-batching and
+              sentence cache stats
+    """
+    result_cache = cache.get_cache()
+    limiter = get_rate_limiter()
+    return {
+        'backend': config.BACKEND,
+        'circuit_breaker': (get_breaker().stats()
+                            if config.BREAKER_ENABLED else None),
+        'cache': result_cache.stats() if result_cache is not None else None,
+        'single_flight': single_flight.get_group().stats(),
+        'async_single_flight': single_flight.get_async_group().stats(),
+        'retry_budget': (get_retry_budget().stats()
+                         if config.RETRY_ENABLED else None),
+        'rate_limit': limiter.stats() if limiter is not None else None,
+        'micro_batch': (micro_batch.batch_stats()
+                        if config.MICRO_BATCH_ENABLED else None),
+        'sentence_cache': incremental.get_sentence_cache().stats()
+    }
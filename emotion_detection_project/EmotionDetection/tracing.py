@@ -0,0 +1,344 @@
+# tracing.py
+# Per-request tracing: request IDs, timing spans and a slow-request profiler
+#
+# The web servers start a trace per request; code anywhere in the detect
+# pipeline times its stage with span(). The current trace lives in a
+# context variable, so it follows the request through its thread or its
+# asyncio task. Outside a trace, span() is a shared no-op.
+
+import contextlib
+import contextvars
+import cProfile
+import heapq
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('emotion_trace', default=None)
+_NO_SPAN = contextlib.nullcontext()
+
+# Incoming request IDs are echoed in headers and logs, so only accept
+# short, printable tokens
+_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._:@/+=-]{1,128}$')
+
+
+class Trace:
+    """
+    Timings of one request.
+
+    Spans with the same name are summed, so a stage that runs several
+    times (e.g. one upstream call per chunk) reports its total time.
+
+    Args:
+        request_id (str): Request ID, echoed to clients and upstream
+    """
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.start = time.perf_counter()
+        self.end = None
+        self.spans = {}
+        # Text fingerprint(s) analyzed, so logs can be joined on them
+        self.fingerprints = []
+        # Threads that copied the request's context (document chunks,
+        # hedged calls) add to the same trace
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        """Adds seconds to the span called name."""
+        with self._lock:
+            span = self.spans.get(name)
+            if span is None:
+                self.spans[name] = [seconds, 1]
+            else:
+                span[0] += seconds
+                span[1] += 1
+
+    def _totals(self):
+        """Returns (name, seconds) for every span, as of now."""
+        with self._lock:
+            return [(name, seconds)
+                    for name, (seconds, _) in self.spans.items()]
+
+    @property
+    def duration(self):
+        """Seconds from the start of the trace until it ended (or now)."""
+        end = self.end if self.end is not None else time.perf_counter()
+        return end - self.start
+
+    def server_timing(self):
+        """
+        Formats the spans as a Server-Timing header value.
+
+        Returns:
+            str: e.g. 'upstream;dur=23.41, parse;dur=0.05, total;dur=24.10'
+        """
+        parts = [f'{name};dur={seconds * 1e3:.2f}'
+                 for name, seconds in self._totals()]
+        parts.append(f'total;dur={self.duration * 1e3:.2f}')
+        return ', '.join(parts)
+
+    def to_dict(self):
+        """
+        Summarizes the trace for logs.
+
+        Returns:
+            dict: request_id, duration_ms, per-span milliseconds and the
+                  fingerprints of analyzed texts, if any
+        """
+        record = {
+            'request_id': self.request_id,
+            'duration_ms': round(self.duration * 1e3, 3),
+            'spans': {name: round(seconds * 1e3, 3)
+                      for name, seconds in self._totals()}
+        }
+        if self.fingerprints:
+            record['fingerprints'] = self.fingerprints
+        return record
+
+
+class _Span:
+    """Times a block into a trace."""
+
+    __slots__ = ('trace', 'name', 'start')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.trace.add(self.name, time.perf_counter() - self.start)
+
+
+def span(name):
+    """
+    Times a stage of the current request.
+
+        with tracing.span('upstream'):
+            response = session.post(...)
+
+    Args:
+        name (str): Stage name, used as the Server-Timing metric name
+
+    Returns:
+        Context manager; a no-op when no trace is active
+    """
+    trace = _current.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name)
+
+
+def current_trace():
+    """Returns the active Trace, or None outside a traced request."""
+    return _current.get()
+
+
+def add_fingerprint(fingerprint):
+    """Records the fingerprint of a text analyzed by the current request."""
+    trace = _current.get()
+    if trace is not None:
+        trace.fingerprints.append(fingerprint)
+
+
+def current_request_id():
+    """Returns the active request ID, or None outside a traced request."""
+    trace = _current.get()
+    return trace.request_id if trace is not None else None
+
+
+def request_id_from(incoming):
+    """
+    Picks the request ID for a request.
+
+    Args:
+        incoming (str): Request ID header sent by the client, if any
+
+    Returns:
+        str: The incoming ID if it is well formed, else a new random ID
+    """
+    if incoming and _REQUEST_ID_RE.match(incoming):
+        return incoming
+    return os.urandom(16).hex()
+
+
+def start_trace(request_id=None):
+    """
+    Starts tracing the current request.
+
+    Args:
+        request_id (str): Incoming request ID header, if any
+
+    Returns:
+        tuple: (trace, token); pass token to finish_trace
+    """
+    trace = Trace(request_id_from(request_id))
+    return trace, _current.set(trace)
+
+
+def finish_trace(token):
+    """
+    Ends the current trace.
+
+    Args:
+        token: Token returned by start_trace
+
+    Returns:
+        Trace: The finished trace
+    """
+    trace = _current.get()
+    trace.end = time.perf_counter()
+    _current.reset(token)
+    return trace
+
+
+def log_trace(trace, **fields):
+    """
+    Emits a trace as one JSON log line on the EmotionDetection.tracing logger.
+
+    Args:
+        trace (Trace): Finished trace
+        **fields: Extra fields such as route, method and status
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    record = trace.to_dict()
+    record.update(fields)
+    logger.info(json.dumps(record, separators=(',', ':')))
+
+
+def configure_logging(stream=None):
+    """
+    Makes trace log lines reach the process output, for the servers.
+
+    The logger is set to config.TRACE_LOG_LEVEL. If the application has
+    configured logging (the root logger has handlers) the lines go there;
+    otherwise they are written as bare JSON lines to stream.
+
+    Args:
+        stream (file): Output for the lines (default: sys.stdout)
+    """
+    logger.setLevel(config.TRACE_LOG_LEVEL)
+    if logging.getLogger().handlers or logger.handlers:
+        return
+    handler = logging.StreamHandler(stream if stream is not None
+                                    else sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+class SlowestRequests:
+    """
+    Opt-in sampling profiler hook that keeps the slowest N requests.
+
+    A sampled request runs under cProfile. If it is among the slowest N
+    sampled so far, its profile is written to directory as
+    <duration_ms>ms-<request_id>.prof (readable with pstats or snakeviz)
+    and the file of the request it displaced is removed.
+
+    Args:
+        keep (int): Number of slowest requests to keep
+        directory (str): Where profiles are written
+    """
+
+    def __init__(self, keep, directory):
+        self.keep = keep
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._heap = []
+
+    def start(self, sample_rate):
+        """
+        Starts profiling the current request if it is sampled.
+
+        Args:
+            sample_rate (float): Probability of profiling this request
+
+        Returns:
+            cProfile.Profile: Running profiler, or None if not sampled
+        """
+        if sample_rate <= 0 or random.random() >= sample_rate:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            return None
+        return profiler
+
+    def finish(self, profiler, trace, **fields):
+        """
+        Stops a profiler and keeps its profile if the request was slow.
+
+        Args:
+            profiler (cProfile.Profile): Profiler returned by start
+            trace (Trace): The request's finished trace
+            **fields: Extra summary fields such as route
+        """
+        profiler.disable()
+        duration = trace.duration
+        with self._lock:
+            if len(self._heap) >= self.keep and duration <= self._heap[0][0]:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            # Request IDs may contain '/', which is not allowed in a name
+            name = trace.request_id[:64].replace('/', '_')
+            path = os.path.join(self.directory,
+                                f'{duration * 1e3:.1f}ms-{name}.prof')
+            profiler.dump_stats(path)
+            summary = trace.to_dict()
+            summary.update(fields)
+            summary['profile'] = path
+            entry = (duration, id(profiler), summary)
+            if len(self._heap) >= self.keep:
+                _, _, evicted = heapq.heapreplace(self._heap, entry)
+                with contextlib.suppress(OSError):
+                    os.remove(evicted['profile'])
+            else:
+                heapq.heappush(self._heap, entry)
+
+    def slowest(self):
+        """
+        Returns the kept requests, slowest first.
+
+        Returns:
+            list: Trace summaries with the path of each profile
+        """
+        with self._lock:
+            return [summary for _, _, summary
+                    in sorted(self._heap, key=lambda entry: -entry[0])]
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    """
+    Returns the process-wide slow-request profiler.
+
+    Returns:
+        SlowestRequests: Shared recorder built from config
+    """
+    global _profiler
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = SlowestRequests(config.TRACE_PROFILE_SLOWEST,
+                                            config.TRACE_PROFILE_DIR)
+    return _profiler
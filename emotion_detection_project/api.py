@@ -0,0 +1,122 @@
+"""
+Versioned JSON API for emotion detection.
+
+Returns the raw emotion score dictionaries instead of HTML pages:
+
+    GET  /api/v1/emotions?text=...      -> one result
+    POST /api/v1/emotions/batch         -> {"texts": [...]} scored concurrently
+    POST /api/v1/emotions/document      -> {"text": "..."} long text, chunked
+    POST /api/v1/emotions/incremental   -> {"text": "..."} edited text, only
+                                           changed sentences re-scored
+"""
+
+from flask import Blueprint, jsonify, request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from EmotionDetection import config
+from EmotionDetection.batch import emotion_detector_batch
+from EmotionDetection.document import detect_document
+from EmotionDetection.emotion_detector import (
+    EmotionDetectionError, detect_emotions, empty_result
+)
+from EmotionDetection.incremental import detect_incremental
+from EmotionDetection.rate_limit import RateLimitedError
+from http_cache import retry_after_header
+
+api = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+
+def _error(message, status_code):
+    """Build a JSON error response."""
+    return jsonify({'error': message}), status_code
+
+
+def _failure_status(error):
+    """502 when the upstream failed, 422 when it rejected the text."""
+    return 502 if error.is_upstream_failure else 422
+
+
+def _overloaded(error):
+    """Build the JSON 503 for a request shed by the upstream rate limit."""
+    response = jsonify({'error': str(error)})
+    response.status_code = 503
+    response.headers['Retry-After'] = retry_after_header(error)
+    return response
+
+
+@api.route('/emotions', methods=['GET'])
+def detect():
+    """Score one text passed as the `text` query parameter."""
+    text = request.args.get('text')
+    if not text or text.strip() == "":
+        return _error("Query parameter 'text' must not be blank", 400)
+
+    try:
+        result = detect_emotions(text)
+    except RateLimitedError as e:
+        return _overloaded(e)
+    except EmotionDetectionError as e:
+        result = empty_result()
+        result['error'] = str(e)
+        return jsonify(result), _failure_status(e)
+    result['error'] = None
+    return jsonify(result)
+
+
+@api.route('/emotions/batch', methods=['POST'])
+def detect_batch():
+    """
+    Score an array of texts concurrently in a single request.
+
+    Texts shed by the upstream rate limit get their own error, like any
+    other per-text failure; the request itself still succeeds.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('texts'), list):
+        return _error("Body must be a JSON object with a 'texts' array", 400)
+
+    texts = payload['texts']
+    if len(texts) > config.API_MAX_BATCH_TEXTS:
+        return _error(
+            f"At most {config.API_MAX_BATCH_TEXTS} texts per request", 413)
+
+    results = emotion_detector_batch(texts)
+    return jsonify({'results': results})
+
+
+def _score_text_payload(detect, option):
+    """Validate a {"text": ...} body and score it with detect."""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('text'), str):
+        return _error("Body must be a JSON object with a 'text' string", 400)
+
+    text = payload['text']
+    if text.strip() == "":
+        return _error("'text' must not be blank", 400)
+
+    try:
+        result = detect(text, bool(payload.get(option)))
+    except RateLimitedError as e:
+        return _overloaded(e)
+    except EmotionDetectionError as e:
+        return _error(str(e), _failure_status(e))
+    return jsonify(result)
+
+
+@api.route('/emotions/document', methods=['POST'])
+def detect_long_document():
+    """Score a long text chunk by chunk, optionally with the breakdown."""
+    return _score_text_payload(detect_document, 'chunks')
+
+
+@api.route('/emotions/incremental', methods=['POST'])
+def detect_edited_text():
+    """Score an edited text, re-scoring only its new sentences."""
+    return _score_text_payload(detect_incremental, 'sentences')
+
+
+@api.errorhandler(RequestEntityTooLarge)
+def payload_too_large(error):
+    """Return a JSON 413 when the body exceeds MAX_CONTENT_LENGTH."""
+    return _error(
+        f"Request body larger than {config.API_MAX_CONTENT_LENGTH} bytes", 413)
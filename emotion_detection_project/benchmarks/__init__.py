@@ -0,0 +1,2 @@
+# benchmarks package
+# Offline performance benchmarks run against a local stub of the Watson API
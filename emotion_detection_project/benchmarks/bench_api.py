@@ -0,0 +1,74 @@
+# bench_api.py
+# Texts/sec: bulk JSON POST vs one HTML GET /emotionDetector per text
+#
+# Runs server.py in-process against the stub Watson server. Usage (from
+# the emotion_detection_project directory):
+#     python -m benchmarks.bench_api [--texts N] [--latency SECONDS]
+
+import argparse
+import logging
+import threading
+import time
+from unittest.mock import patch
+
+import requests
+from werkzeug.serving import make_server
+
+from EmotionDetection import config, http_pool
+from benchmarks.stub_watson import start_stub_server
+from server import app
+
+
+def main():
+    """Score the same texts through both routes and print texts/sec."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--texts', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+
+    # Silence per-request access logs
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    stub, stub_url = start_stub_server(latency=args.latency)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    client = requests.Session()
+
+    # Distinct texts per run and no cache, so every text reaches the stub
+    with patch.object(config, 'WATSON_URL', stub_url), \
+            patch.object(config, 'CACHE_ENABLED', False), \
+            patch.object(config, 'BATCH_MAX_WORKERS', args.workers):
+        try:
+            start = time.perf_counter()
+            html_bytes = 0
+            for i in range(args.texts):
+                response = client.get(base_url + '/emotionDetector',
+                                      params={'textToAnalyze': f'glad {i}'})
+                html_bytes += len(response.content)
+            per_text = args.texts / (time.perf_counter() - start)
+
+            texts = [f'happy {i}' for i in range(args.texts)]
+            start = time.perf_counter()
+            response = client.post(base_url + '/api/v1/emotions/batch',
+                                   json={'texts': texts})
+            bulk = args.texts / (time.perf_counter() - start)
+            failures = sum(1 for r in response.json()['results']
+                           if r['error'] is not None)
+        finally:
+            server.shutdown()
+            http_pool.close_session()
+            stub.shutdown()
+
+    print(f"{args.texts} texts, upstream latency {args.latency * 1000:.0f} ms")
+    print(f"GET /emotionDetector per text : {per_text:8.1f} texts/s "
+          f"({html_bytes / args.texts:.0f} bytes/text)")
+    print(f"POST /api/v1/emotions/batch   : {bulk:8.1f} texts/s "
+          f"({len(response.content) / args.texts:.0f} bytes/text, "
+          f"{failures} failures)")
+    print(f"speedup                       : {bulk / per_text:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
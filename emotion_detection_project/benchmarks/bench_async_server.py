@@ -0,0 +1,130 @@
+# bench_async_server.py
+# Load test: Flask (fixed worker threads) vs aiohttp server_async
+#
+# Both servers score every request against a local stub Watson server
+# with simulated upstream latency. Usage (from emotion_detection_project):
+#     python -m benchmarks.bench_async_server [--requests N]
+#         [--concurrency C] [--sync-threads T] [--latency SECONDS]
+
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import aiohttp
+from aiohttp import web
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from EmotionDetection import config, http_pool
+from benchmarks.stub_watson import start_stub_server
+from server import app as flask_app
+from server_async import create_app
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler that skips per-request access logging."""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server handling requests on a fixed-size thread pool."""
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app, handler=QuietRequestHandler)
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def start_flask_server(threads):
+    """Start the Flask app with `threads` worker threads."""
+    server = PooledWSGIServer('127.0.0.1', 0, flask_app, threads)
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def start_async_server():
+    """Start server_async on its own event loop thread."""
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(create_app())
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, '127.0.0.1', 0, backlog=1024)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop, runner, f"http://127.0.0.1:{port}"
+
+
+async def _drive(base_url, total, concurrency):
+    """Send `total` requests with `concurrency` in flight; return req/s."""
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    failures = 0
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def one(i):
+            nonlocal failures
+            async with semaphore:
+                params = {'textToAnalyze': f'I am glad {i}'}
+                async with session.get(base_url + '/emotionDetector',
+                                       params=params) as response:
+                    body = await response.text()
+                    if 'Analysis Result' not in body:
+                        failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    return total / elapsed, failures
+
+
+def main():
+    """Run the sync vs async load test and print a summary."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--sync-threads', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub_server(latency=args.latency)
+    with patch.object(config, 'WATSON_URL', stub_url), \
+            patch.object(config, 'POOL_MAXSIZE', args.sync_threads):
+        flask_server, flask_url = start_flask_server(args.sync_threads)
+        loop, runner, async_url = start_async_server()
+        try:
+            sync_rps, sync_failures = asyncio.run(
+                _drive(flask_url, args.requests, args.concurrency))
+            async_rps, async_failures = asyncio.run(
+                _drive(async_url, args.requests, args.concurrency))
+        finally:
+            flask_server.shutdown()
+            asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            http_pool.close_session()
+            stub.shutdown()
+
+    print(f"upstream latency {args.latency * 1000:.0f} ms, "
+          f"{args.concurrency} concurrent clients")
+    print(f"Flask, {args.sync_threads} threads : {sync_rps:8.1f} req/s "
+          f"({sync_failures} failures)")
+    print(f"aiohttp server_async  : {async_rps:8.1f} req/s "
+          f"({async_failures} failures)")
+    print(f"speedup               : {async_rps / sync_rps:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+# bench_bulk.py
+# Vectorized bulk scorer vs per-text emotion_detector on the local backend
+#
+# Usage (from the emotion_detection_project directory):
+#     python -m benchmarks.bench_bulk [--batch-size N] [--batches B]
+
+import argparse
+import time
+from unittest.mock import patch
+
+from EmotionDetection import config, emotion_detector
+from EmotionDetection.bulk import score_texts
+from benchmarks.bench_local_backend import make_texts
+
+
+def main():
+    """Compare texts/sec of both paths on identical input."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--batches', type=int, default=20)
+    args = parser.parse_args()
+    batches = [make_texts(args.batch_size, seed=i)
+               for i in range(args.batches)]
+    total = args.batch_size * args.batches
+
+    with patch.object(config, 'BACKEND', 'local'), \
+            patch.object(config, 'CACHE_ENABLED', False):
+        start = time.perf_counter()
+        for batch in batches:
+            for text in batch:
+                emotion_detector(text)
+        per_text = total / (time.perf_counter() - start)
+
+    # Warm the token memo once, as a long-running job would
+    score_texts(batches[0])
+    start = time.perf_counter()
+    for batch in batches:
+        score_texts(batch)
+    bulk = total / (time.perf_counter() - start)
+
+    print(f"batch size {args.batch_size}, {total} texts")
+    print(f"emotion_detector per text : {per_text:10.0f} texts/s")
+    print(f"bulk.score_texts          : {bulk:10.0f} texts/s")
+    print(f"speedup                   : {bulk / per_text:10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# bench_connection_pool.py
+# Compares per-call requests.post against the shared keep-alive session
+#
+# Usage (from the emotion_detection_project directory):
+#     python -m benchmarks.bench_connection_pool [--requests N] [--threads T]
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import requests
+
+from EmotionDetection import config, emotion_detector, http_pool
+from benchmarks.stub_watson import start_stub_server
+
+
+def _run(total, threads):
+    """Score `total` texts on `threads` threads and return requests/sec."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(emotion_detector, ["I am glad"] * total))
+    elapsed = time.perf_counter() - start
+    failures = sum(1 for r in results if r['dominant_emotion'] is None)
+    return total / elapsed, failures
+
+
+def main():
+    """Run the before/after benchmark and print a summary."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    server, url = start_stub_server()
+    try:
+        # Disable the result cache so every call reaches the stub
+        with patch.object(config, 'WATSON_URL', url), \
+                patch.object(config, 'CACHE_ENABLED', False):
+            # Before: a fresh session (and TCP connection) per call
+            class _OneShot:
+                post = staticmethod(requests.post)
+
+            with patch.object(http_pool, 'get_session', return_value=_OneShot):
+                before, before_failures = _run(args.requests, args.threads)
+
+            # After: the shared pooled session
+            http_pool.close_session()
+            after, after_failures = _run(args.requests, args.threads)
+    finally:
+        http_pool.close_session()
+        server.shutdown()
+
+    print(f"requests.post per call : {before:8.1f} req/s "
+          f"({before_failures} failures)")
+    print(f"shared pooled session  : {after:8.1f} req/s "
+          f"({after_failures} failures)")
+    print(f"speedup                : {after / before:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# bench_http_cache.py
+# Revalidated (304) vs full /emotionDetector requests, and bytes per encoding
+#
+# Runs server.py in-process against the stub Watson server. Usage (from
+# the emotion_detection_project directory):
+#     python -m benchmarks.bench_http_cache [--requests N] [--latency SECONDS]
+
+import argparse
+import time
+from unittest.mock import patch
+
+import http_cache
+from EmotionDetection import config
+from benchmarks.stub_watson import start_stub_server
+from server import app
+
+
+def main():
+    """Print latency of full vs revalidated requests and response sizes."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub_server(latency=args.latency)
+    client = app.test_client()
+    url = '/emotionDetector?textToAnalyze=I%20am%20glad%20it%20is%20sunny'
+
+    # No result cache, so every full request reaches the stub
+    with patch.object(config, 'WATSON_URL', stub_url), \
+            patch.object(config, 'CACHE_ENABLED', False):
+        try:
+            etag = client.get(url).headers['ETag']
+
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                client.get(url)
+            full_ms = (time.perf_counter() - start) / args.requests * 1e3
+
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                client.get(url, headers={'If-None-Match': etag})
+            revalidate_ms = (time.perf_counter() - start) / args.requests * 1e3
+
+            sizes = {}
+            for encoding in (None,) + http_cache.SUPPORTED_ENCODINGS:
+                headers = {'Accept-Encoding': encoding or 'identity'}
+                sizes[encoding or 'identity'] = len(
+                    client.get(url, headers=headers).data)
+        finally:
+            stub.shutdown()
+
+    print(f"full request:        {full_ms:.2f} ms "
+          f"(stub latency {args.latency * 1e3:.0f} ms)")
+    print(f"304 revalidation:    {revalidate_ms:.2f} ms "
+          f"({full_ms / revalidate_ms:.0f}x faster, no upstream call)")
+    for encoding, size in sizes.items():
+        print(f"result page {encoding + ':':10} {size} B")
+
+
+if __name__ == '__main__':
+    main()
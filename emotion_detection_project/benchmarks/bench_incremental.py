@@ -0,0 +1,109 @@
+# bench_incremental.py
+# Simulated editor sessions: whole-text re-analysis vs incremental mode
+#
+# A session starts from a paragraph of --sentences sentences and applies
+# --edits random edits (reword, insert or delete a sentence), re-submitting
+# the whole text after each, as an editor integration does. The local
+# backend is given a Watson-like cost of --call-ms per call plus --kb-ms
+# per KB of text, so backend time is what the two modes differ in.
+#
+# Usage (from the emotion_detection_project directory):
+#     python -m benchmarks.bench_incremental [--sessions N] [--edits N]
+#                                            [--sentences N]
+
+import argparse
+import random
+import time
+from unittest.mock import patch
+
+from EmotionDetection import config, emotion_detector, metrics
+from EmotionDetection.backends import LocalBackend
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.incremental import (
+    clear_sentence_cache, incremental_emotion_detector
+)
+from benchmarks.bench_local_backend import SAMPLE_TEXTS
+
+WORDS = ["really", "truly", "honestly", "somewhat", "very", "quite"]
+
+
+def edit_session(sentences, edits, seed):
+    """Yields the full text after each of `edits` random edits."""
+    rng = random.Random(seed)
+    doc = [f"{rng.choice(SAMPLE_TEXTS)} ({i})." for i in range(sentences)]
+    yield ' '.join(doc)
+    for _ in range(edits):
+        kind = rng.random()
+        i = rng.randrange(len(doc))
+        if kind < 0.7:
+            words = doc[i].split()
+            words.insert(rng.randrange(len(words)), rng.choice(WORDS))
+            doc[i] = ' '.join(words)
+        elif kind < 0.85 or len(doc) < 2:
+            doc.insert(i, f"{rng.choice(SAMPLE_TEXTS)} ({rng.random():.6f}).")
+        else:
+            del doc[i]
+        yield ' '.join(doc)
+
+
+def backend_cost(call_seconds, kb_seconds, sent):
+    """Patches LocalBackend.detect with a per-call and per-KB latency."""
+    detect = LocalBackend.detect
+
+    def slow(self, text):
+        sent.append(len(text))
+        time.sleep(call_seconds + kb_seconds * len(text) / 1024)
+        return detect(self, text)
+
+    return patch.object(LocalBackend, 'detect', slow)
+
+
+def run(detector, args):
+    """Returns per-edit latencies (s), backend calls and characters sent."""
+    sent = []
+    latencies = []
+    with backend_cost(args.call_ms / 1e3, args.kb_ms / 1e3, sent):
+        for session in range(args.sessions):
+            for text in edit_session(args.sentences, args.edits, session):
+                start = time.perf_counter()
+                detector(text)
+                latencies.append(time.perf_counter() - start)
+    return latencies, len(sent), sum(sent)
+
+
+def main():
+    """Compare backend calls, characters sent and latency per edit."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sessions', type=int, default=5)
+    parser.add_argument('--edits', type=int, default=50)
+    parser.add_argument('--sentences', type=int, default=20)
+    parser.add_argument('--call-ms', type=float, default=20)
+    parser.add_argument('--kb-ms', type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions x {args.edits} edits, "
+          f"{args.sentences} sentences, backend {args.call_ms:g} ms/call "
+          f"+ {args.kb_ms:g} ms/KB")
+    with patch.object(config, 'BACKEND', 'local'):
+        for label, detector in (('whole text', emotion_detector),
+                                ('incremental', incremental_emotion_detector)):
+            clear_cache()
+            clear_sentence_cache()
+            metrics.reset()
+            latencies, calls, chars = run(detector, args)
+            latencies.sort()
+            submissions = len(latencies)
+            print(f"{label:<12}: {calls / submissions:5.2f} calls/edit, "
+                  f"{chars / submissions:7.0f} chars/edit, "
+                  f"p50 {latencies[submissions // 2] * 1e3:6.1f} ms, "
+                  f"p99 {latencies[int(submissions * 0.99)] * 1e3:6.1f} ms")
+            if detector is incremental_emotion_detector:
+                reused = metrics.get_value(metrics.INCREMENTAL_SENTENCES,
+                                           'reused')
+                scored = metrics.get_value(metrics.INCREMENTAL_SENTENCES,
+                                           'scored')
+                print(f"  sentence reuse ratio {reused / (reused + scored):.1%}")
+
+
+if __name__ == '__main__':
+    main()
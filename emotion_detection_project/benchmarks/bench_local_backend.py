@@ -0,0 +1,58 @@
+# bench_local_backend.py
+# Throughput of the offline lexicon backend in texts per second
+#
+# Usage (from the emotion_detection_project directory):
+#     python -m benchmarks.bench_local_backend [--texts N]
+
+import argparse
+import random
+import time
+from unittest.mock import patch
+
+from EmotionDetection import config, emotion_detector
+from EmotionDetection.backends import get_backend
+
+SAMPLE_TEXTS = [
+    "I am glad this happened",
+    "I am really mad about this",
+    "I feel disgusted just hearing about this",
+    "I am so sad about this",
+    "I am really afraid that this will happen",
+    "The delivery was late again and nobody answered my emails, "
+    "this is unacceptable and I am not happy at all",
+    "Thanks so much, the support team was wonderful and I love the product",
+]
+
+
+def make_texts(count, seed=0):
+    """Build `count` distinct texts so caching does not skew results."""
+    rng = random.Random(seed)
+    return [f"{rng.choice(SAMPLE_TEXTS)} #{i}" for i in range(count)]
+
+
+def main():
+    """Measure raw backend and full emotion_detector throughput."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--texts', type=int, default=50000)
+    args = parser.parse_args()
+    texts = make_texts(args.texts)
+
+    backend = get_backend('local')
+    start = time.perf_counter()
+    for text in texts:
+        backend.detect(text)
+    raw = len(texts) / (time.perf_counter() - start)
+
+    with patch.object(config, 'BACKEND', 'local'), \
+            patch.object(config, 'CACHE_ENABLED', False):
+        start = time.perf_counter()
+        for text in texts:
+            emotion_detector(text)
+        full = len(texts) / (time.perf_counter() - start)
+
+    print(f"LocalBackend.detect       : {raw:10.0f} texts/s")
+    print(f"emotion_detector (local)  : {full:10.0f} texts/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# bench_metrics.py
+# Hot-path cost of the per-thread metrics vs a lock-protected counter
+#
+# Usage (from the emotion_detection_project directory):
+#     python -m benchmarks.bench_metrics [--ops N] [--threads T]
+
+import argparse
+import threading
+import time
+
+from EmotionDetection import metrics
+
+
+class LockedCounter:
+    """The straightforward alternative: one shared dict behind a lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + 1
+
+
+def _ns_per_op(fn, ops, threads):
+    """Runs fn ops times on each of threads threads; returns ns per call."""
+    def work():
+        for _ in range(ops):
+            fn()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (ops * threads) * 1e9
+
+
+def main():
+    """Print ns per update for each metric type."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ops', type=int, default=200000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    locked = LockedCounter()
+    counter = metrics.Counter('bench_total', 'Benchmark counter.', ('route',))
+    histogram = metrics.Histogram('bench_seconds', 'Benchmark histogram.')
+    cases = [
+        ('locked counter', lambda: locked.inc('/')),
+        ('Counter.inc', lambda: counter.inc('/')),
+        ('Histogram.observe', lambda: histogram.observe(0.03)),
+    ]
+    for threads in (1, args.threads):
+        for name, fn in cases:
+            ns = _ns_per_op(fn, args.ops, threads)
+            print(f"{name:18} {threads} thread(s): {ns:6.0f} ns/op")
+
+    start = time.perf_counter()
+    metrics.render()
+    print(f"render /metrics: {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# bench_micro_batch.py
+# Concurrent emotion_detector throughput with and without micro-batching
+#
+# Many threads (or asyncio tasks) score distinct texts on the local
+# backend, as a busy web server would; micro-batching turns their single
+# calls into vectorized detect_many batches. --model-latency adds a fixed
+# cost per backend call, served one call at a time, to model an inference
+# server or GPU whose cost is per call rather than per text.
+#
+# Usage (from the emotion_detection_project directory):
+#     python -m benchmarks.bench_micro_batch [--texts N] [--concurrency C]
+#                                            [--model-latency MS]
+
+import argparse
+import asyncio
+import contextlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from EmotionDetection import config, emotion_detector, metrics
+from EmotionDetection.async_detector import async_emotion_detector
+from EmotionDetection.backends import LocalBackend
+from benchmarks.bench_local_backend import make_texts
+
+
+def run_threads(texts, concurrency):
+    """Returns texts/s and per-call latencies with a thread pool."""
+    latencies = []
+
+    def call(text):
+        start = time.perf_counter()
+        emotion_detector(text)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, texts))
+    return len(texts) / (time.perf_counter() - start), latencies
+
+
+def run_async(texts, concurrency):
+    """Returns texts/s with `concurrency` asyncio workers."""
+    async def main():
+        queue = list(reversed(texts))
+
+        async def worker():
+            while queue:
+                await async_emotion_detector(queue.pop())
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return len(texts) / (time.perf_counter() - start)
+
+
+def model_latency(seconds):
+    """Makes every LocalBackend call cost `seconds`, one call at a time."""
+    if not seconds:
+        return contextlib.nullcontext()
+    busy = threading.Lock()
+    detect, detect_many = LocalBackend.detect, LocalBackend.detect_many
+
+    def slow(fn):
+        def call(self, arg):
+            with busy:
+                time.sleep(seconds)
+                return fn(self, arg)
+        return call
+
+    stack = contextlib.ExitStack()
+    stack.enter_context(patch.object(LocalBackend, 'detect', slow(detect)))
+    stack.enter_context(
+        patch.object(LocalBackend, 'detect_many', slow(detect_many)))
+    return stack
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def main():
+    """Compare throughput and latency with batching off and on."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--texts', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--model-latency', type=float, default=0,
+                        help="milliseconds per backend call (default 0)")
+    args = parser.parse_args()
+
+    print(f"{args.texts} texts, concurrency {args.concurrency}, "
+          f"window {config.MICRO_BATCH_MAX_SIZE} texts / "
+          f"{config.MICRO_BATCH_MAX_WAIT * 1e3:g} ms, "
+          f"model latency {args.model_latency:g} ms")
+    with patch.object(config, 'BACKEND', 'local'), \
+            patch.object(config, 'CACHE_ENABLED', False), \
+            model_latency(args.model_latency / 1e3):
+        for enabled in (False, True):
+            metrics.reset()
+            with patch.object(config, 'MICRO_BATCH_ENABLED', enabled):
+                texts = make_texts(args.texts, seed=int(enabled))
+                rate, latencies = run_threads(texts, args.concurrency)
+                async_rate = run_async(texts, args.concurrency)
+            label = 'on ' if enabled else 'off'
+            print(f"batching {label}: threads {rate:8.0f} texts/s "
+                  f"(p50 {percentile(latencies, 50) * 1e3:.2f} ms, "
+                  f"p99 {percentile(latencies, 99) * 1e3:.2f} ms), "
+                  f"asyncio {async_rate:8.0f} texts/s")
+            if enabled:
+                cells = metrics.get_value(metrics.MICRO_BATCH_SIZE)
+                batches = sum(cells[:-1])
+                print(f"  {batches} batches, mean size "
+                      f"{args.texts * 2 / batches:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# bench_normalize.py
+# Cost of text canonicalization and fingerprinting per KB of input
+#
+# Usage (from the emotion_detection_project directory):
+#     python -m benchmarks.bench_normalize [--size BYTES]
+
+import argparse
+import timeit
+import unicodedata
+from unittest.mock import patch
+
+from EmotionDetection import config
+from EmotionDetection.normalize import canonicalize, fingerprint, normalize_text
+
+SAMPLES = {
+    'ascii': "I am really glad this happened, thanks  so much!\n",
+    'latin (NFC)': "Je suis très content, merci beaucoup à l'équipe. ",
+    'latin (NFD)': unicodedata.normalize(
+        'NFD', "Je suis très content, merci beaucoup à l'équipe. "),
+    'cjk': "今日はとても嬉しいです。ありがとうございます。",
+}
+
+
+def per_kb(fn, text, number):
+    """Microseconds per KB of UTF-8 input."""
+    seconds = min(timeit.repeat(lambda: fn(text), number=number, repeat=5))
+    return seconds / number * 1e6 / (len(text.encode('utf-8')) / 1024)
+
+
+def main():
+    """Print per-KB costs of each stage on several scripts."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=1024,
+                        help="approximate input size in bytes (default 1024)")
+    args = parser.parse_args()
+
+    print(f"~{args.size} B inputs, microseconds per KB")
+    print(f"{'input':<13}{'normalize':>11}{'+ lower':>10}"
+          f"{'fingerprint':>13}{'canonicalize':>14}")
+    for name, sample in SAMPLES.items():
+        repeat = max(1, args.size // len(sample.encode('utf-8')))
+        text = sample * repeat
+        number = max(100, 2000000 // args.size)
+        canonical = normalize_text(text)
+        with patch.object(config, 'NORMALIZE_CASE', 'preserve'):
+            normalize = per_kb(normalize_text, text, number)
+            full = per_kb(canonicalize, text, number)
+        lower = per_kb(lambda t: normalize_text(t, case='lower'), text, number)
+        digest = per_kb(fingerprint, canonical, number)
+        print(f"{name:<13}{normalize:>11.2f}{lower:>10.2f}"
+              f"{digest:>13.2f}{full:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# bench_pages.py
+# Render time and bytes: precompiled pages vs the old inline f-string pages
+#
+# Usage (from the emotion_detection_project directory):
+#     python -m benchmarks.bench_pages [--renders N]
+
+import argparse
+import time
+
+import pages
+from server import app
+
+RESULT = ("For the given statement, the system response is 'anger': 0.01, "
+          "'disgust': 0.02, 'fear': 0.03, 'joy': 0.9 and 'sadness': 0.04. "
+          "The dominant emotion is joy.")
+
+
+def legacy_success_page(text_to_analyze, result):
+    """The pre-pages.py success page: inline CSS, unescaped text."""
+    return f'''
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Emotion Analysis Result</title>
+        <style>
+            body {{
+                font-family: Arial, sans-serif;
+                margin: 40px;
+            }}
+            .container {{
+                max-width: 600px;
+                margin: 0 auto;
+            }}
+            .result {{
+                margin-top: 20px;
+                padding: 15px;
+                background-color: #f0f8ff;
+                border: 1px solid #ddd;
+                border-radius: 5px;
+            }}
+            .back-link {{
+                margin-top: 20px;
+            }}
+            .back-link a {{
+                color: #007cba;
+                text-decoration: none;
+            }}
+            .back-link a:hover {{
+                text-decoration: underline;
+            }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <h1>Emotion Analysis Result</h1>
+            <p><strong>Analyzed Text:</strong> "{text_to_analyze}"</p>
+
+            <div class="result">
+                <h3>Analysis Result:</h3>
+                <p>{result}</p>
+            </div>
+
+            <div class="back-link">
+                <a href="/">&larr; Analyze Another Text</a>
+            </div>
+        </div>
+    </body>
+    </html>
+    '''
+
+
+def _time(fn, renders):
+    """Microseconds per call of fn(text, RESULT)."""
+    start = time.perf_counter()
+    for i in range(renders):
+        fn(f"I am glad it's sunny today {i}", RESULT)
+    return (time.perf_counter() - start) / renders * 1e6
+
+
+def main():
+    """Print per-render cost and bytes on the wire for both versions."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--renders', type=int, default=100000)
+    args = parser.parse_args()
+
+    legacy_us = _time(legacy_success_page, args.renders)
+    new_us = _time(pages.render_success_page, args.renders)
+    legacy_bytes = len(legacy_success_page('I am glad', RESULT).encode())
+    new_bytes = len(pages.render_success_page('I am glad', RESULT).encode())
+    print(f"result page render: {legacy_us:.2f} us -> {new_us:.2f} us "
+          f"({legacy_us / new_us:.1f}x)")
+    print(f"result page size:   {legacy_bytes} B -> {new_bytes} B "
+          f"(+ {len(pages.STYLESHEET)} B stylesheet, fetched once)")
+
+    with app.test_client() as client:
+        first = client.get('/')
+        repeat = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    print(f"index page:         {len(first.data)} B first visit, "
+          f"{len(repeat.data)} B on revalidation ({repeat.status_code})")
+    print("(the old index page was 1640 B on every visit, CSS inlined)")
+
+
+if __name__ == '__main__':
+    main()
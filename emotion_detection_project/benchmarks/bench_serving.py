@@ -0,0 +1,122 @@
+# bench_serving.py
+# Load test: Flask development server vs gunicorn (gunicorn.conf.py)
+#
+# Starts each server as a subprocess pointed at the local stub Watson
+# server, then drives /emotionDetector with concurrent clients. Usage
+# (from the emotion_detection_project directory):
+#     python -m benchmarks.bench_serving [--requests N] [--concurrency C]
+#         [--workers W] [--threads T] [--latency SECONDS]
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+from benchmarks.stub_watson import start_stub_server
+
+
+def _free_port():
+    """Return a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(url, timeout=20):
+    """Poll `url` until the server answers."""
+    import requests
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start")
+
+
+async def _drive(base_url, total, concurrency):
+    """Send `total` requests, `concurrency` at a time; return req/s."""
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async with aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        async def one(i):
+            nonlocal failures
+            async with semaphore:
+                try:
+                    async with session.get(
+                            base_url + '/emotionDetector',
+                            params={'textToAnalyze': f'I am glad {i}'}) as r:
+                        if 'Analysis Result' not in await r.text():
+                            failures += 1
+                except aiohttp.ClientError:
+                    failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return total / (time.perf_counter() - start), failures
+
+
+def _run(command, env, port, args):
+    """Start a server subprocess, load test it, and stop it gracefully."""
+    process = subprocess.Popen(command, env=env,
+                               stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_until_up(base_url + '/')
+        return asyncio.run(_drive(base_url, args.requests, args.concurrency))
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+
+
+def main():
+    """Compare both serving modes and print a summary."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() * 2 + 1)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub_server(latency=args.latency)
+    env = dict(os.environ, EMOTION_WATSON_URL=stub_url,
+               EMOTION_CACHE_ENABLED='false', GUNICORN_ACCESS_LOG='')
+    try:
+        # Before: the previous production setup, dev server in debug mode
+        port = _free_port()
+        dev_rps, dev_failures = _run(
+            [sys.executable, 'server.py'],
+            dict(env, PORT=str(port), FLASK_DEBUG='1'), port, args)
+
+        port = _free_port()
+        gunicorn_env = dict(env, PORT=str(port),
+                            WEB_CONCURRENCY=str(args.workers),
+                            GUNICORN_THREADS=str(args.threads))
+        prod_rps, prod_failures = _run(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+             'wsgi:app'], gunicorn_env, port, args)
+    finally:
+        stub.shutdown()
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent clients, "
+          f"upstream latency {args.latency * 1000:.0f} ms")
+    print(f"python server.py (debug dev server)  : {dev_rps:8.1f} req/s "
+          f"({dev_failures} failures)")
+    print(f"gunicorn {args.workers} workers x {args.threads} threads"
+          f"{'':<6}: {prod_rps:8.1f} req/s ({prod_failures} failures)")
+    print(f"speedup                              : {prod_rps / dev_rps:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
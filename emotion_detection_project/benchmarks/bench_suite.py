@@ -0,0 +1,424 @@
+# bench_suite.py
+# Reproducible offline benchmark suite with JSON results for regression checks
+#
+# Starts the stub Watson server (in its own process, so it does not compete
+# for this one's GIL) with configurable latency, jitter and error rate,
+# then drives emotion_detector and emotion_predictor in
+# process and the Flask routes on a server subprocess (server.py or
+# gunicorn), at a fixed concurrency. Each scenario reports throughput,
+# p50/p95/p99 latency, failures and memory (of this process, or of the
+# server for routes); the results are written as JSON and can be compared
+# against a saved run to catch regressions between commits.
+#
+# Usage (from the emotion_detection_project directory):
+#     python -m benchmarks.bench_suite [--requests N] [--concurrency C]
+#         [--latency S] [--jitter S] [--error-rate F] [--scenarios a,b]
+#         [--server flask|gunicorn] [--output PATH]
+#         [--compare BASELINE.json] [--tracemalloc]
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import signal
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import requests
+
+from EmotionDetection import config, emotion_detector, emotion_predictor
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.circuit_breaker import get_breaker
+from benchmarks.bench_serving import _free_port, _wait_until_up
+
+SCENARIOS = ('emotion_detector', 'emotion_predictor',
+             'route:/emotionDetector', 'route:/api/v1/emotions')
+
+# Scenario metrics compared by --compare, and whether higher is better
+COMPARED = (('throughput', True), ('p50_ms', False), ('p95_ms', False),
+            ('p99_ms', False))
+
+
+def percentile(ordered, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def _proc_memory(pid):
+    """(VmRSS, VmHWM) of a process in MB, read from /proc."""
+    with open(f"/proc/{pid}/status") as f:
+        fields = dict(line.split(':', 1) for line in f)
+    return (int(fields['VmRSS'].split()[0]) / 1024,
+            int(fields['VmHWM'].split()[0]) / 1024)
+
+
+def _children(pid):
+    """Child process IDs of a process (e.g. gunicorn workers)."""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def memory_mb(pid=None):
+    """
+    Resident set size of a process and its children, now and at peak.
+
+    The peak is the sum of each process's own peak, an upper bound.
+
+    Args:
+        pid (int): Process to inspect (default: this process)
+
+    Returns:
+        tuple: (rss, peak_rss) in MB; None values where they cannot be read
+    """
+    try:
+        if pid is None:
+            return _proc_memory('self')
+        totals = [_proc_memory(pid)]
+        for child in _children(pid):
+            try:
+                totals.append(_proc_memory(child))
+            except OSError:
+                # The child exited in the meantime
+                pass
+        return (sum(rss for rss, _ in totals),
+                sum(peak for _, peak in totals))
+    except (OSError, KeyError, ValueError):
+        if pid is not None:
+            return None, None
+    # No /proc (e.g. macOS): only the peak of this process is known, and
+    # ru_maxrss is in bytes there
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return None, peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def git_commit():
+    """Short commit hash of the working tree and whether it is dirty."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain'],
+                                    capture_output=True, text=True,
+                                    check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def start_stub(args):
+    """
+    Starts benchmarks.stub_watson as a subprocess.
+
+    Returns:
+        tuple: (process, EmotionPredict URL, stats URL)
+    """
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.stub_watson', '--port', str(port),
+         '--latency', str(args.latency), '--jitter', str(args.jitter),
+         '--error-rate', str(args.error_rate), '--seed', str(args.seed)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    stats_url = f"http://127.0.0.1:{port}/"
+    try:
+        _wait_until_up(stats_url)
+    except RuntimeError:
+        process.kill()
+        raise
+    return (process,
+            stats_url + "v1/watson.runtime.nlp.v1/NlpService/EmotionPredict",
+            stats_url)
+
+
+def upstream_requests(stats_url):
+    """EmotionPredict requests the stub has received so far."""
+    return requests.get(stats_url, timeout=5).json()['requests']
+
+
+def start_app_server(kind, stub_url):
+    """
+    Starts server.py or gunicorn as a subprocess against the stub.
+
+    Returns:
+        tuple: (process, base URL)
+    """
+    port = _free_port()
+    env = dict(os.environ, EMOTION_WATSON_URL=stub_url,
+               EMOTION_CACHE_ENABLED='false', PORT=str(port),
+               FLASK_DEBUG='0', GUNICORN_ACCESS_LOG='')
+    if kind == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                   'wsgi:app']
+    else:
+        command = [sys.executable, 'server.py']
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_until_up(base_url + '/')
+    except RuntimeError:
+        process.kill()
+        raise
+    return process, base_url
+
+
+def stop_process(process):
+    """Stops a server started by start_stub or start_app_server."""
+    process.send_signal(signal.SIGTERM)
+    process.wait(timeout=60)
+
+
+def make_call(scenario, base_url):
+    """
+    Builds the per-request function of a scenario.
+
+    Returns:
+        callable: call(text) -> True if the request succeeded
+    """
+    if scenario == 'emotion_detector':
+        return lambda text: emotion_detector(text)['dominant_emotion'] is not None
+    if scenario == 'emotion_predictor':
+        return lambda text: not emotion_predictor(text).startswith("Invalid")
+
+    # One keep-alive HTTP session per client thread
+    local = threading.local()
+    route = scenario.split(':', 1)[1]
+    param = 'textToAnalyze' if route == '/emotionDetector' else 'text'
+
+    def call(text):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        response = session.get(base_url + route, params={param: text})
+        if route == '/emotionDetector':
+            return 'Analysis Result' in response.text
+        return response.status_code == 200
+    return call
+
+
+def run_scenario(scenario, call, args, stats_url, server_pid=None):
+    """
+    Drives one scenario.
+
+    Args:
+        scenario (str): Scenario name
+        call (callable): From make_call
+        args (argparse.Namespace): Suite options
+        stats_url (str): Stub Watson stats URL, for the upstream calls made
+        server_pid (int): Server process whose memory (with its worker
+                          processes) is reported, for route scenarios
+
+    Returns:
+        dict: Result record of the scenario
+    """
+    clear_cache()
+    get_breaker().reset()
+
+    # Warm up connection pools and imports outside the measurement
+    for i in range(args.warmup):
+        call(f"warmup {scenario} {i} I am glad")
+
+    texts = [f"request {scenario} {i} I am glad" for i in range(args.requests)]
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+
+    def timed(text):
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            ok = call(text)
+        except requests.exceptions.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            failures += not ok
+
+    use_tracemalloc = args.tracemalloc and server_pid is None
+    rss_before, _ = memory_mb(server_pid)
+    upstream_before = upstream_requests(stats_url)
+    if use_tracemalloc:
+        tracemalloc.start()
+    # The detectors print failures; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(timed, texts))
+        elapsed = time.perf_counter() - start
+    traced_peak = None
+    if use_tracemalloc:
+        traced_peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+
+    latencies.sort()
+    record = {
+        'scenario': scenario,
+        'requests': len(texts),
+        'concurrency': args.concurrency,
+        'seconds': round(elapsed, 4),
+        'throughput': round(len(texts) / elapsed, 2),
+        'failures': failures,
+        # More than one per request means retries or hedges
+        'upstream_calls': upstream_requests(stats_url) - upstream_before,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1e3, 3),
+        'max_ms': round(latencies[-1] * 1e3, 3),
+        'memory_of': 'server' if server_pid else 'client',
+    }
+    rss, peak = memory_mb(server_pid)
+    record['rss_mb'] = round(rss, 1) if rss is not None else None
+    record['rss_growth_mb'] = (round(rss - rss_before, 1)
+                               if rss is not None else None)
+    record['peak_rss_mb'] = round(peak, 1) if peak is not None else None
+    for percent in (50, 95, 99):
+        record[f'p{percent}_ms'] = round(
+            percentile(latencies, percent) * 1e3, 3)
+    if traced_peak is not None:
+        record['traced_peak_mb'] = round(traced_peak, 2)
+    return record
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints each scenario's change against a baseline run.
+
+    Args:
+        results (dict): This run's results
+        baseline (dict): Results loaded from an earlier run's JSON
+        threshold (float): Relative change counted as a regression
+
+    Returns:
+        list: (scenario, metric, change) for each regression
+    """
+    before = {record['scenario']: record for record in baseline['scenarios']}
+    regressions = []
+    print(f"\nvs {baseline['meta'].get('commit')} "
+          f"(regression threshold {threshold:.0%})")
+    for record in results['scenarios']:
+        old = before.get(record['scenario'])
+        if old is None:
+            continue
+        changes = []
+        for name, higher_is_better in COMPARED:
+            if not old.get(name):
+                continue
+            change = record[name] / old[name] - 1
+            worse = -change if higher_is_better else change
+            flag = ''
+            if worse > threshold:
+                regressions.append((record['scenario'], name, change))
+                flag = ' !'
+            changes.append(f"{name} {change:+.1%}{flag}")
+        print(f"  {record['scenario']:<24}" + ', '.join(changes))
+    return regressions
+
+
+def main():
+    """Run the suite, print a table and save the results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help="stub upstream latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.005,
+                        help="extra uniform random latency in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="fraction of upstream calls answered with 500")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--server', choices=('flask', 'gunicorn'),
+                        default='flask',
+                        help="server for the route scenarios")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help="comma-separated subset of: "
+                             + ', '.join(SCENARIOS))
+    parser.add_argument('--output', default=None,
+                        help="JSON path (default benchmarks/results/"
+                             "<commit>.json)")
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help="earlier results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="relative change flagged as a regression")
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="also report peak Python allocations "
+                             "(slows every scenario down)")
+    args = parser.parse_args()
+
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    commit, dirty = git_commit()
+    stub, stub_url, stats_url = start_stub(args)
+    app_server = base_url = None
+    if any(name.startswith('route:') for name in scenarios):
+        app_server, base_url = start_app_server(args.server, stub_url)
+    results = {
+        'meta': {
+            'commit': commit,
+            'dirty': dirty,
+            'timestamp': datetime.now(timezone.utc).isoformat(
+                timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': vars(args),
+        },
+        'scenarios': [],
+    }
+
+    print(f"{args.requests} requests per scenario, concurrency "
+          f"{args.concurrency}, stub latency {args.latency * 1e3:g} ms "
+          f"+ 0-{args.jitter * 1e3:g} ms, error rate {args.error_rate:.1%}")
+    print(f"{'scenario':<24}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'p99 ms':>9}{'failed':>8}{'rss MB':>8}")
+    try:
+        with patch.object(config, 'WATSON_URL', stub_url), \
+                patch.object(config, 'CACHE_ENABLED', False):
+            for scenario in scenarios:
+                server_pid = (app_server.pid if scenario.startswith('route:')
+                              else None)
+                record = run_scenario(scenario,
+                                      make_call(scenario, base_url), args,
+                                      stats_url, server_pid)
+                results['scenarios'].append(record)
+                print(f"{scenario:<24}{record['throughput']:>9.0f}"
+                      f"{record['p50_ms']:>9.2f}{record['p95_ms']:>9.2f}"
+                      f"{record['p99_ms']:>9.2f}{record['failures']:>8}"
+                      f"{record['rss_mb'] or 0:>8.1f}")
+    finally:
+        if app_server is not None:
+            stop_process(app_server)
+        stop_process(stub)
+
+    output = args.output or os.path.join(
+        'benchmarks', 'results', f"{commit or 'results'}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+# replay.py
+# Deterministic load tests from captured upstream traffic
+#
+# A capture (EMOTION_CAPTURE_PATH, see EmotionDetection/capture.py) holds
+# every Watson call a deployment made: when, with which text, how long it
+# took and what came back. Replaying it has two halves:
+#
+#   * a stand-in for Watson that answers each text with its recorded status
+#     and body after its recorded latency, and drops the connection where
+#     the original call failed (`serve`);
+#   * a driver that starts the stand-in and server.py (or gunicorn) against
+#     it, then re-sends the captured texts to the app on the captured
+#     schedule, compressed by --speed, and reports what the app did (`run`).
+#
+# Only upstream calls are captured, i.e. requests that missed the result
+# cache, so the app runs with its cache off and each replayed request should
+# reach the stand-in once. Arrivals are open-loop: a slow app does not slow
+# the schedule down, it builds a backlog, as it would in production.
+#
+# Usage (from the emotion_detection_project directory):
+#     python -m benchmarks.replay run CAPTURE [--speed X]
+#         [--server flask|gunicorn] [--route form|api] [--limit N]
+#     python -m benchmarks.replay serve CAPTURE [--port P]
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+import requests
+
+from EmotionDetection.capture import read_capture
+from benchmarks.bench_serving import _free_port, _wait_until_up
+from benchmarks.bench_suite import (
+    memory_mb, percentile, start_app_server, stop_process
+)
+
+
+class ReplayWatsonHandler(BaseHTTPRequestHandler):
+    """Answers POSTs with the recorded response for their text."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        """Handle an EmotionPredict request."""
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            text = json.loads(self.rfile.read(length))['raw_document']['text']
+        except (ValueError, KeyError, TypeError):
+            text = None
+        entry = self.server.next_record(text)
+        time.sleep(entry['d'] * self.server.latency_scale)
+
+        if 'e' in entry:
+            # No response was received originally: hang up instead
+            self.close_connection = True
+            return
+        body = entry['r'].encode('utf-8')
+        self.send_response(entry['s'])
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """Report the requests received and how many had no recording."""
+        server = self.server
+        body = json.dumps({'requests': server.requests,
+                           'unmatched': server.unmatched}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Keep benchmark output quiet."""
+
+
+class ReplayWatsonServer(ThreadingHTTPServer):
+    """
+    Serves recorded responses, in recorded order for each text.
+
+    A text recorded several times gets its responses in turn, then from
+    the start again. A text that was never recorded gets the next record
+    of the whole capture, so any traffic receives realistic answers.
+
+    Args:
+        address (tuple): (host, port) to bind
+        records (list): Capture records
+        latency_scale (float): Multiplier for the recorded latencies
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, records, latency_scale=1.0):
+        super().__init__(address, ReplayWatsonHandler)
+        if not records:
+            raise ValueError("capture has no records")
+        self.latency_scale = latency_scale
+        self.by_text = defaultdict(deque)
+        for entry in records:
+            self.by_text[entry['q']].append(entry)
+        self.everything = deque(records)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.unmatched = 0
+
+    def next_record(self, text):
+        """Returns the record to answer text with."""
+        with self.lock:
+            self.requests += 1
+            queue = self.by_text.get(text)
+            if queue is None:
+                self.unmatched += 1
+                queue = self.everything
+            entry = queue[0]
+            queue.rotate(-1)
+        return entry
+
+
+def start_replay_server(records, host='127.0.0.1', port=0,
+                        latency_scale=1.0):
+    """
+    Starts the replay stand-in on a background thread.
+
+    Args:
+        records (list): Capture records to serve
+        host (str): Interface to bind
+        port (int): Port to bind, 0 picks a free port
+        latency_scale (float): Multiplier for the recorded latencies
+
+    Returns:
+        tuple: (server, url) where url points at the EmotionPredict path
+    """
+    server = ReplayWatsonServer((host, port), records, latency_scale)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = (f"http://{host}:{server.server_address[1]}"
+           "/v1/watson.runtime.nlp.v1/NlpService/EmotionPredict")
+    return server, url
+
+
+def load_records(path, limit=None):
+    """Reads a capture, ordered by start time, keeping the first `limit`."""
+    records = sorted(read_capture(path), key=lambda entry: entry['t'])
+    return records[:limit] if limit else records
+
+
+def schedule(records, speed=1.0):
+    """Returns (offset seconds, text) arrivals, compressed by `speed`."""
+    if not records:
+        return []
+    first = records[0]['t']
+    return [((entry['t'] - first) / speed, entry['q']) for entry in records]
+
+
+async def drive(base_url, arrivals, route='form', timeout=30):
+    """
+    Sends each text to the app at its offset from now.
+
+    Args:
+        base_url (str): App base URL
+        arrivals (list): (offset seconds, text) pairs in offset order
+        route (str): 'form' for /emotionDetector, 'api' for
+                     /api/v1/emotions
+        timeout (float): Seconds before a request counts as failed
+
+    Returns:
+        dict: 'latencies' (s, of successful requests), 'failures',
+              'lag' (s, of sends behind schedule) and 'elapsed' (s)
+    """
+    latencies = []
+    lags = []
+    failures = 0
+
+    # Unlimited connections: a pool limit would queue arrivals client-side
+    async with aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=0),
+            timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+
+        async def send(text):
+            nonlocal failures
+            start = time.perf_counter()
+            try:
+                if route == 'api':
+                    path, params = '/api/v1/emotions', {'text': text}
+                else:
+                    path, params = '/emotionDetector', {'textToAnalyze': text}
+                async with session.get(base_url + path,
+                                       params=params) as response:
+                    body = await response.text()
+                ok = (response.status == 200 if route == 'api'
+                      else 'Analysis Result' in body)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                failures += 1
+
+        tasks = []
+        begin = time.perf_counter()
+        for offset, text in arrivals:
+            delay = offset - (time.perf_counter() - begin)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lags.append(max(0.0, -delay))
+            tasks.append(asyncio.ensure_future(send(text)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - begin
+
+    return {'latencies': latencies, 'failures': failures, 'lag': lags,
+            'elapsed': elapsed}
+
+
+def start_replay_process(args):
+    """
+    Starts this module's `serve` command as a subprocess.
+
+    Returns:
+        tuple: (process, EmotionPredict URL, stats URL)
+    """
+    port = _free_port()
+    command = [sys.executable, '-m', 'benchmarks.replay', 'serve',
+               args.capture, '--port', str(port),
+               '--latency-scale', str(args.latency_scale)]
+    if args.limit:
+        command += ['--limit', str(args.limit)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    stats_url = f"http://127.0.0.1:{port}/"
+    try:
+        _wait_until_up(stats_url)
+    except RuntimeError:
+        process.kill()
+        raise
+    return (process,
+            stats_url + "v1/watson.runtime.nlp.v1/NlpService/EmotionPredict",
+            stats_url)
+
+
+def run(args):
+    """Replay a capture against the app and print what it did."""
+    records = load_records(args.capture, args.limit)
+    arrivals = schedule(records, args.speed)
+    if not arrivals:
+        sys.exit(f"{args.capture}: no records")
+    span = arrivals[-1][0]
+    failed = sum(1 for entry in records
+                 if 'e' in entry or entry.get('s') != 200)
+    print(f"{len(records)} captured calls over {span * args.speed:.1f} s "
+          f"({failed} failed upstream), replayed at {args.speed:g}x in "
+          f"{span:.1f} s against {args.server}")
+
+    # Separate processes, so the stand-in and the app do not compete with
+    # the driver for one GIL
+    stand_in, stand_in_url, stats_url = start_replay_process(args)
+    app = None
+    try:
+        app, base_url = start_app_server(args.server, stand_in_url)
+        result = asyncio.run(drive(base_url, arrivals, args.route,
+                                   args.timeout))
+        upstream = requests.get(stats_url, timeout=5).json()
+        rss, _ = memory_mb(app.pid)
+    finally:
+        if app is not None:
+            stop_process(app)
+        stop_process(stand_in)
+
+    latencies = sorted(result['latencies'])
+    lags = sorted(result['lag'])
+    print(f"offered {len(arrivals) / max(span, 1e-9):.1f} req/s, "
+          f"completed in {result['elapsed']:.1f} s")
+    if latencies:
+        print(f"latency p50 {percentile(latencies, 50) * 1e3:.1f} ms, "
+              f"p95 {percentile(latencies, 95) * 1e3:.1f} ms, "
+              f"p99 {percentile(latencies, 99) * 1e3:.1f} ms")
+    print(f"failed {result['failures']}, upstream calls "
+          f"{upstream['requests']} ({upstream['unmatched']} "
+          f"unmatched), send lag p99 {percentile(lags, 99) * 1e3:.1f} ms, "
+          f"server rss {rss or 0:.1f} MB")
+
+
+def main():
+    """Parse the command line and run `serve` or `run`."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help="run the Watson stand-in")
+    serve.add_argument('capture')
+    serve.add_argument('--port', type=int, default=8080)
+    serve.add_argument('--latency-scale', type=float, default=1.0)
+    serve.add_argument('--limit', type=int, default=None)
+
+    replay = commands.add_parser('run', help="replay a capture against "
+                                             "the app")
+    replay.add_argument('capture')
+    replay.add_argument('--speed', type=float, default=1.0,
+                        help="arrival rate multiplier (10 = ten times "
+                             "faster than captured)")
+    replay.add_argument('--latency-scale', type=float, default=1.0,
+                        help="multiplier for recorded upstream latencies")
+    replay.add_argument('--server', choices=('flask', 'gunicorn'),
+                        default='flask')
+    replay.add_argument('--route', choices=('form', 'api'), default='form')
+    replay.add_argument('--limit', type=int, default=None,
+                        help="replay only the first N calls")
+    replay.add_argument('--timeout', type=float, default=30)
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        run(args)
+        return
+    server, url = start_replay_server(load_records(args.capture, args.limit),
+                                      port=args.port,
+                                      latency_scale=args.latency_scale)
+    print(f"Replaying {args.capture} on {url}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
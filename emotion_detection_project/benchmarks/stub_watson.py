@@ -0,0 +1,121 @@
+# stub_watson.py
+# Minimal local stand-in for the Watson NLP EmotionPredict endpoint
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Canned response body in the same shape Watson returns
+STUB_RESPONSE = {
+    'emotionPredictions': [{
+        'emotion': {
+            'anger': 0.01,
+            'disgust': 0.02,
+            'fear': 0.03,
+            'joy': 0.9,
+            'sadness': 0.04
+        }
+    }]
+}
+
+
+class StubWatsonHandler(BaseHTTPRequestHandler):
+    """Answers POSTs with the canned emotion response, or a 500 error."""
+
+    # HTTP/1.1 so clients can keep the connection alive
+    protocol_version = 'HTTP/1.1'
+    # Avoid Nagle/delayed-ACK stalls on reused connections
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        """Handle an EmotionPredict request."""
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            failed = server.error_rate and server.rng.random() < server.error_rate
+            jitter = server.rng.uniform(0, server.jitter) if server.jitter else 0
+
+        # Simulate upstream processing time
+        if server.latency or jitter:
+            time.sleep(server.latency + jitter)
+
+        if failed:
+            body = b'{"code": 13, "details": "Internal error"}'
+            self.send_response(500)
+        else:
+            body = json.dumps(STUB_RESPONSE).encode('utf-8')
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """Report the number of EmotionPredict requests received."""
+        body = json.dumps({'requests': self.server.requests}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Keep benchmark output quiet."""
+
+
+def start_stub_server(host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                      error_rate=0.0, seed=None):
+    """
+    Starts the stub server on a background thread.
+
+    The server counts the requests it received in `server.requests`.
+
+    Args:
+        host (str): Interface to bind
+        port (int): Port to bind, 0 picks a free port
+        latency (float): Seconds to wait before answering each request
+        jitter (float): Up to this many extra seconds, uniformly random
+        error_rate (float): Fraction of requests answered with a 500
+        seed (int): Seed for jitter and errors, for repeatable runs
+
+    Returns:
+        tuple: (server, url) where url points at the EmotionPredict path
+    """
+    server = ThreadingHTTPServer((host, port), StubWatsonHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.requests = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = (f"http://{host}:{server.server_address[1]}"
+           "/v1/watson.runtime.nlp.v1/NlpService/EmotionPredict")
+    return server, url
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Stub Watson server")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    server, url = start_stub_server(port=args.port, latency=args.latency,
+                                    jitter=args.jitter,
+                                    error_rate=args.error_rate,
+                                    seed=args.seed)
+    print(f"Stub Watson server listening on {url}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
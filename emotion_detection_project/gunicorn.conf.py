@@ -0,0 +1,91 @@
+"""
+Gunicorn configuration for production serving.
+
+Pre-forks WEB_CONCURRENCY worker processes, each running
+GUNICORN_THREADS threads (gthread worker). Workers are recycled after
+GUNICORN_MAX_REQUESTS requests and drain in-flight requests for
+GUNICORN_GRACEFUL_TIMEOUT seconds on shutdown. Every value can be
+overridden through the environment, e.g. on Railway/Heroku.
+
+Workers share their metrics through EMOTION_METRICS_DIR (a fresh
+temporary directory unless set), so /metrics reports the whole server
+whichever worker answers the scrape.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# Socket
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+backlog = int(os.environ.get('GUNICORN_BACKLOG', 2048))
+
+# Worker model: processes x threads
+workers = int(os.environ.get('WEB_CONCURRENCY',
+                             multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Recycle workers to bound memory growth; jitter avoids restarting all
+# workers at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+# Timeouts: upstream calls time out after EMOTION_REQUEST_TIMEOUT (5 s),
+# so a worker silent for longer than `timeout` is stuck
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Load the app once in the master so workers share its memory
+preload_app = True
+
+# Set GUNICORN_ACCESS_LOG to an empty string to disable access logging
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+# Set before the app is loaded, so EmotionDetection.config picks it up
+_own_metrics_dir = 'EMOTION_METRICS_DIR' not in os.environ
+if _own_metrics_dir:
+    os.environ['EMOTION_METRICS_DIR'] = tempfile.mkdtemp(
+        prefix='emotion-metrics-')
+else:
+    os.makedirs(os.environ['EMOTION_METRICS_DIR'], exist_ok=True)
+
+
+def on_starting(server):
+    """Drop metrics left behind by an earlier run and enable trace logs."""
+    from EmotionDetection import metrics, tracing
+    metrics.clear_directory()
+    # Workers inherit the handler; without it the root logger's WARNING
+    # level would swallow the per-request JSON lines
+    tracing.configure_logging()
+
+
+def post_fork(server, worker):
+    """Give each worker its own upstream connection pool and metrics file."""
+    from EmotionDetection import http_pool, metrics
+    http_pool.close_session()
+    metrics.start_flusher()
+
+
+def worker_exit(server, worker):
+    """Release pooled upstream connections and save final metrics."""
+    from EmotionDetection import http_pool, metrics
+    http_pool.close_session()
+    metrics.write_snapshot()
+
+
+def child_exit(server, worker):
+    """Fold an exited worker's metrics into the totals (runs in the master)."""
+    from EmotionDetection import metrics
+    metrics.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    """Remove the metrics directory this configuration created."""
+    if _own_metrics_dir:
+        shutil.rmtree(os.environ['EMOTION_METRICS_DIR'], ignore_errors=True)
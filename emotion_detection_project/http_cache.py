@@ -0,0 +1,168 @@
+"""
+HTTP caching and compression for the web servers.
+
+Results are deterministic for a given model, so /emotionDetector pages
+carry an ETag derived from the text's fingerprint and the model ID. A
+client revalidating with If-None-Match gets a 304 without any upstream
+call. Text responses above a size threshold are compressed with brotli
+(when the optional brotli package is installed) or gzip, whichever the
+client prefers. Requests shed by the upstream rate limit tell the client
+when to come back with Retry-After.
+"""
+
+import gzip
+import hashlib
+import math
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # Optional; responses fall back to gzip
+    brotli = None
+
+from EmotionDetection import config
+from EmotionDetection.backends import get_backend
+from EmotionDetection.circuit_breaker import CLOSED, get_breaker
+from EmotionDetection.normalize import canonicalize
+import pages
+
+COMPRESSIBLE_TYPES = frozenset([
+    'text/html', 'text/css', 'text/plain', 'application/json',
+])
+
+# Encodings we can produce, most preferred first
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# Compressed copies of static bodies, keyed by (strong ETag, encoding)
+_static_bodies = OrderedDict()
+_STATIC_BODIES_MAX = 64
+
+
+def result_etag(text_to_analyze, backend=None):
+    """
+    Content-addressed ETag of a result page.
+
+    Texts with the same canonical form (see normalize.py) share a tag,
+    so callers send it as a weak ETag.
+
+    Args:
+        text_to_analyze (str): Text being analyzed
+        backend (EmotionBackend): Backend producing the result
+                                  (default: the configured one)
+
+    Returns:
+        str: Opaque tag value, without quotes
+    """
+    if backend is None:
+        backend = get_backend()
+    key = '\x00'.join((
+        pages.RESULT_PAGE_VERSION,
+        backend.result_key(canonicalize(text_to_analyze).fingerprint)))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+def results_are_cacheable(backend=None):
+    """
+    Whether results may currently be tagged and cached by clients.
+
+    While the circuit is not closed and BREAKER_FALLBACK is 'local',
+    a Watson result may really be a local fallback, which must not be
+    cached under the Watson model's ETag.
+
+    Returns:
+        bool: False while fallback results are possible
+    """
+    if backend is None:
+        backend = get_backend()
+    if (backend.name == 'local' or not config.BREAKER_ENABLED
+            or config.BREAKER_FALLBACK != 'local'):
+        return True
+    return get_breaker().state == CLOSED
+
+
+def choose_encoding(accept_encoding):
+    """
+    Picks the best encoding the client accepts.
+
+    Args:
+        accept_encoding (str): Accept-Encoding header value, or None
+
+    Returns:
+        str: 'br', 'gzip', or None for identity
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[coding.strip().lower()] = quality
+    wildcard = weights.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = weights.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def should_compress(mimetype, size, status_code, content_encoding=None):
+    """
+    Whether a response body is worth compressing.
+
+    Args:
+        mimetype (str): Response media type, without parameters
+        size (int): Body size in bytes
+        status_code (int): Response status
+        content_encoding (str): Existing Content-Encoding header, if any
+
+    Returns:
+        bool: True if the body should be compressed
+    """
+    return (config.COMPRESSION_ENABLED and status_code == 200
+            and not content_encoding and mimetype in COMPRESSIBLE_TYPES
+            and size >= config.COMPRESSION_MIN_SIZE)
+
+
+def compress(data, encoding, etag=None):
+    """
+    Compresses a body.
+
+    Bodies with a strong ETag are static, so their compressed copies
+    are kept and reused instead of being compressed on every request.
+
+    Args:
+        data (bytes): Body to compress
+        encoding (str): 'br' or 'gzip'
+        etag (str): Strong ETag of the body, if it has one
+
+    Returns:
+        bytes: Compressed body
+    """
+    if etag is not None:
+        compressed = _static_bodies.get((etag, encoding))
+        if compressed is not None:
+            return compressed
+    if encoding == 'br':
+        compressed = brotli.compress(
+            data, quality=config.COMPRESSION_BROTLI_QUALITY)
+    else:
+        # mtime=0 keeps the output byte-identical for identical input
+        compressed = gzip.compress(
+            data, compresslevel=config.COMPRESSION_GZIP_LEVEL, mtime=0)
+    if etag is not None:
+        _static_bodies[(etag, encoding)] = compressed
+        if len(_static_bodies) > _STATIC_BODIES_MAX:
+            _static_bodies.popitem(last=False)
+    return compressed
+
+
+def retry_after_header(error):
+    """Retry-After value, in whole seconds, for a shed request."""
+    return str(max(1, math.ceil(error.retry_after)))
@@ -0,0 +1,142 @@
+"""
+HTML rendering for the emotion detection web pages.
+
+The static markup of every page is assembled once at import into a few
+constant chunks, so rendering a response is one f-string that copies
+those chunks around the HTML-escaped dynamic values. The shared CSS
+lives in static/style.css and is served as its own long-cacheable asset
+instead of being inlined into every page.
+"""
+
+import hashlib
+import os
+from html import escape
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'static')
+
+
+def _etag(data):
+    """Content hash used as a strong ETag."""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+# Stylesheet, served from memory. The URL carries the content hash, so a
+# changed stylesheet is a new URL and the old one can be cached forever.
+with open(os.path.join(STATIC_DIR, 'style.css'), 'rb') as _f:
+    STYLESHEET = _f.read()
+STYLESHEET_ETAG = _etag(STYLESHEET)
+STYLESHEET_URL = f'/static/style.css?v={STYLESHEET_ETAG[:12]}'
+STYLESHEET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Pages revalidate on every load; a matching ETag costs a bodyless 304
+PAGE_CACHE_CONTROL = 'no-cache'
+
+
+def escape_text(text):
+    """
+    Escapes text for an HTML text node.
+
+    Most texts contain none of the special characters, so they are
+    returned as-is without copying.
+
+    Args:
+        text (str): Untrusted text
+
+    Returns:
+        str: Text safe to place between tags
+    """
+    if '&' in text or '<' in text or '>' in text:
+        return escape(text, quote=False)
+    return text
+
+
+# Document head, split around the page title, and the page footer
+_HEAD_START = ('<!DOCTYPE html>\n<html>\n<head>\n'
+               '<meta charset="utf-8">\n<title>')
+_HEAD_END = ('</title>\n'
+             f'<link rel="stylesheet" href="{STYLESHEET_URL}">\n'
+             '</head>\n<body>\n<div class="container">\n')
+_FOOT = '</div>\n</body>\n</html>\n'
+
+# The index page has no dynamic parts, so it is rendered once
+INDEX_HTML = (
+    _HEAD_START + 'Emotion Detection Application' + _HEAD_END
+    + '<h1>Emotion Detection Application</h1>\n'
+      '<p>Welcome to the emotion detection service! Enter some text\n'
+      'below to analyze its emotional content.</p>\n'
+      '<form action="/emotionDetector" method="GET">\n'
+      '<label for="textToAnalyze">Text to analyze:</label><br><br>\n'
+      '<input type="text" id="textToAnalyze" name="textToAnalyze"\n'
+      'placeholder="Enter text here..." required><br><br>\n'
+      '<button type="submit">Analyze Emotion</button>\n'
+      '</form>\n'
+    + _FOOT)
+INDEX_BYTES = INDEX_HTML.encode('utf-8')
+INDEX_ETAG = _etag(INDEX_BYTES)
+
+# Static chunks of the result page, in order around its two values
+_SUCCESS_START = (_HEAD_START + 'Emotion Analysis Result' + _HEAD_END
+                  + '<h1>Emotion Analysis Result</h1>\n'
+                    '<p><strong>Analyzed Text:</strong> "')
+_SUCCESS_MIDDLE = ('"</p>\n<div class="result">\n'
+                   '<h3>Analysis Result:</h3>\n<p>')
+_SUCCESS_END = ('</p>\n</div>\n<div class="back-link">\n'
+                '<a href="/">&larr; Analyze Another Text</a>\n</div>\n'
+                + _FOOT)
+
+# Changes with the result page markup; part of the result ETag
+RESULT_PAGE_VERSION = _etag(
+    (_SUCCESS_START + _SUCCESS_MIDDLE + _SUCCESS_END).encode('utf-8'))[:12]
+
+# Static chunks of the error page; its title is dynamic
+_ERROR_AFTER_TITLE = ' - Emotion Detection' + _HEAD_END
+_ERROR_END = ('</div>\n<div class="back-link">\n'
+              '<a href="/">&larr; Go Back and Try Again</a>\n</div>\n'
+              + _FOOT)
+
+
+def render_error_page(title, error_message, description, bg_color,
+                      border_color, text_color, analyzed_text=None):
+    """
+    Renders an error page.
+
+    Args:
+        title (str): Page heading
+        error_message (str): Short error message
+        description (str): Longer explanation
+        bg_color (str): Background colour of the error box
+        border_color (str): Border colour of the error box
+        text_color (str): Text colour of the error box
+        analyzed_text (str): Text the user submitted, if any
+
+    Returns:
+        str: The HTML page
+    """
+    title = escape_text(title)
+    analyzed_text_html = ''
+    if analyzed_text:
+        analyzed_text_html = ('<p><strong>Analyzed Text:</strong> '
+                              f'"{escape_text(analyzed_text)}"</p>\n')
+    style = escape(f'background-color: {bg_color}; '
+                   f'border-color: {border_color}; color: {text_color}')
+    return (f'{_HEAD_START}{title}{_ERROR_AFTER_TITLE}'
+            f'<h1>{title}</h1>\n{analyzed_text_html}'
+            f'<div class="error" style="{style}">\n<h3>⚠️ Error:</h3>\n'
+            f'<p><strong>{escape_text(error_message)}</strong></p>\n'
+            f'<p>{escape_text(description)}</p>\n{_ERROR_END}')
+
+
+def render_success_page(text_to_analyze, result):
+    """
+    Renders the analysis result page.
+
+    Args:
+        text_to_analyze (str): Text the user submitted
+        result (str): Formatted emotion_predictor output
+
+    Returns:
+        str: The HTML page
+    """
+    return (f'{_SUCCESS_START}{escape_text(text_to_analyze)}'
+            f'{_SUCCESS_MIDDLE}{escape_text(result)}{_SUCCESS_END}')
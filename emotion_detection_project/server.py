@@ -5,69 +5,113 @@ This module provides a web interface for analyzing emotions in text using
 the Watson NLP emotion detection service.
 """
 
-from flask import Flask, request
-from EmotionDetection import emotion_predictor
+import time
 
-app = Flask(__name__)
+from flask import Flask, g, jsonify, request
+from EmotionDetection import config, emotion_predictor, metrics, tracing
+from EmotionDetection.rate_limit import RateLimitedError
+from EmotionDetection.status import get_status
+from api import api
+import http_cache
+import pages
+
+# The stylesheet is served from memory by the route below
+app = Flask(__name__, static_folder=None)
+
+# Compact, unsorted JSON keeps API responses small and cheap to serialize
+app.json.compact = True
+app.json.sort_keys = False
+app.config['MAX_CONTENT_LENGTH'] = config.API_MAX_CONTENT_LENGTH
+app.register_blueprint(api)
+
+
+@app.before_request
+def start_request_trace():
+    """Start the request's trace, reusing the client's request ID."""
+    if not config.TRACING_ENABLED:
+        return
+    g.trace, g.trace_token = tracing.start_trace(
+        request.headers.get(config.TRACE_REQUEST_ID_HEADER))
+    g.profiler = tracing.get_profiler().start(
+        config.TRACE_PROFILE_SAMPLE_RATE)
+
+
+@app.after_request
+def add_trace_headers(response):
+    """Echo the request ID and report span timings as Server-Timing."""
+    # Registered first, so it runs after every other after_request hook
+    trace = g.get('trace')
+    if trace is not None:
+        g.trace_status = response.status_code
+        response.headers[config.TRACE_REQUEST_ID_HEADER] = trace.request_id
+        response.headers['Server-Timing'] = trace.server_timing()
+    return response
+
+
+@app.teardown_request
+def finish_request_trace(error=None):
+    """End the trace, log it and hand sampled profiles to the profiler."""
+    token = g.pop('trace_token', None)
+    if token is None:
+        return
+    trace = tracing.finish_trace(token)
+    fields = {
+        'route': request.url_rule.rule if request.url_rule else 'unmatched',
+        'method': request.method,
+        'status': g.pop('trace_status', 500)
+    }
+    tracing.log_trace(trace, **fields)
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        tracing.get_profiler().finish(profiler, trace, **fields)
+
+
+@app.before_request
+def start_request_metrics():
+    """Count the request as in flight under its route pattern."""
+    # Route patterns, not raw paths, keep label cardinality bounded
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_start = time.perf_counter()
+    metrics.HTTP_REQUESTS_IN_FLIGHT.inc(g.metrics_route)
+
+
+@app.after_request
+def record_response_status(response):
+    """Remember the status code for the request metrics."""
+    g.metrics_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    """Record request count and latency, including failed requests."""
+    route = g.pop('metrics_route', None)
+    if route is None:
+        return
+    metrics.HTTP_REQUESTS_IN_FLIGHT.dec(route)
+    metrics.HTTP_REQUEST_DURATION.observe(
+        time.perf_counter() - g.metrics_start, route)
+    metrics.HTTP_REQUESTS.inc(route, request.method,
+                              str(g.pop('metrics_status', 500)))
 
 
 @app.route('/')
 def index():
     """Render the main page with emotion detection form."""
-    return '''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Emotion Detection Application</title>
-        <style>
-            body {
-                font-family: Arial, sans-serif;
-                margin: 40px;
-            }
-            .container {
-                max-width: 600px;
-                margin: 0 auto;
-            }
-            input[type="text"] {
-                width: 70%;
-                padding: 10px;
-                font-size: 16px;
-            }
-            button {
-                padding: 10px 20px;
-                font-size: 16px;
-                background-color: #007cba;
-                color: white;
-                border: none;
-                cursor: pointer;
-            }
-            button:hover {
-                background-color: #005a87;
-            }
-            .result {
-                margin-top: 20px;
-                padding: 15px;
-                background-color: #f0f8ff;
-                border: 1px solid #ddd;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>Emotion Detection Application</h1>
-            <p>Welcome to the emotion detection service! Enter some text
-               below to analyze its emotional content.</p>
-
-            <form action="/emotionDetector" method="GET">
-                <label for="textToAnalyze">Text to analyze:</label><br><br>
-                <input type="text" id="textToAnalyze" name="textToAnalyze"
-                       placeholder="Enter text here..." required><br><br>
-                <button type="submit">Analyze Emotion</button>
-            </form>
-        </div>
-    </body>
-    </html>
-    '''
+    response = app.response_class(pages.INDEX_BYTES, mimetype='text/html')
+    response.set_etag(pages.INDEX_ETAG)
+    response.headers['Cache-Control'] = pages.PAGE_CACHE_CONTROL
+    # Answers If-None-Match with 304 Not Modified
+    return response.make_conditional(request)
+
+
+@app.route('/static/style.css')
+def stylesheet():
+    """Serve the shared stylesheet with long-lived caching headers."""
+    response = app.response_class(pages.STYLESHEET, mimetype='text/css')
+    response.set_etag(pages.STYLESHEET_ETAG)
+    response.headers['Cache-Control'] = pages.STYLESHEET_CACHE_CONTROL
+    return response.make_conditional(request)
 
 
 @app.route('/emotionDetector')
@@ -77,7 +121,9 @@ def emotion_detection():
     text_to_analyze = request.args.get('textToAnalyze')
 
     # Check if text is provided and not blank
-    if not text_to_analyze or text_to_analyze.strip() == "":
+    with tracing.span('validate'):
+        blank = not text_to_analyze or text_to_analyze.strip() == ""
+    if blank:
         # Return error message for blank input
         return create_error_page(
             "Invalid Input Error",
@@ -89,8 +135,19 @@ def emotion_detection():
             "#cc0000"
         )
 
-    # Get emotion analysis using our emotion_predictor function
-    result = emotion_predictor(text_to_analyze)
+    # Results are deterministic per model, so a client already holding
+    # this result revalidates without any upstream call
+    etag = http_cache.result_etag(text_to_analyze)
+    if request.if_none_match.contains_weak(etag):
+        return _result_not_modified(etag)
+    cacheable = http_cache.results_are_cacheable()
+
+    # Get emotion analysis using our emotion_predictor function; calls
+    # shed by the upstream rate limit fail fast with a 503
+    try:
+        result = emotion_predictor(text_to_analyze, shed_load=True)
+    except RateLimitedError as e:
+        return _overloaded(e, text_to_analyze)
 
     # Check if the result indicates an error (Invalid text)
     if "Invalid text! Please try again!" in result:
@@ -108,127 +165,102 @@ def emotion_detection():
         )
 
     # If we get here, we have a successful result
-    return create_success_page(text_to_analyze, result)
+    response = app.make_response(create_success_page(text_to_analyze, result))
+    if cacheable and http_cache.results_are_cacheable():
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = config.RESULT_CACHE_CONTROL
+    return response
+
+
+def create_busy_page(text_to_analyze):
+    """Page served with a 503 when the rate limit sheds a request."""
+    return create_error_page(
+        "Service Busy",
+        "Too many requests! Please try again shortly.",
+        "The emotion analysis service is handling too many requests "
+        "right now. Please wait a moment and try again.",
+        "#fff3cd",
+        "#ffeaa7",
+        "#856404",
+        text_to_analyze
+    )
+
+
+def _overloaded(error, text_to_analyze):
+    """Build the 503 response for a request shed by the rate limit."""
+    response = app.make_response((create_busy_page(text_to_analyze), 503))
+    response.headers['Retry-After'] = http_cache.retry_after_header(error)
+    return response
+
+
+def _result_not_modified(etag):
+    """Build the 304 response for a revalidated result page."""
+    response = app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = config.RESULT_CACHE_CONTROL
+    return response
+
+
+@app.route('/status')
+def status():
+    """Report circuit breaker, cache and request coalescing state."""
+    return jsonify(get_status())
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Expose request, upstream and result metrics for Prometheus."""
+    return app.response_class(metrics.render(),
+                              content_type=metrics.CONTENT_TYPE)
+
+
+@app.after_request
+def compress_response(response):
+    """Compress text responses for clients that accept gzip or brotli."""
+    if (response.direct_passthrough or response.is_streamed
+            or response.mimetype not in http_cache.COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if not http_cache.should_compress(response.mimetype, len(data),
+                                      response.status_code,
+                                      response.headers.get('Content-Encoding')):
+        return response
+    encoding = http_cache.choose_encoding(
+        request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+
+    etag, weak = response.get_etag()
+    static_etag = etag if etag and not weak else None
+    with tracing.span('compress'):
+        response.set_data(http_cache.compress(data, encoding, static_etag))
+    response.headers['Content-Encoding'] = encoding
+    if static_etag:
+        # The compressed body is not byte-identical to the tagged one
+        response.set_etag(etag, weak=True)
+    return response
 
 
 def create_error_page(title, error_message, description, bg_color,
                       border_color, text_color, analyzed_text=None):
     """Create a formatted error page."""
-    analyzed_text_html = ""
-    if analyzed_text:
-        analyzed_text_html = (
-            f'<p><strong>Analyzed Text:</strong> "{analyzed_text}"</p>'
-        )
-
-    return f'''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>{title} - Emotion Detection</title>
-        <style>
-            body {{
-                font-family: Arial, sans-serif;
-                margin: 40px;
-            }}
-            .container {{
-                max-width: 600px;
-                margin: 0 auto;
-            }}
-            .error {{
-                margin-top: 20px;
-                padding: 15px;
-                background-color: {bg_color};
-                border: 1px solid {border_color};
-                border-radius: 5px;
-                color: {text_color};
-            }}
-            .back-link {{
-                margin-top: 20px;
-            }}
-            .back-link a {{
-                color: #007cba;
-                text-decoration: none;
-            }}
-            .back-link a:hover {{
-                text-decoration: underline;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>{title}</h1>
-            {analyzed_text_html}
-
-            <div class="error">
-                <h3>⚠️ Error:</h3>
-                <p><strong>{error_message}</strong></p>
-                <p>{description}</p>
-            </div>
-
-            <div class="back-link">
-                <a href="/">&larr; Go Back and Try Again</a>
-            </div>
-        </div>
-    </body>
-    </html>
-    '''
+    with tracing.span('render'):
+        return pages.render_error_page(title, error_message, description,
+                                       bg_color, border_color, text_color,
+                                       analyzed_text)
 
 
 def create_success_page(text_to_analyze, result):
     """Create a formatted success page."""
-    return f'''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Emotion Analysis Result</title>
-        <style>
-            body {{
-                font-family: Arial, sans-serif;
-                margin: 40px;
-            }}
-            .container {{
-                max-width: 600px;
-                margin: 0 auto;
-            }}
-            .result {{
-                margin-top: 20px;
-                padding: 15px;
-                background-color: #f0f8ff;
-                border: 1px solid #ddd;
-                border-radius: 5px;
-            }}
-            .back-link {{
-                margin-top: 20px;
-            }}
-            .back-link a {{
-                color: #007cba;
-                text-decoration: none;
-            }}
-            .back-link a:hover {{
-                text-decoration: underline;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>Emotion Analysis Result</h1>
-            <p><strong>Analyzed Text:</strong> "{text_to_analyze}"</p>
-
-            <div class="result">
-                <h3>Analysis Result:</h3>
-                <p>{result}</p>
-            </div>
-
-            <div class="back-link">
-                <a href="/">&larr; Analyze Another Text</a>
-            </div>
-        </div>
-    </body>
-    </html>
-    '''
+    with tracing.span('render'):
+        return pages.render_success_page(text_to_analyze, result)
 
 
 if __name__ == '__main__':
+    # Development server only; production runs gunicorn (see Procfile)
     import os
+    tracing.configure_logging()
     port = int(os.environ.get('PORT', 5000))
-    app.run(debug=True, host='0.0.0.0', port=port)
+    debug = os.environ.get('FLASK_DEBUG', '0').lower() in ('1', 'true', 'yes')
+    app.run(debug=debug, host='0.0.0.0', port=port)
@@ -0,0 +1,295 @@
+"""
+Asyncio web server for emotion detection application.
+
+Serves the same pages as server.py, but on aiohttp so that a single
+process can hold thousands of in-flight analyses without tying up one
+thread per request. It also serves live analysis over a WebSocket at
+/live, which needs long-lived connections that server.py cannot hold.
+"""
+
+import json
+import time
+
+from aiohttp import WSMsgType, web
+from aiohttp.helpers import ETag
+
+from EmotionDetection.async_detector import (
+    async_emotion_predictor, close_async_session
+)
+from EmotionDetection import config, metrics, tracing
+from EmotionDetection.live import LiveSession
+from EmotionDetection.rate_limit import RateLimitedError
+from EmotionDetection.status import get_status
+from server import create_busy_page, create_error_page, create_success_page
+import http_cache
+import pages
+
+
+def _conditional_response(request, body, content_type, etag, cache_control):
+    """Build a response for a static body, or 304 if the ETag matches."""
+    if_none_match = request.if_none_match
+    if if_none_match is not None and any(
+            tag.value in (etag, '*') for tag in if_none_match):
+        response = web.Response(status=304)
+    else:
+        response = web.Response(body=body, content_type=content_type,
+                                charset='utf-8')
+    response.etag = etag
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+async def index(request):
+    """Render the main page with emotion detection form."""
+    return _conditional_response(request, pages.INDEX_BYTES, 'text/html',
+                                 pages.INDEX_ETAG, pages.PAGE_CACHE_CONTROL)
+
+
+async def stylesheet(request):
+    """Serve the shared stylesheet with long-lived caching headers."""
+    return _conditional_response(request, pages.STYLESHEET, 'text/css',
+                                 pages.STYLESHEET_ETAG,
+                                 pages.STYLESHEET_CACHE_CONTROL)
+
+
+async def emotion_detection(request):
+    """Asynchronous emotion detection endpoint."""
+    # Get the text from query parameters
+    text_to_analyze = request.query.get('textToAnalyze')
+
+    # Check if text is provided and not blank
+    with tracing.span('validate'):
+        blank = not text_to_analyze or text_to_analyze.strip() == ""
+    if blank:
+        page = create_error_page(
+            "Invalid Input Error",
+            "Invalid text! Please try again!",
+            "Please provide some text to analyze. Empty or blank text "
+            "cannot be processed.",
+            "#ffe6e6",
+            "#ff9999",
+            "#cc0000"
+        )
+        return web.Response(text=page, content_type='text/html')
+
+    # A client already holding this result revalidates without any
+    # upstream call
+    etag = http_cache.result_etag(text_to_analyze)
+    if_none_match = request.if_none_match
+    if if_none_match is not None and any(
+            tag.value == etag for tag in if_none_match):
+        response = web.Response(status=304)
+        response.etag = ETag(value=etag, is_weak=True)
+        response.headers['Cache-Control'] = config.RESULT_CACHE_CONTROL
+        return response
+    cacheable = http_cache.results_are_cacheable()
+
+    # Await the analysis without blocking other requests; calls shed by
+    # the upstream rate limit fail fast with a 503
+    try:
+        result = await async_emotion_predictor(text_to_analyze,
+                                               shed_load=True)
+    except RateLimitedError as e:
+        return web.Response(
+            text=create_busy_page(text_to_analyze), content_type='text/html',
+            status=503,
+            headers={'Retry-After': http_cache.retry_after_header(e)})
+
+    if "Invalid text! Please try again!" in result:
+        page = create_error_page(
+            "Analysis Error",
+            result,
+            "The text could not be processed due to API connectivity "
+            "issues or invalid content. Please check your input and "
+            "try again.",
+            "#fff3cd",
+            "#ffeaa7",
+            "#856404",
+            text_to_analyze
+        )
+        return web.Response(text=page, content_type='text/html')
+
+    page = create_success_page(text_to_analyze, result)
+    response = web.Response(text=page, content_type='text/html')
+    if cacheable and http_cache.results_are_cacheable():
+        response.etag = ETag(value=etag, is_weak=True)
+        response.headers['Cache-Control'] = config.RESULT_CACHE_CONTROL
+    return response
+
+
+# Open /live connections; every connection of a process shares its loop
+_live_connections = 0
+
+
+def _parse_update(data):
+    """
+    Reads one live update frame.
+
+    A frame is either a JSON object {"text": ..., "seq": ...} or the
+    text itself.
+
+    Returns:
+        tuple: (text, seq), seq None if the client did not number it
+    """
+    if data.startswith('{'):
+        try:
+            update = json.loads(data)
+        except ValueError:
+            update = None
+        if isinstance(update, dict) and isinstance(update.get('text'), str):
+            seq = update.get('seq')
+            return update['text'], seq if isinstance(seq, int) else None
+    return data, None
+
+
+async def live_analysis(request):
+    """Stream scores of a client's latest text over a WebSocket."""
+    global _live_connections
+    if _live_connections >= config.LIVE_MAX_CONNECTIONS:
+        return web.Response(status=503, text="Too many live connections",
+                            headers={'Retry-After': '1'})
+    # Reserve the slot before the handshake yields, so concurrent
+    # handshakes cannot all pass the check
+    _live_connections += 1
+    metrics.LIVE_CONNECTIONS.inc()
+    session = None
+    try:
+        ws = web.WebSocketResponse(heartbeat=config.LIVE_HEARTBEAT or None,
+                                   max_msg_size=config.API_MAX_CONTENT_LENGTH)
+        await ws.prepare(request)
+        session = LiveSession(ws.send_json,
+                              request_id=tracing.current_request_id())
+        async for message in ws:
+            if message.type == WSMsgType.TEXT:
+                session.update(*_parse_update(message.data))
+            elif message.type == WSMsgType.BINARY:
+                await ws.send_json({'error': "Send text frames"})
+    finally:
+        if session is not None:
+            await session.close()
+        _live_connections -= 1
+        metrics.LIVE_CONNECTIONS.dec()
+    return ws
+
+
+async def status(request):
+    """Report circuit breaker, cache and request coalescing state."""
+    return web.json_response(get_status())
+
+
+@web.middleware
+async def compress_response(request, handler):
+    """Compress text responses for clients that accept gzip or brotli."""
+    response = await handler(request)
+    if (type(response) is not web.Response
+            or response.content_type not in http_cache.COMPRESSIBLE_TYPES):
+        return response
+    response.headers['Vary'] = 'Accept-Encoding'
+    body = response.body
+    if not isinstance(body, bytes) or not http_cache.should_compress(
+            response.content_type, len(body), response.status,
+            response.headers.get('Content-Encoding')):
+        return response
+    encoding = http_cache.choose_encoding(
+        request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+
+    etag = response.etag
+    static_etag = etag.value if etag is not None and not etag.is_weak else None
+    with tracing.span('compress'):
+        response.body = http_cache.compress(body, encoding, static_etag)
+    response.headers['Content-Encoding'] = encoding
+    if static_etag:
+        # The compressed body is not byte-identical to the tagged one
+        response.etag = ETag(value=static_etag, is_weak=True)
+    return response
+
+
+def _route(request):
+    """Route pattern of a request, for metric labels and logs."""
+    # Route patterns, not raw paths, keep label cardinality bounded
+    resource = request.match_info.route.resource
+    return resource.canonical if resource is not None else 'unmatched'
+
+
+@web.middleware
+async def record_metrics(request, handler):
+    """Record request count, latency and in-flight gauge per route."""
+    route = _route(request)
+    metrics.HTTP_REQUESTS_IN_FLIGHT.inc(route)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        metrics.HTTP_REQUESTS_IN_FLIGHT.dec(route)
+        metrics.HTTP_REQUEST_DURATION.observe(time.perf_counter() - start,
+                                              route)
+        metrics.HTTP_REQUESTS.inc(route, request.method, str(status))
+
+
+@web.middleware
+async def trace_request(request, handler):
+    """
+    Trace the request: echo its request ID, add a Server-Timing header
+    and log the span timings.
+
+    The sampling profiler hook is only used by server.py: on the event
+    loop a profiler would also capture every other in-flight request.
+    """
+    if not config.TRACING_ENABLED:
+        return await handler(request)
+    trace, token = tracing.start_trace(
+        request.headers.get(config.TRACE_REQUEST_ID_HEADER))
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        response.headers[config.TRACE_REQUEST_ID_HEADER] = trace.request_id
+        response.headers['Server-Timing'] = trace.server_timing()
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        tracing.finish_trace(token)
+        tracing.log_trace(trace, route=_route(request),
+                          method=request.method, status=status)
+
+
+async def prometheus_metrics(request):
+    """Expose request, upstream and result metrics for Prometheus."""
+    return web.Response(body=metrics.render().encode('utf-8'),
+                        headers={'Content-Type': metrics.CONTENT_TYPE})
+
+
+async def _close_session(app):
+    """Release pooled upstream connections on shutdown."""
+    await close_async_session()
+
+
+def create_app():
+    """Build the aiohttp application."""
+    app = web.Application(middlewares=[record_metrics, trace_request,
+                                       compress_response])
+    app.router.add_get('/', index)
+    app.router.add_get('/static/style.css', stylesheet)
+    app.router.add_get('/emotionDetector', emotion_detection)
+    app.router.add_get('/status', status)
+    app.router.add_get('/metrics', prometheus_metrics)
+    app.router.add_get('/live', live_analysis)
+    app.on_cleanup.append(_close_session)
+    return app
+
+
+if __name__ == '__main__':
+    import os
+    tracing.configure_logging()
+    port = int(os.environ.get('PORT', 5000))
+    web.run_app(create_app(), host='0.0.0.0', port=port)
@@ -7,67 +7,27 @@ the Watson NLP emotion detection service.
 
 from flask import Flask, request
 from EmotionDetection import emotion_predictor
+import pages
 
-app = Flask(__name__)
+app = Flask(__name__, static_folder=None)
 
 
 @app.route('/')
 def index():
     """Render the main page with emotion detection form."""
-    return '''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Emotion Detection Application</title>
-        <style>
-            body {
-                font-family: Arial, sans-serif;
-                margin: 40px;
-            }
-            .container {
-                max-width: 600px;
-                margin: 0 auto;
-            }
-            input[type="text"] {
-                width: 70%;
-                padding: 10px;
-                font-size: 16px;
-            }
-            button {
-                padding: 10px 20px;
-                font-size: 16px;
-                background-color: #007cba;
-                color: white;
-                border: none;
-                cursor: pointer;
-            }
-            button:hover {
-                background-color: #005a87;
-            }
-            .result {
-                margin-top: 20px;
-                padding: 15px;
-                background-color: #f0f8ff;
-                border: 1px solid #ddd;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>Emotion Detection Application</h1>
-            <p>Welcome to the emotion detection service! Enter some text
-               below to analyze its emotional content.</p>
-
-            <form action="/emotionDetector" method="GET">
-                <label for="textToAnalyze">Text to analyze:</label><br><br>
-                <input type="text" id="textToAnalyze" name="textToAnalyze"
-                       placeholder="Enter text here..." required><br><br>
-                <button type="submit">Analyze Emotion</button>
-            </form>
-        </div>
-    </body>
-    </html>
-    '''
+    response = app.response_class(pages.INDEX_BYTES, mimetype='text/html')
+    response.set_etag(pages.INDEX_ETAG)
+    response.headers['Cache-Control'] = pages.PAGE_CACHE_CONTROL
+    return response.make_conditional(request)
+
+
+@app.route('/static/style.css')
+def stylesheet():
+    """Serve the shared stylesheet with long-lived caching headers."""
+    response = app.response_class(pages.STYLESHEET, mimetype='text/css')
+    response.set_etag(pages.STYLESHEET_ETAG)
+    response.headers['Cache-Control'] = pages.STYLESHEET_CACHE_CONTROL
+    return response.make_conditional(request)
 
 
 @app.route('/emotionDetector')
@@ -114,119 +74,19 @@ def emotion_detection():
 def create_error_page(title, error_message, description, bg_color,
                       border_color, text_color, analyzed_text=None):
     """Create a formatted error page."""
-    analyzed_text_html = ""
-    if analyzed_text:
-        analyzed_text_html = (
-            f'<p><strong>Analyzed Text:</strong> "{analyzed_text}"</p>'
-        )
-
-    return f'''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>{title} - Emotion Detection</title>
-        <style>
-            body {{
-                font-family: Arial, sans-serif;
-                margin: 40px;
-            }}
-            .container {{
-                max-width: 600px;
-                margin: 0 auto;
-            }}
-            .error {{
-                margin-top: 20px;
-                padding: 15px;
-                background-color: {bg_color};
-                border: 1px solid {border_color};
-                border-radius: 5px;
-                color: {text_color};
-            }}
-            .back-link {{
-                margin-top: 20px;
-            }}
-            .back-link a {{
-                color: #007cba;
-                text-decoration: none;
-            }}
-            .back-link a:hover {{
-                text-decoration: underline;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>{title}</h1>
-            {analyzed_text_html}
-
-            <div class="error">
-                <h3>⚠️ Error:</h3>
-                <p><strong>{error_message}</strong></p>
-                <p>{description}</p>
-            </div>
-
-            <div class="back-link">
-                <a href="/">&larr; Go Back and Try Again</a>
-            </div>
-        </div>
-    </body>
-    </html>
-    '''
+    return pages.render_error_page(title, error_message, description,
+                                   bg_color, border_color, text_color,
+                                   analyzed_text)
 
 
 def create_success_page(text_to_analyze, result):
     """Create a formatted success page."""
-    return f'''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Emotion Analysis Result</title>
-        <style>
-            body {{
-                font-family: Arial, sans-serif;
-                margin: 40px;
-            }}
-            .container {{
-                max-width: 600px;
-                margin: 0 auto;
-            }}
-            .result {{
-                margin-top: 20px;
-                padding: 15px;
-                background-color: #f0f8ff;
-                border: 1px solid #ddd;
-                border-radius: 5px;
-            }}
-            .back-link {{
-                margin-top: 20px;
-            }}
-            .back-link a {{
-                color: #007cba;
-                text-decoration: none;
-            }}
-            .back-link a:hover {{
-                text-decoration: underline;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>Emotion Analysis Result</h1>
-            <p><strong>Analyzed Text:</strong> "{text_to_analyze}"</p>
-
-            <div class="result">
-                <h3>Analysis Result:</h3>
-                <p>{result}</p>
-            </div>
-
-            <div class="back-link">
-                <a href="/">&larr; Analyze Another Text</a>
-            </div>
-        </div>
-    </body>
-    </html>
-    '''
+    return pages.render_success_page(text_to_analyze, result)
 
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Development server only; production runs gunicorn (see Procfile)
+    import os
+    port = int(os.environ.get('PORT', 5000))
+    debug = os.environ.get('FLASK_DEBUG', '0').lower() in ('1', 'true', 'yes')
+    app.run(debug=debug, host='0.0.0.0', port=port)
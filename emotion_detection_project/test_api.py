@@ -0,0 +1,101 @@
+# test_api.py
+# Unit tests for the versioned JSON API
+
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from EmotionDetection import config
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.circuit_breaker import get_breaker
+from server import app
+
+
+class TestApi(unittest.TestCase):
+
+    def setUp(self):
+        clear_cache()
+        get_breaker().reset()
+        self.client = app.test_client()
+        patcher = patch.object(config, 'BACKEND', 'local')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_single_text(self):
+        """Test GET returns the raw score dictionary"""
+        response = self.client.get('/api/v1/emotions',
+                                   query_string={'text': 'I am glad'})
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data['dominant_emotion'], 'joy')
+        self.assertIsNone(data['error'])
+        # Compact serialization: no whitespace after separators
+        self.assertNotIn(b', ', response.data)
+
+    def test_single_text_blank(self):
+        """Test a blank text is rejected with 400"""
+        response = self.client.get('/api/v1/emotions?text=%20')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.get_json())
+
+    def test_single_text_upstream_failure(self):
+        """Test an upstream failure returns 502 with the error"""
+        with patch.object(config, 'BACKEND', 'watson'), \
+                patch.object(config, 'WATSON_URL', 'http://127.0.0.1:9/'):
+            response = self.client.get('/api/v1/emotions?text=hello')
+        self.assertEqual(response.status_code, 502)
+        self.assertIn('API connection failed', response.get_json()['error'])
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_rejected_text_is_not_an_upstream_failure(self, mock_get_session):
+        """Test an upstream 400 (the text is at fault) returns 422"""
+        mock_get_session.return_value.post.return_value = MagicMock(
+            status_code=400, text='{"code": 3}')
+        with patch.object(config, 'BACKEND', 'watson'):
+            single = self.client.get('/api/v1/emotions?text=hello')
+            document = self.client.post('/api/v1/emotions/document',
+                                        json={'text': 'hello'})
+        self.assertEqual(single.status_code, 422)
+        self.assertIsNone(single.get_json()['dominant_emotion'])
+        self.assertIn('400', single.get_json()['error'])
+        self.assertEqual(document.status_code, 422)
+
+    def test_batch_in_order(self):
+        """Test the bulk endpoint scores every text in order"""
+        texts = ['I am glad', 'I am so sad', '', 'I am really mad']
+        response = self.client.post('/api/v1/emotions/batch',
+                                    json={'texts': texts})
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()['results']
+        self.assertEqual([r['dominant_emotion'] for r in results],
+                         ['joy', 'sadness', None, 'anger'])
+
+    def test_batch_bad_payload(self):
+        """Test malformed bodies are rejected with 400"""
+        response = self.client.post('/api/v1/emotions/batch',
+                                    data='not json',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/v1/emotions/batch',
+                                    json={'texts': 'a string'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_too_many_texts(self):
+        """Test the per-request text limit"""
+        with patch.object(config, 'API_MAX_BATCH_TEXTS', 2):
+            response = self.client.post('/api/v1/emotions/batch',
+                                        json={'texts': ['a', 'b', 'c']})
+        self.assertEqual(response.status_code, 413)
+
+    def test_batch_body_too_large(self):
+        """Test bodies over MAX_CONTENT_LENGTH get a JSON 413"""
+        body = json.dumps({'texts': ['x' * 100] * 20})
+        with patch.dict(app.config, {'MAX_CONTENT_LENGTH': 1000}):
+            response = self.client.post('/api/v1/emotions/batch', data=body,
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('error', response.get_json())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# test_async_detector.py
+# Unit tests for the asyncio emotion detector and server_async
+
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from EmotionDetection import config, async_emotion_detector
+from EmotionDetection.async_detector import close_async_session
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.circuit_breaker import get_breaker
+from benchmarks.stub_watson import start_stub_server
+from server_async import create_app
+
+
+class TestAsyncDetector(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.stub, cls.stub_url = start_stub_server()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.shutdown()
+
+    def setUp(self):
+        clear_cache()
+        get_breaker().reset()
+
+    def _run(self, coro):
+        """Run a coroutine and close the session on the same loop"""
+        async def wrapper():
+            try:
+                return await coro
+            finally:
+                await close_async_session()
+        return asyncio.run(wrapper())
+
+    def test_success_response(self):
+        """Test scores are parsed from the upstream response"""
+        with patch.object(config, 'WATSON_URL', self.stub_url):
+            result = self._run(async_emotion_detector("I am glad"))
+        self.assertEqual(result['joy'], 0.9)
+        self.assertEqual(result['dominant_emotion'], 'joy')
+
+    def test_concurrent_calls(self):
+        """Test many concurrent analyses share one session"""
+        async def many():
+            return await asyncio.gather(
+                *(async_emotion_detector(f"text {i}") for i in range(50)))
+
+        with patch.object(config, 'WATSON_URL', self.stub_url):
+            results = self._run(many())
+        self.assertTrue(all(r['dominant_emotion'] == 'joy' for r in results))
+
+    def test_blank_text(self):
+        """Test blank text returns None values without a request"""
+        result = self._run(async_emotion_detector("   "))
+        self.assertIsNone(result['dominant_emotion'])
+
+    def test_connection_failure(self):
+        """Test an unreachable API returns None values"""
+        with patch.object(config, 'WATSON_URL', 'http://127.0.0.1:9/'):
+            result = self._run(async_emotion_detector("I am glad"))
+        self.assertIsNone(result['dominant_emotion'])
+
+    def test_async_server_routes(self):
+        """Test server_async renders success and error pages"""
+        async def requests():
+            async with TestClient(TestServer(create_app())) as client:
+                index = await client.get('/')
+                success = await client.get(
+                    '/emotionDetector', params={'textToAnalyze': 'I am glad'})
+                blank = await client.get('/emotionDetector')
+                return (await index.text(), await success.text(),
+                        await blank.text())
+
+        with patch.object(config, 'WATSON_URL', self.stub_url):
+            index, success, blank = self._run(requests())
+        self.assertIn('Emotion Detection Application', index)
+        self.assertIn('The dominant emotion is joy', success)
+        self.assertIn('Invalid text! Please try again!', blank)
+
+
+if __name__ == '__main__':
+    unittest.main()
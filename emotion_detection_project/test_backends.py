@@ -0,0 +1,68 @@
+# test_backends.py
+# Unit tests for the pluggable scoring backends
+
+import unittest
+from unittest.mock import patch
+
+from EmotionDetection import config, emotion_detector, emotion_predictor
+from EmotionDetection.backends import LocalBackend, WatsonBackend, get_backend
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.circuit_breaker import get_breaker
+
+
+class TestBackends(unittest.TestCase):
+
+    def setUp(self):
+        clear_cache()
+        get_breaker().reset()
+
+    def test_get_backend_by_name(self):
+        """Test backends are looked up by name"""
+        self.assertIsInstance(get_backend('watson'), WatsonBackend)
+        self.assertIsInstance(get_backend('LOCAL'), LocalBackend)
+        with self.assertRaises(ValueError):
+            get_backend('unknown')
+
+    def test_local_dominant_emotions(self):
+        """Test the local engine finds the obvious dominant emotion"""
+        backend = LocalBackend()
+        cases = {
+            "I think I am having fun": 'joy',
+            "I am really mad about this": 'anger',
+            "I feel disgusted just hearing about this": 'disgust',
+            "I am so sad about this": 'sadness',
+            "I am really afraid that this will happen": 'fear',
+            "I am not happy": 'sadness',
+        }
+        for text, expected in cases.items():
+            self.assertEqual(backend.detect(text)['dominant_emotion'],
+                             expected, text)
+
+    def test_local_result_shape(self):
+        """Test the local engine returns the emotion_detector dict shape"""
+        result = LocalBackend().detect("Nothing special here")
+        self.assertEqual(set(result), {'anger', 'disgust', 'fear', 'joy',
+                                       'sadness', 'dominant_emotion'})
+        self.assertAlmostEqual(sum(result[e] for e in
+                                   ('anger', 'disgust', 'fear', 'joy',
+                                    'sadness')), 1.0, places=4)
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_emotion_detector_uses_configured_backend(self, mock_get_session):
+        """Test BACKEND=local scores without touching the network"""
+        with patch.object(config, 'BACKEND', 'local'):
+            result = emotion_detector("I am glad this happened")
+            sentence = emotion_predictor("I am glad this happened")
+        self.assertEqual(result['dominant_emotion'], 'joy')
+        self.assertIn("The dominant emotion is joy", sentence)
+        mock_get_session.assert_not_called()
+
+    def test_detect_many(self):
+        """Test detect_many returns one result per text"""
+        results = LocalBackend().detect_many(["I am happy", "I am sad"])
+        self.assertEqual([r['dominant_emotion'] for r in results],
+                         ['joy', 'sadness'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# test_batch.py
+# Unit tests for concurrent batch emotion detection
+
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+from EmotionDetection import emotion_detector_batch
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.circuit_breaker import get_breaker
+
+
+def _mock_response(status_code, joy=0.9):
+    """Build a mock Watson response"""
+    response = MagicMock()
+    response.status_code = status_code
+    response.text = ('{"emotionPredictions": [{"emotion": {"anger": 0.01, '
+                     '"disgust": 0.02, "fear": 0.03, "joy": %s, '
+                     '"sadness": 0.04}}]}' % joy)
+    return response
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        clear_cache()
+        get_breaker().reset()
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_results_keep_input_order(self, mock_get_session):
+        """Test results come back in input order despite varying latency"""
+        def post(url, json, headers, timeout):
+            index = int(json['raw_document']['text'])
+            # Later texts finish first
+            time.sleep((10 - index) * 0.002)
+            return _mock_response(200, joy=index / 10)
+        mock_get_session.return_value.post.side_effect = post
+
+        texts = [str(i) for i in range(10)]
+        results = emotion_detector_batch(texts, max_workers=4)
+
+        self.assertEqual([r['joy'] for r in results],
+                         [i / 10 for i in range(10)])
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_per_item_errors(self, mock_get_session):
+        """Test failures are reported per item without failing the batch"""
+        def post(url, json, headers, timeout):
+            if json['raw_document']['text'] == 'bad':
+                return _mock_response(500)
+            return _mock_response(200)
+        mock_get_session.return_value.post.side_effect = post
+
+        results = emotion_detector_batch(['good', 'bad', '  '])
+
+        self.assertEqual(results[0]['dominant_emotion'], 'joy')
+        self.assertIsNone(results[0]['error'])
+        self.assertIsNone(results[1]['dominant_emotion'])
+        self.assertIn('500', results[1]['error'])
+        self.assertEqual(results[2]['error'], 'Blank text')
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_concurrency_limit(self, mock_get_session):
+        """Test no more than max_workers calls are in flight"""
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+
+        def post(url, json, headers, timeout):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.005)
+            with lock:
+                state['active'] -= 1
+            return _mock_response(200)
+        mock_get_session.return_value.post.side_effect = post
+
+        emotion_detector_batch(('text %d' % i for i in range(20)),
+                               max_workers=3)
+
+        self.assertLessEqual(state['peak'], 3)
+
+    def test_invalid_max_workers(self):
+        """Test a non-positive concurrency limit is rejected"""
+        with self.assertRaises(ValueError):
+            emotion_detector_batch(['text'], max_workers=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
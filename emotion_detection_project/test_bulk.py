@@ -0,0 +1,65 @@
+# test_bulk.py
+# Unit tests for the vectorized NumPy bulk scorer
+
+import unittest
+
+import numpy as np
+
+from EmotionDetection.backends import LocalBackend
+from EmotionDetection.bulk import row_to_result, rows_to_results, score_texts
+
+TEXTS = [
+    "I think I am having fun",
+    "I am really mad about this",
+    "I feel disgusted just hearing about this",
+    "I am so sad about this",
+    "I am really afraid that this will happen",
+    "I am not happy, not at all",
+    "Nothing to see here",
+]
+
+
+class TestBulk(unittest.TestCase):
+
+    def test_array_shapes_and_types(self):
+        """Test scores are a contiguous float32 N x 5 matrix"""
+        scores, dominant = score_texts(TEXTS)
+        self.assertEqual(scores.shape, (len(TEXTS), 5))
+        self.assertEqual(scores.dtype, np.float32)
+        self.assertTrue(scores.flags['C_CONTIGUOUS'])
+        self.assertEqual(dominant.shape, (len(TEXTS),))
+
+    def test_matches_local_backend(self):
+        """Test bulk results agree with the per-text local engine"""
+        scores, dominant = score_texts(TEXTS)
+        backend = LocalBackend()
+        for text, result in zip(TEXTS, rows_to_results(scores, dominant)):
+            expected = backend.detect(text)
+            self.assertEqual(result['dominant_emotion'],
+                             expected['dominant_emotion'], text)
+            for emotion in ('anger', 'disgust', 'fear', 'joy', 'sadness'):
+                self.assertAlmostEqual(result[emotion], expected[emotion],
+                                       places=5)
+
+    def test_negation_does_not_cross_texts(self):
+        """Test a negation at the end of one text leaves the next alone"""
+        scores, dominant = score_texts(["this is not", "happy"])
+        alone, _ = score_texts(["happy"])
+        np.testing.assert_allclose(scores[1], alone[0])
+
+    def test_blank_texts(self):
+        """Test blank texts map to the None result"""
+        scores, dominant = score_texts(["", "   ", None])
+        self.assertTrue(np.isnan(scores).all())
+        self.assertEqual(row_to_result(scores, dominant, 0)['dominant_emotion'],
+                         None)
+
+    def test_empty_batch(self):
+        """Test an empty batch returns empty arrays"""
+        scores, dominant = score_texts([])
+        self.assertEqual(scores.shape, (0, 5))
+        self.assertEqual(len(dominant), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,231 @@
+# test_cache.py
+# Unit tests for the emotion detection result cache
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+
+from EmotionDetection import config, emotion_detector
+from EmotionDetection.cache import (
+    MemoryCache, SQLiteCache, TieredCache, clear_cache, create_cache,
+    get_cache, normalize_key
+)
+from EmotionDetection.circuit_breaker import get_breaker
+
+RESULT = {
+    'anger': 0.01, 'disgust': 0.02, 'fear': 0.03, 'joy': 0.9,
+    'sadness': 0.04, 'dominant_emotion': 'joy'
+}
+
+
+class TestMemoryCache(unittest.TestCase):
+
+    def test_normalize_key(self):
+        """Test whitespace differences map to the same key"""
+        self.assertEqual(normalize_key("  I am\thappy \n"), "I am happy")
+
+    def test_hit_and_miss_counters(self):
+        """Test hits and misses are counted"""
+        cache = MemoryCache(max_size=4)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', RESULT)
+        self.assertEqual(cache.get('a'), RESULT)
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted first"""
+        cache = MemoryCache(max_size=2)
+        cache.set('a', RESULT)
+        cache.set('b', RESULT)
+        cache.get('a')
+        cache.set('c', RESULT)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    @patch('EmotionDetection.cache.time.monotonic')
+    def test_ttl_expiry(self, mock_monotonic):
+        """Test entries expire after the TTL"""
+        mock_monotonic.return_value = 100.0
+        cache = MemoryCache(max_size=2, ttl=10)
+        cache.set('a', RESULT)
+        mock_monotonic.return_value = 111.0
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+    def test_failed_results_not_cached(self):
+        """Test None results are never stored"""
+        cache = MemoryCache()
+        cache.set('a', None)
+        cache.set('b', dict(RESULT, dominant_emotion=None))
+        self.assertEqual(len(cache), 0)
+
+    def test_returns_copies(self):
+        """Test callers cannot mutate the cached entry"""
+        cache = MemoryCache()
+        cache.set('a', RESULT)
+        cache.get('a')['joy'] = 0
+        self.assertEqual(cache.get('a')['joy'], 0.9)
+
+    def test_thread_safety(self):
+        """Test concurrent writers keep the size bound"""
+        cache = MemoryCache(max_size=50)
+
+        def writer(offset):
+            for i in range(200):
+                cache.set(f'{offset}-{i}', RESULT)
+                cache.get(f'{offset}-{i // 2}')
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(cache), 50)
+
+
+class TestSQLiteCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_shared_between_instances(self):
+        """Test a second instance (another worker) sees stored results"""
+        SQLiteCache(self.path).set('a', RESULT)
+        self.assertEqual(SQLiteCache(self.path).get('a'), RESULT)
+
+    def test_failed_results_not_cached(self):
+        """Test None results are never stored on disk"""
+        cache = SQLiteCache(self.path)
+        cache.set('a', dict(RESULT, dominant_emotion=None))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction(self):
+        """Test the least recently used entries are evicted"""
+        cache = SQLiteCache(self.path, max_size=2, ttl=0, evict_every=1)
+        with patch('EmotionDetection.cache.time.time') as mock_time:
+            for now, key in enumerate(['a', 'b']):
+                mock_time.return_value = 100.0 + now
+                cache.set(key, RESULT)
+            mock_time.return_value = 103.0
+            cache.get('a')
+            mock_time.return_value = 104.0
+            cache.set('c', RESULT)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_ttl_expiry(self):
+        """Test expired entries are treated as misses"""
+        cache = SQLiteCache(self.path, ttl=10)
+        with patch('EmotionDetection.cache.time.time') as mock_time:
+            mock_time.return_value = 100.0
+            cache.set('a', RESULT)
+            mock_time.return_value = 111.0
+            self.assertIsNone(cache.get('a'))
+
+    def test_warm_start(self):
+        """Test a restarted process preloads memory from disk"""
+        SQLiteCache(self.path).set('a', RESULT)
+        tiered = TieredCache(MemoryCache(), SQLiteCache(self.path))
+        self.assertEqual(tiered.warm_start(), 1)
+        self.assertEqual(tiered.memory.get('a'), RESULT)
+
+    def test_memory_hits_refresh_disk_recency(self):
+        """Test entries hot in memory are not the first evicted on disk"""
+        disk = SQLiteCache(self.path, max_size=2, ttl=0, evict_every=1)
+        tiered = TieredCache(MemoryCache(), disk, touch_every=1)
+        with patch('EmotionDetection.cache.time.time') as mock_time:
+            for now, key in enumerate(['a', 'b']):
+                mock_time.return_value = 100.0 + now
+                tiered.set(key, RESULT)
+            mock_time.return_value = 103.0
+            # Served from memory; disk only learns of it through a touch
+            self.assertEqual(tiered.get('a'), RESULT)
+            mock_time.return_value = 104.0
+            tiered.set('c', RESULT)
+        self.assertIsNone(disk.get('b'))
+        self.assertIsNotNone(disk.get('a'))
+        self.assertEqual(disk.most_recent(1)[0][0], 'a')
+
+    def test_promoted_entries_keep_disk_expiry(self):
+        """Test warm-started and promoted entries expire with the disk row"""
+        with patch('EmotionDetection.cache.time.time') as mock_time, \
+                patch('EmotionDetection.cache.time.monotonic') as monotonic:
+            mock_time.return_value = 100.0
+            SQLiteCache(self.path, ttl=10).set('a', RESULT)
+            SQLiteCache(self.path, ttl=10).set('b', RESULT)
+
+            mock_time.return_value = 108.0
+            monotonic.return_value = 500.0
+            tiered = TieredCache(MemoryCache(ttl=10),
+                                 SQLiteCache(self.path, ttl=10))
+            tiered.warm_start(limit=1)
+            self.assertIsNone(tiered.memory.get('a'))
+            self.assertEqual(tiered.get('a'), RESULT)
+
+            # Two seconds were left on disk, not a fresh ten
+            monotonic.return_value = 503.0
+            self.assertIsNone(tiered.memory.get('a'))
+            self.assertIsNone(tiered.memory.get('b'))
+
+    def test_backend_selected_by_config(self):
+        """Test CACHE_BACKEND switches between memory and sqlite"""
+        with patch.object(config, 'CACHE_BACKEND', 'sqlite'), \
+                patch.object(config, 'CACHE_PATH', self.path):
+            self.assertIsInstance(create_cache(), TieredCache)
+        with patch.object(config, 'CACHE_BACKEND', 'memory'):
+            self.assertIsInstance(create_cache(), MemoryCache)
+        with patch.object(config, 'CACHE_BACKEND', 'redis'):
+            with self.assertRaises(ValueError):
+                create_cache()
+
+
+class TestDetectorCaching(unittest.TestCase):
+
+    def setUp(self):
+        clear_cache()
+        get_breaker().reset()
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_repeat_text_served_from_cache(self, mock_get_session):
+        """Test a repeated text makes only one upstream call"""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.text = ('{"emotionPredictions": [{"emotion": {'
+                              '"anger": 0.01, "disgust": 0.02, "fear": 0.03, '
+                              '"joy": 0.9, "sadness": 0.04}}]}')
+        mock_get_session.return_value.post.return_value = mock_response
+
+        first = emotion_detector("I am glad")
+        second = emotion_detector("  I am   glad ")
+
+        self.assertEqual(first, second)
+        self.assertEqual(mock_get_session.return_value.post.call_count, 1)
+        self.assertEqual(get_cache().stats()['hits'], 1)
+
+    @patch.object(config, 'RETRY_ENABLED', False)
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_failures_not_cached(self, mock_get_session):
+        """Test a failed call is retried on the next request"""
+        mock_response = MagicMock()
+        mock_response.status_code = 500
+        mock_get_session.return_value.post.return_value = mock_response
+
+        emotion_detector("I am glad")
+        emotion_detector("I am glad")
+
+        self.assertEqual(mock_get_session.return_value.post.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
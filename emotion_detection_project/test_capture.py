@@ -0,0 +1,193 @@
+# test_capture.py
+# Unit tests for upstream traffic capture and its replay stand-in
+
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from EmotionDetection import config, emotion_detector
+from EmotionDetection.async_detector import (
+    async_request_emotions, close_async_session
+)
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.capture import read_capture
+from EmotionDetection.circuit_breaker import get_breaker
+from EmotionDetection.emotion_detector import (
+    EmotionDetectionError, request_emotions
+)
+from benchmarks.replay import schedule, start_replay_server
+from benchmarks.stub_watson import start_stub_server
+
+WATSON_OK = ('{"emotionPredictions": [{"emotion": {"anger": 0.01, '
+             '"disgust": 0.02, "fear": 0.03, "joy": 0.9, "sadness": 0.04}}]}')
+WATSON_SAD = ('{"emotionPredictions": [{"emotion": {"anger": 0.01, '
+              '"disgust": 0.02, "fear": 0.03, "joy": 0.04, "sadness": 0.9}}]}')
+
+
+class CaptureTestCase(unittest.TestCase):
+    """Points the capture at a fresh temporary file."""
+
+    def setUp(self):
+        clear_cache()
+        get_breaker().reset()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'capture.jsonl')
+        for patcher in (patch.object(config, 'CAPTURE_PATH', self.path),
+                        patch.object(config, 'RETRY_ENABLED', False)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def records(self):
+        """Records captured so far."""
+        if not os.path.exists(self.path):
+            return []
+        return list(read_capture(self.path))
+
+
+class TestCapture(CaptureTestCase):
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_response_recorded(self, mock_get_session):
+        """Test a call is recorded with its text, status, body and timing"""
+        mock_get_session.return_value.post.return_value = MagicMock(
+            status_code=200, text=WATSON_OK)
+        before = time.time()
+        request_emotions("I am glad")
+
+        [entry] = self.records()
+        self.assertEqual(entry['q'], "I am glad")
+        self.assertEqual(entry['s'], 200)
+        self.assertEqual(entry['r'], WATSON_OK)
+        self.assertGreaterEqual(entry['t'], before - 1e-6)
+        self.assertGreaterEqual(entry['d'], 0)
+        self.assertNotIn('e', entry)
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_failures_recorded(self, mock_get_session):
+        """Test calls without a response record the kind of failure"""
+        mock_get_session.return_value.post.side_effect = [
+            requests.exceptions.Timeout("slow"),
+            MagicMock(status_code=500, text='{"code": 13}'),
+        ]
+        emotion_detector("I am glad")
+        emotion_detector("I am sad")
+
+        timeout, server_error = self.records()
+        self.assertEqual(timeout['e'], 'timeout')
+        self.assertNotIn('s', timeout)
+        self.assertEqual((server_error['s'], server_error['r']),
+                         (500, '{"code": 13}'))
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_disabled_and_sampled_out(self, mock_get_session):
+        """Test nothing is written when capture is off or not sampled"""
+        mock_get_session.return_value.post.return_value = MagicMock(
+            status_code=200, text=WATSON_OK)
+        with patch.object(config, 'CAPTURE_PATH', ''):
+            request_emotions("I am glad")
+        with patch.object(config, 'CAPTURE_SAMPLE_RATE', 0.0):
+            request_emotions("I am glad")
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_cache_hits_not_recorded(self):
+        """Test only calls that reach upstream are captured"""
+        with patch('EmotionDetection.http_pool.get_session') as get_session:
+            get_session.return_value.post.return_value = MagicMock(
+                status_code=200, text=WATSON_OK)
+            emotion_detector("I am glad")
+            emotion_detector("I am glad")
+        self.assertEqual(len(self.records()), 1)
+
+    def test_truncated_record_skipped(self):
+        """Test a record cut short by a crash does not break reading"""
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{"t":1,"d":0.1,"q":"a","s":200,"r":"{}"}\n{"t":2,"d"')
+        self.assertEqual([entry['q'] for entry in self.records()], ['a'])
+
+    def test_async_calls_recorded(self):
+        """Test the asyncio client captures its calls too"""
+        stub, url = start_stub_server()
+        self.addCleanup(stub.shutdown)
+
+        async def call():
+            try:
+                return await async_request_emotions("I am glad")
+            finally:
+                await close_async_session()
+
+        with patch.object(config, 'WATSON_URL', url):
+            asyncio.run(call())
+        [entry] = self.records()
+        self.assertEqual((entry['q'], entry['s']), ("I am glad", 200))
+
+
+class TestReplay(CaptureTestCase):
+
+    def replay(self, records):
+        """Points WATSON_URL at a stand-in serving records."""
+        server, url = start_replay_server(records)
+        self.addCleanup(server.shutdown)
+        patcher = patch.object(config, 'WATSON_URL', url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return server
+
+    def test_captured_traffic_replays(self):
+        """Test replaying a capture reproduces the original results"""
+        stub, url = start_stub_server()
+        self.addCleanup(stub.shutdown)
+        with patch.object(config, 'WATSON_URL', url):
+            original = [emotion_detector(f"I am glad {i}") for i in range(3)]
+
+        records = self.records()
+        with patch.object(config, 'CAPTURE_PATH', ''):
+            server = self.replay(records)
+            clear_cache()
+            replayed = [emotion_detector(f"I am glad {i}") for i in range(3)]
+        self.assertEqual(replayed, original)
+        self.assertEqual((server.requests, server.unmatched), (3, 0))
+
+    def test_responses_follow_recorded_order_and_latency(self):
+        """Test a text gets its recorded answers in turn, after their latency"""
+        records = [
+            {'t': 1.0, 'd': 0.05, 'q': "I am glad", 's': 200, 'r': WATSON_OK},
+            {'t': 2.0, 'd': 0.0, 'q': "I am glad", 's': 200, 'r': WATSON_SAD},
+            {'t': 3.0, 'd': 0.0, 'q': "down", 'e': 'connection'},
+        ]
+        server = self.replay(records)
+        with patch.object(config, 'CAPTURE_PATH', ''):
+            start = time.perf_counter()
+            first = request_emotions("I am glad")
+            self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+            second = request_emotions("I am glad")
+            third = request_emotions("I am glad")
+            with self.assertRaises(EmotionDetectionError) as raised:
+                request_emotions("down")
+            self.assertEqual(raised.exception.kind, 'connection')
+            # Unrecorded texts borrow records from the whole capture
+            request_emotions("never captured")
+
+        self.assertEqual([first['dominant_emotion'],
+                          second['dominant_emotion'],
+                          third['dominant_emotion']],
+                         ['joy', 'sadness', 'joy'])
+        self.assertEqual(server.unmatched, 1)
+
+    def test_schedule_speed(self):
+        """Test arrivals keep their spacing, compressed by the speed"""
+        records = [{'t': 100.0, 'q': 'a'}, {'t': 101.0, 'q': 'b'},
+                   {'t': 105.0, 'q': 'c'}]
+        self.assertEqual(schedule(records), [(0.0, 'a'), (1.0, 'b'),
+                                             (5.0, 'c')])
+        self.assertEqual(schedule(records, speed=10),
+                         [(0.0, 'a'), (0.1, 'b'), (0.5, 'c')])
+
+
+if __name__ == '__main__':
+    unittest.main()
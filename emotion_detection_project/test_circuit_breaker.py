@@ -0,0 +1,144 @@
+# test_circuit_breaker.py
+# Unit tests for the Watson upstream circuit breaker
+
+import asyncio
+import unittest
+from unittest.mock import patch, MagicMock
+
+from EmotionDetection import config, emotion_detector
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, get_breaker
+)
+from EmotionDetection.emotion_detector import EmotionDetectionError
+from server import app
+
+
+def _fail():
+    raise EmotionDetectionError("down", kind='server_error', status_code=500)
+
+
+def _bad_input():
+    raise EmotionDetectionError("bad", kind='bad_request', status_code=400)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_after_threshold(self):
+        """Test consecutive failures open the circuit"""
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        for _ in range(3):
+            with self.assertRaises(EmotionDetectionError):
+                breaker.call(_fail)
+        self.assertEqual(breaker.state, OPEN)
+
+        # Open: the function is not called at all
+        fn = MagicMock()
+        with self.assertRaises(CircuitOpenError):
+            breaker.call(fn)
+        fn.assert_not_called()
+        self.assertEqual(breaker.stats()['rejected'], 1)
+
+    def test_bad_request_does_not_count(self):
+        """Test invalid-input errors leave the circuit closed"""
+        breaker = CircuitBreaker(failure_threshold=1)
+        with self.assertRaises(EmotionDetectionError):
+            breaker.call(_bad_input)
+        self.assertEqual(breaker.state, CLOSED)
+
+    @patch('EmotionDetection.circuit_breaker.time.monotonic')
+    def test_half_open_recovery(self, mock_monotonic):
+        """Test a successful trial call closes the circuit"""
+        mock_monotonic.return_value = 0.0
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+        with self.assertRaises(EmotionDetectionError):
+            breaker.call(_fail)
+
+        mock_monotonic.return_value = 11.0
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertEqual(breaker.call(lambda: 'ok'), 'ok')
+        self.assertEqual(breaker.state, CLOSED)
+
+    @patch('EmotionDetection.circuit_breaker.time.monotonic')
+    def test_half_open_failure_reopens(self, mock_monotonic):
+        """Test a failed trial call reopens the circuit"""
+        mock_monotonic.return_value = 0.0
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+        with self.assertRaises(EmotionDetectionError):
+            breaker.call(_fail)
+
+        mock_monotonic.return_value = 11.0
+        with self.assertRaises(EmotionDetectionError):
+            breaker.call(_fail)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.stats()['times_opened'], 2)
+
+    @patch('EmotionDetection.circuit_breaker.time.monotonic')
+    def test_cancelled_trial_releases_slot(self, mock_monotonic):
+        """Test a cancelled trial call lets the next trial through"""
+        mock_monotonic.return_value = 0.0
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+        with self.assertRaises(EmotionDetectionError):
+            breaker.call(_fail)
+        mock_monotonic.return_value = 11.0
+
+        async def trial():
+            task = asyncio.ensure_future(
+                breaker.call_async(asyncio.sleep, 10))
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(trial())
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+
+class TestDetectorBreaker(unittest.TestCase):
+
+    def setUp(self):
+        clear_cache()
+        get_breaker().reset()
+
+    def tearDown(self):
+        get_breaker().reset()
+
+    def _open_circuit(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 500
+        mock_get_session.return_value.post.return_value = mock_response
+        for i in range(config.BREAKER_FAILURE_THRESHOLD):
+            emotion_detector(f"text {i}")
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_fails_fast_when_open(self, mock_get_session):
+        """Test emotion_detector stops calling Watson once open"""
+        self._open_circuit(mock_get_session)
+        calls = mock_get_session.return_value.post.call_count
+
+        result = emotion_detector("another text")
+
+        self.assertIsNone(result['dominant_emotion'])
+        self.assertEqual(mock_get_session.return_value.post.call_count, calls)
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_local_fallback(self, mock_get_session):
+        """Test BREAKER_FALLBACK=local scores offline while open"""
+        self._open_circuit(mock_get_session)
+        with patch.object(config, 'BREAKER_FALLBACK', 'local'):
+            result = emotion_detector("I am glad")
+        self.assertEqual(result['dominant_emotion'], 'joy')
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_status_endpoint(self, mock_get_session):
+        """Test /status reports the breaker state"""
+        self._open_circuit(mock_get_session)
+        with app.test_client() as client:
+            response = client.get('/status')
+        self.assertEqual(response.get_json()['circuit_breaker']['state'], OPEN)
+
+
+if __name__ == '__main__':
+    unittest.main()
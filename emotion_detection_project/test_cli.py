@@ -0,0 +1,139 @@
+# test_cli.py
+# Unit tests for the streaming file scorer command line
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from EmotionDetection import config
+from EmotionDetection.cli import main, save_checkpoint, score_records
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        patcher = patch.object(config, 'BACKEND', 'local')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _path(self, name, content=None):
+        path = os.path.join(self.directory, name)
+        if content is not None:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+        return path
+
+    def _read_jsonl(self, path):
+        with open(path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_jsonl_in_order(self):
+        """Test JSONL records are scored and written in input order"""
+        texts = ["I am glad", "I am so sad", "I am really mad", ""]
+        source = self._path('in.jsonl', ''.join(
+            json.dumps({'id': i, 'text': t}) + '\n'
+            for i, t in enumerate(texts)))
+        output = self._path('out.jsonl')
+
+        self.assertEqual(main([source, '-o', output, '--concurrency', '2']), 0)
+
+        rows = self._read_jsonl(output)
+        self.assertEqual([r['id'] for r in rows], [0, 1, 2, 3])
+        self.assertEqual([r['dominant_emotion'] for r in rows],
+                         ['joy', 'sadness', 'anger', None])
+        self.assertEqual(rows[3]['error'], 'Blank text')
+
+    def test_malformed_json_line(self):
+        """Test a malformed line is reported in place and the run goes on"""
+        source = self._path('in.jsonl', '{"text": "I am glad"}\n'
+                                        '{"text": "I am\n'
+                                        '{"text": "I am so sad"}\n')
+        output = self._path('out.jsonl')
+
+        self.assertEqual(main([source, '-o', output]), 0)
+
+        glad, bad, sad = self._read_jsonl(output)
+        self.assertEqual((glad['dominant_emotion'], sad['dominant_emotion']),
+                         ('joy', 'sadness'))
+        self.assertEqual((bad['line'], bad['input']), (2, '{"text": "I am'))
+        self.assertIsNone(bad['dominant_emotion'])
+        self.assertTrue(bad['error'].startswith('Invalid JSON'))
+
+    def test_non_object_records(self):
+        """Test JSON values other than objects become per-record errors"""
+        source = self._path('in.jsonl', '"I am glad"\n[1, 2]\n'
+                                        '{"text": "I am glad"}\n')
+        output = self._path('out.jsonl')
+
+        self.assertEqual(main([source, '-o', output, '--checkpoint',
+                               self._path('out.ckpt')]), 0)
+
+        rows = self._read_jsonl(output)
+        self.assertEqual([row['error'] for row in rows],
+                         ["Record is not a JSON object"] * 2 + [None])
+        self.assertEqual(rows[1]['input'], '[1, 2]')
+        self.assertEqual(rows[2]['dominant_emotion'], 'joy')
+
+    def test_csv_with_custom_field(self):
+        """Test CSV input keeps its columns and adds result columns"""
+        source = self._path('in.csv', 'id,body\n1,"I am glad, really"\n')
+        output = self._path('out.csv')
+
+        main([source, '-o', output, '--text-field', 'body'])
+
+        with open(output, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines[0].startswith('id,body,anger'))
+        self.assertIn('joy', lines[1])
+
+    def test_resume_from_checkpoint(self):
+        """Test a crashed run resumes after the last checkpoint"""
+        texts = ["I am glad", "I am so sad", "I am really mad"]
+        source = self._path('in.jsonl', ''.join(
+            json.dumps({'id': i, 'text': t}) + '\n'
+            for i, t in enumerate(texts)))
+        output = self._path('out.jsonl')
+        checkpoint = self._path('out.ckpt')
+
+        # Simulate a crash after one checkpointed record and a torn write
+        first = json.dumps({'id': 0, 'text': texts[0],
+                            'dominant_emotion': 'joy'}) + '\n'
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(first + '{"id": 1, "te')
+        save_checkpoint(checkpoint, 1, len(first.encode('utf-8')))
+
+        main([source, '-o', output, '--checkpoint', checkpoint])
+
+        rows = self._read_jsonl(output)
+        self.assertEqual([r['id'] for r in rows], [0, 1, 2])
+        with open(checkpoint, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['processed'], 3)
+
+    def test_checkpoint_requires_output_file(self):
+        """Test checkpointing to stdout is rejected"""
+        source = self._path('in.jsonl', '')
+        self.assertEqual(main([source, '--checkpoint', 'x.ckpt']), 2)
+
+    def test_score_records_is_lazy(self):
+        """Test records are pulled from the input only as needed"""
+        pulled = []
+
+        def records():
+            for i in range(1000):
+                pulled.append(i)
+                yield {'text': 'I am glad'}
+
+        stream = score_records(records(), 'text', max_workers=2)
+        next(stream)
+        self.assertLess(len(pulled), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+# test_document.py
+# Unit tests for document mode: chunking, concurrent scoring, aggregation
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from EmotionDetection import (
+    async_document_emotion_detector, config, document_emotion_detector,
+    metrics
+)
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.document import aggregate, detect_document, split_chunks
+from EmotionDetection.emotion_detector import (
+    EmotionDetectionError, build_result
+)
+from server import app
+
+JOYFUL = build_result({'anger': 0.0, 'disgust': 0.0, 'fear': 0.0,
+                       'joy': 0.9, 'sadness': 0.1})
+SAD = build_result({'anger': 0.0, 'disgust': 0.0, 'fear': 0.0,
+                    'joy': 0.1, 'sadness': 0.9})
+
+
+def fake_detect(text, count=True):
+    """Scores 'fail' chunks as errors, 'sad' ones as sadness, else joy."""
+    if 'fail' in text:
+        raise EmotionDetectionError("Bad Request (400)", kind='bad_request')
+    return dict(SAD if 'sad' in text else JOYFUL)
+
+
+class TestSplitChunks(unittest.TestCase):
+
+    def test_short_text_is_one_chunk(self):
+        """Test a text within the limit is one stripped chunk"""
+        chunks = split_chunks("  I am glad.\n\nSo glad.  ", max_chars=100)
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(chunks[0].text, "I am glad.\n\nSo glad.")
+        self.assertEqual(chunks[0].start, 2)
+
+    def test_paragraphs_then_sentences(self):
+        """Test paragraphs are kept whole and long ones split on sentences"""
+        first = "Short paragraph one."
+        second = "A longer sentence here. Another one follows! And a third?"
+        text = f"{first}\n\n{second}"
+        chunks = split_chunks(text, max_chars=30)
+        self.assertEqual([chunk.text for chunk in chunks],
+                         [first, "A longer sentence here.",
+                          "Another one follows!", "And a third?"])
+        for chunk in chunks:
+            self.assertEqual(text[chunk.start:chunk.end], chunk.text)
+
+    def test_small_units_are_packed(self):
+        """Test adjacent sentences share a chunk up to the limit"""
+        text = " ".join(f"Sentence {i}." for i in range(20))
+        chunks = split_chunks(text, max_chars=40)
+        self.assertTrue(all(len(chunk.text) <= 40 for chunk in chunks))
+        self.assertLess(len(chunks), 20)
+        self.assertEqual(" ".join(chunk.text for chunk in chunks), text)
+
+    def test_overlong_words_are_cut(self):
+        """Test text without boundaries is still bounded"""
+        chunks = split_chunks("x" * 25 + " tail", max_chars=10)
+        self.assertEqual([chunk.text for chunk in chunks],
+                         ["x" * 10, "x" * 10, "xxxxx tail"])
+
+
+class TestAggregate(unittest.TestCase):
+
+    def test_length_weighted_average(self):
+        """Test longer chunks weigh more in the document scores"""
+        chunks = split_chunks("a" * 30 + " " + "b" * 10, max_chars=30)
+        result = aggregate(chunks, [JOYFUL, SAD])
+        self.assertAlmostEqual(result['joy'], (0.9 * 30 + 0.1 * 10) / 40)
+        self.assertAlmostEqual(result['sadness'], (0.1 * 30 + 0.9 * 10) / 40)
+        self.assertEqual(result['dominant_emotion'], 'joy')
+        self.assertEqual(result['coverage'], 1.0)
+        self.assertNotIn('chunks', result)
+
+    def test_failed_chunks_are_skipped(self):
+        """Test a failed chunk lowers coverage instead of failing"""
+        chunks = split_chunks("a" * 30 + " " + "b" * 10, max_chars=30)
+        error = EmotionDetectionError("down", kind='timeout')
+        result = aggregate(chunks, [error, SAD], include_chunks=True)
+        self.assertEqual(result['dominant_emotion'], 'sadness')
+        self.assertEqual(result['coverage'], 0.25)
+        self.assertEqual(result['chunks'][0]['error'], "down")
+        self.assertIsNone(result['chunks'][0]['joy'])
+        self.assertEqual(result['chunks'][1]['start'], 31)
+        self.assertIsNone(result['chunks'][1]['error'])
+
+    def test_all_failed_raises(self):
+        """Test a document with no scored chunk raises the first error"""
+        chunks = split_chunks("a b", max_chars=1)
+        errors = [EmotionDetectionError("first"),
+                  EmotionDetectionError("second")]
+        with self.assertRaisesRegex(EmotionDetectionError, "first"):
+            aggregate(chunks, errors)
+
+
+@patch('EmotionDetection.document.detect_emotions', side_effect=fake_detect)
+class TestDetectDocument(unittest.TestCase):
+
+    def test_chunks_scored_concurrently(self, mock_detect):
+        """Test chunks are scored in parallel, up to max_workers"""
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow_detect(text, count=True):
+            with lock:
+                running.append(text)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(text)
+            return fake_detect(text)
+
+        mock_detect.side_effect = slow_detect
+        text = "\n\n".join(f"Paragraph {i} is glad." for i in range(8))
+        start = time.perf_counter()
+        result = detect_document(text, max_chars=25, max_workers=4)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(mock_detect.call_count, 8)
+        self.assertEqual(max(peak), 4)
+        self.assertLess(elapsed, 0.35)
+        self.assertEqual(result['dominant_emotion'], 'joy')
+
+    def test_partial_failure_degrades(self, mock_detect):
+        """Test failing chunks are reported without failing the document"""
+        text = "This will fail.\n\nI am sad today.\n\nI am sad again."
+        with patch.object(config, 'DOCUMENT_CHUNK_CHARS', 16):
+            result = document_emotion_detector(text, include_chunks=True)
+        self.assertEqual(result['dominant_emotion'], 'sadness')
+        self.assertEqual(len(result['chunks']), 3)
+        self.assertIn('400', result['chunks'][0]['error'])
+        self.assertAlmostEqual(result['coverage'], 30 / 45)
+
+    def test_total_failure_returns_none_values(self, mock_detect):
+        """Test a document whose every chunk failed gets None values"""
+        result = document_emotion_detector("fail fail fail")
+        self.assertIsNone(result['dominant_emotion'])
+        self.assertIsNone(document_emotion_detector("   ")['joy'])
+
+
+class TestAsyncDocument(unittest.TestCase):
+
+    def test_async_matches_sync(self):
+        """Test the asyncio path chunks and aggregates the same way"""
+        clear_cache()
+        text = ("I am so glad and happy today. " * 40 + "\n\n"
+                + "This is sad and I feel terrible. " * 10)
+        with patch.object(config, 'BACKEND', 'local'), \
+                patch.object(config, 'DOCUMENT_CHUNK_CHARS', 300):
+            sync = document_emotion_detector(text, include_chunks=True)
+            result = asyncio.run(
+                async_document_emotion_detector(text, include_chunks=True))
+        self.assertGreater(len(result['chunks']), 4)
+        self.assertEqual(result, sync)
+        self.assertEqual(result['dominant_emotion'], 'joy')
+
+    def test_document_counted_once(self):
+        """Test a document adds one result, not one per chunk"""
+        clear_cache()
+        metrics.reset()
+        text = "I am so glad and happy today. " * 40
+        with patch.object(config, 'BACKEND', 'local'), \
+                patch.object(config, 'DOCUMENT_CHUNK_CHARS', 300):
+            document_emotion_detector(text)
+            asyncio.run(async_document_emotion_detector(text))
+        self.assertEqual(metrics.get_value(metrics.RESULTS, 'joy'), 2)
+
+
+class TestDocumentApi(unittest.TestCase):
+
+    def setUp(self):
+        clear_cache()
+        self.client = app.test_client()
+
+    def test_document_endpoint(self):
+        """Test the API scores a long text and returns the breakdown"""
+        text = "I am glad. " * 500
+        with patch.object(config, 'BACKEND', 'local'):
+            response = self.client.post('/api/v1/emotions/document',
+                                        json={'text': text, 'chunks': True})
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data['dominant_emotion'], 'joy')
+        self.assertEqual(data['coverage'], 1.0)
+        self.assertEqual(len(data['chunks']), 3)
+
+    def test_document_endpoint_rejects_bad_bodies(self):
+        """Test a missing or blank text is rejected with 400"""
+        for body in ({'texts': ['a']}, {'text': '  '}):
+            response = self.client.post('/api/v1/emotions/document',
+                                        json=body)
+            self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
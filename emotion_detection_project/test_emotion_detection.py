@@ -4,9 +4,15 @@
 import unittest
 from unittest.mock import patch, MagicMock
 from EmotionDetection import emotion_detector, emotion_predictor
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.circuit_breaker import get_breaker
 
 class TestEmotionDetection(unittest.TestCase):
     
+    def setUp(self):
+        clear_cache()
+        get_breaker().reset()
+    
     def test_emotion_detector_joy(self):
         """Test emotion detector with joy emotion"""
         # Test with a happy statement
@@ -48,8 +54,8 @@ class TestEmotionDetection(unittest.TestCase):
         self.assertIsInstance(result, dict)
         self.assertIn('dominant_emotion', result)
     
-    @patch('EmotionDetection.emotion_detector.requests.post')
-    def test_emotion_detector_success_response(self, mock_post):
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_emotion_detector_success_response(self, mock_get_session):
         """Test successful API response"""
         # Mock successful API response
         mock_response = MagicMock()
@@ -65,7 +71,7 @@ class TestEmotionDetection(unittest.TestCase):
                 }
             }]
         }'''
-        mock_post.return_value = mock_response
+        mock_get_session.return_value.post.return_value = mock_response
         
         result = emotion_detector("I am happy")
         
@@ -84,8 +90,8 @@ class TestEmotionDetection(unittest.TestCase):
             "Invalid text! Please try again!" in result
         )
     
-    @patch('EmotionDetection.emotion_detector.requests.post')
-    def test_emotion_predictor_success(self, mock_post):
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_emotion_predictor_success(self, mock_get_session):
         """Test emotion predictor with successful response"""
         # Mock successful API response
         mock_response = MagicMock()
@@ -101,7 +107,7 @@ class TestEmotionDetection(unittest.TestCase):
                 }
             }]
         }'''
-        mock_post.return_value = mock_response
+        mock_get_session.return_value.post.return_value = mock_response
         
         result = emotion_predictor("I am happy")
         
@@ -0,0 +1,166 @@
+# test_http_cache.py
+# Unit tests for result ETags, conditional requests and compression
+
+import asyncio
+import gzip
+import unittest
+from unittest.mock import patch
+
+from aiohttp.test_utils import TestClient, TestServer
+
+import http_cache
+from EmotionDetection import config
+from EmotionDetection.backends import get_backend
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.circuit_breaker import get_breaker
+from server import app
+from server_async import create_app
+
+
+class TestResultEtag(unittest.TestCase):
+
+    def test_normalized_text_shares_tag(self):
+        """Test whitespace variants of a text get the same tag"""
+        self.assertEqual(http_cache.result_etag('I am  glad '),
+                         http_cache.result_etag('I am glad'))
+        self.assertNotEqual(http_cache.result_etag('I am glad'),
+                            http_cache.result_etag('I am sad'))
+
+    def test_tag_depends_on_model(self):
+        """Test a different model gives a different tag"""
+        watson = get_backend('watson')
+        tag = http_cache.result_etag('I am glad', watson)
+        with patch.object(config, 'WATSON_MODEL_ID', 'other-model'):
+            self.assertNotEqual(http_cache.result_etag('I am glad', watson),
+                                tag)
+        self.assertNotEqual(
+            http_cache.result_etag('I am glad', get_backend('local')), tag)
+
+    def test_not_cacheable_while_fallback_possible(self):
+        """Test tags are withheld while local fallbacks may be served"""
+        get_breaker().reset()
+        watson = get_backend('watson')
+        with patch.object(config, 'BREAKER_FALLBACK', 'local'):
+            self.assertTrue(http_cache.results_are_cacheable(watson))
+            for _ in range(get_breaker().failure_threshold):
+                get_breaker().record_failure()
+            self.assertFalse(http_cache.results_are_cacheable(watson))
+        get_breaker().reset()
+
+
+class TestChooseEncoding(unittest.TestCase):
+
+    def test_negotiation(self):
+        """Test q-values, wildcards and refusals are honoured"""
+        self.assertIsNone(http_cache.choose_encoding(None))
+        self.assertIsNone(http_cache.choose_encoding('identity'))
+        self.assertEqual(http_cache.choose_encoding('gzip, deflate'), 'gzip')
+        self.assertIsNone(http_cache.choose_encoding('gzip;q=0'))
+        self.assertEqual(http_cache.choose_encoding('*'),
+                         http_cache.SUPPORTED_ENCODINGS[0])
+
+    @unittest.skipIf(http_cache.brotli is None, "brotli not installed")
+    def test_prefers_brotli(self):
+        """Test brotli wins over gzip unless the client ranks it lower"""
+        self.assertEqual(http_cache.choose_encoding('gzip, br'), 'br')
+        self.assertEqual(http_cache.choose_encoding('gzip, br;q=0.5'), 'gzip')
+
+    def test_without_brotli(self):
+        """Test gzip is used when brotli is unavailable"""
+        with patch.object(http_cache, 'SUPPORTED_ENCODINGS', ('gzip',)):
+            self.assertEqual(http_cache.choose_encoding('br, gzip'), 'gzip')
+            self.assertIsNone(http_cache.choose_encoding('br'))
+
+
+class TestFlaskResultCaching(unittest.TestCase):
+
+    def setUp(self):
+        clear_cache()
+        get_breaker().reset()
+        self.client = app.test_client()
+        patcher = patch.object(config, 'BACKEND', 'local')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_result_etag_and_304(self):
+        """Test revalidation returns 304 without running the detector"""
+        url = '/emotionDetector?textToAnalyze=I%20am%20glad'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Cache-Control'],
+                         config.RESULT_CACHE_CONTROL)
+        etag = response.headers['ETag']
+        self.assertTrue(etag.startswith('W/'))
+
+        with patch('server.emotion_predictor') as mock_predictor:
+            response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        mock_predictor.assert_not_called()
+
+    def test_error_pages_are_not_tagged(self):
+        """Test failed analyses carry no ETag"""
+        with patch('server.emotion_predictor',
+                   return_value="Invalid text! Please try again!"):
+            response = self.client.get(
+                '/emotionDetector?textToAnalyze=hello')
+        self.assertNotIn('ETag', response.headers)
+
+    def test_gzip_above_threshold(self):
+        """Test large text responses are gzipped when accepted"""
+        response = self.client.get(
+            '/emotionDetector?textToAnalyze=I%20am%20glad',
+            headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertIn(b'Analysis Result', gzip.decompress(response.data))
+
+    def test_small_responses_are_not_compressed(self):
+        """Test bodies below the threshold are sent as-is"""
+        with patch.object(config, 'COMPRESSION_MIN_SIZE', 100000):
+            response = self.client.get('/', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_compressed_index_still_revalidates(self):
+        """Test the weakened ETag of a compressed page still yields 304"""
+        response = self.client.get('/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        response = self.client.get('/', headers={
+            'Accept-Encoding': 'gzip',
+            'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    @unittest.skipIf(http_cache.brotli is None, "brotli not installed")
+    def test_brotli(self):
+        """Test brotli is negotiated when preferred"""
+        response = self.client.get('/', headers={'Accept-Encoding': 'br, gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertIn(b'Emotion Detection',
+                      http_cache.brotli.decompress(response.data))
+
+
+class TestAsyncResultCaching(unittest.TestCase):
+
+    def test_result_etag_304_and_gzip(self):
+        """Test the aiohttp server tags, revalidates and compresses results"""
+        clear_cache()
+
+        async def run():
+            async with TestClient(TestServer(create_app())) as client:
+                url = '/emotionDetector?textToAnalyze=I%20am%20glad'
+                response = await client.get(
+                    url, headers={'Accept-Encoding': 'gzip'})
+                self.assertEqual(response.status, 200)
+                self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+                self.assertIn('Analysis Result', await response.text())
+                etag = response.headers['ETag']
+                response = await client.get(
+                    url, headers={'If-None-Match': etag})
+                self.assertEqual(response.status, 304)
+
+        with patch.object(config, 'BACKEND', 'local'):
+            asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
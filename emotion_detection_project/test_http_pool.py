@@ -0,0 +1,58 @@
+# test_http_pool.py
+# Unit tests for the shared HTTP connection pool
+
+import unittest
+from unittest.mock import patch, MagicMock
+
+from EmotionDetection import config, emotion_detector, http_pool
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.circuit_breaker import get_breaker
+
+
+class TestHttpPool(unittest.TestCase):
+
+    def setUp(self):
+        clear_cache()
+        get_breaker().reset()
+
+    def tearDown(self):
+        http_pool.close_session()
+
+    def test_get_session_is_shared(self):
+        """Test the same session is returned on every call"""
+        self.assertIs(http_pool.get_session(), http_pool.get_session())
+
+    def test_close_session_resets(self):
+        """Test closing the session creates a fresh one next time"""
+        first = http_pool.get_session()
+        http_pool.close_session()
+        self.assertIsNot(first, http_pool.get_session())
+
+    def test_pool_settings_applied(self):
+        """Test pool size and blocking are passed to the adapter"""
+        session = http_pool.create_session(pool_maxsize=7, pool_block=True)
+        adapter = session.get_adapter('https://example.com')
+        self.assertEqual(adapter._pool_maxsize, 7)
+        self.assertTrue(adapter._pool_block)
+
+    def test_keep_alive_disabled(self):
+        """Test keep_alive=False asks the server to close the socket"""
+        session = http_pool.create_session(keep_alive=False)
+        self.assertEqual(session.headers['Connection'], 'close')
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_emotion_detector_uses_session(self, mock_get_session):
+        """Test emotion_detector posts through the shared session"""
+        mock_response = MagicMock()
+        mock_response.status_code = 500
+        mock_get_session.return_value.post.return_value = mock_response
+
+        emotion_detector("I am happy")
+
+        args, kwargs = mock_get_session.return_value.post.call_args
+        self.assertEqual(args[0], config.WATSON_URL)
+        self.assertEqual(kwargs['timeout'], config.REQUEST_TIMEOUT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+# test_incremental.py
+# Unit tests for incremental re-analysis with sentence-level caching
+
+import unittest
+from unittest.mock import patch
+
+from EmotionDetection import config, incremental_emotion_detector, metrics
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.emotion_detector import (
+    EmotionDetectionError, build_result
+)
+from EmotionDetection.incremental import (
+    clear_sentence_cache, detect_incremental
+)
+from server import app
+
+PARAGRAPH = ("I love this new phone. The screen is gorgeous. "
+             "Battery life is great. I am so happy with it.")
+
+
+def fake_detect(text, count=True):
+    """Scores 'sad' sentences as sadness, 'down' ones as failures."""
+    if 'down' in text:
+        raise EmotionDetectionError("API connection failed",
+                                    kind='connection')
+    sad = 'sad' in text
+    return build_result({'anger': 0.0, 'disgust': 0.0, 'fear': 0.0,
+                         'joy': 0.1 if sad else 0.9,
+                         'sadness': 0.9 if sad else 0.1})
+
+
+@patch('EmotionDetection.document.detect_emotions', side_effect=fake_detect)
+class TestIncremental(unittest.TestCase):
+
+    def setUp(self):
+        clear_sentence_cache()
+        metrics.reset()
+
+    def scored(self, mock_detect):
+        """Texts sent to the backend since the last call, then reset."""
+        texts = [call.args[0] for call in mock_detect.call_args_list]
+        mock_detect.reset_mock()
+        return texts
+
+    def test_unchanged_text_is_not_rescored(self, mock_detect):
+        """Test a resubmitted text is served entirely from the cache"""
+        first = detect_incremental(PARAGRAPH)
+        self.assertEqual(len(self.scored(mock_detect)), 4)
+        self.assertEqual(first['reuse_ratio'], 0)
+
+        second = detect_incremental(PARAGRAPH)
+        self.assertEqual(self.scored(mock_detect), [])
+        self.assertEqual(second['reuse_ratio'], 1)
+        self.assertEqual(second, dict(first, reuse_ratio=1))
+
+    def test_only_changed_sentences_are_scored(self, mock_detect):
+        """Test an edit re-scores just the new sentence"""
+        detect_incremental(PARAGRAPH)
+        self.scored(mock_detect)
+
+        edited = PARAGRAPH.replace("Battery life is great.",
+                                   "Battery life makes me sad.")
+        result = detect_incremental(edited, include_sentences=True)
+        self.assertEqual(self.scored(mock_detect),
+                         ["Battery life makes me sad."])
+        self.assertEqual(result['reuse_ratio'], 0.75)
+        self.assertEqual(result['chunks'][2]['dominant_emotion'], 'sadness')
+
+        # Recombined scores match a from-scratch analysis of the edit
+        clear_sentence_cache()
+        fresh = detect_incremental(edited)
+        self.assertEqual(len(self.scored(mock_detect)), 4)
+        for emotion in ('joy', 'sadness'):
+            self.assertAlmostEqual(result[emotion], fresh[emotion])
+
+    def test_reformatting_reuses_everything(self, mock_detect):
+        """Test whitespace-only edits and new paragraphs cost nothing"""
+        detect_incremental(PARAGRAPH)
+        self.scored(mock_detect)
+        reflowed = PARAGRAPH.replace(" The screen", "\n\nThe  screen")
+        self.assertEqual(detect_incremental(reflowed)['reuse_ratio'], 1)
+        self.assertEqual(self.scored(mock_detect), [])
+
+    def test_repeated_sentence_scored_once(self, mock_detect):
+        """Test a sentence repeated within the text is scored once"""
+        result = detect_incremental("I am sad. I am sad. I am glad.")
+        self.assertEqual(sorted(self.scored(mock_detect)),
+                         ["I am glad.", "I am sad."])
+        self.assertAlmostEqual(result['reuse_ratio'], 1 / 3)
+
+    def test_failed_sentences_are_retried(self, mock_detect):
+        """Test a failed sentence is left out now and retried next time"""
+        text = "I am glad. The server is down."
+        result = detect_incremental(text)
+        self.assertEqual(result['dominant_emotion'], 'joy')
+        self.assertLess(result['coverage'], 1)
+        self.scored(mock_detect)
+
+        detect_incremental(text)
+        self.assertEqual(self.scored(mock_detect), ["The server is down."])
+        self.assertIsNone(
+            incremental_emotion_detector("down")['dominant_emotion'])
+
+    def test_reuse_metrics(self, mock_detect):
+        """Test reused and scored sentence counters and the ratio histogram"""
+        detect_incremental(PARAGRAPH)
+        detect_incremental(PARAGRAPH + " It is sad it was late.")
+        self.assertEqual(
+            metrics.get_value(metrics.INCREMENTAL_SENTENCES, 'reused'), 4)
+        self.assertEqual(
+            metrics.get_value(metrics.INCREMENTAL_SENTENCES, 'scored'), 5)
+        ratios = metrics.get_value(metrics.INCREMENTAL_REUSE_RATIO)
+        self.assertEqual(sum(ratios[:-1]), 2)
+        self.assertAlmostEqual(ratios[-1], 0.8)
+
+    def test_each_edit_counted_once(self, mock_detect):
+        """Test an edit adds one result, however many sentences it has"""
+        detect_incremental(PARAGRAPH)
+        detect_incremental(PARAGRAPH + " It is sad it was late.")
+        self.assertEqual(metrics.get_value(metrics.RESULTS, 'joy'), 2)
+        self.assertTrue(all(call.kwargs == {'count': False}
+                            for call in mock_detect.call_args_list))
+
+
+class TestIncrementalApi(unittest.TestCase):
+
+    def setUp(self):
+        clear_cache()
+        clear_sentence_cache()
+
+    def test_incremental_endpoint(self):
+        """Test the API reports reuse across successive edits"""
+        client = app.test_client()
+        with patch.object(config, 'BACKEND', 'local'):
+            client.post('/api/v1/emotions/incremental',
+                        json={'text': PARAGRAPH})
+            response = client.post(
+                '/api/v1/emotions/incremental',
+                json={'text': PARAGRAPH + " Sadly it broke.",
+                      'sentences': True})
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data['reuse_ratio'], 0.8)
+        self.assertEqual(len(data['chunks']), 5)
+        self.assertEqual(data['dominant_emotion'], 'joy')
+
+
+if __name__ == '__main__':
+    unittest.main()
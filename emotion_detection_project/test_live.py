@@ -0,0 +1,307 @@
+# test_live.py
+# Unit tests for live analysis: debouncing, cancellation and the /live socket
+
+import asyncio
+import gc
+import unittest
+from unittest.mock import patch
+
+from aiohttp import WSServerHandshakeError, web
+from aiohttp.test_utils import TestClient, TestServer
+
+from EmotionDetection import config, metrics
+from EmotionDetection.async_detector import close_async_session
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.circuit_breaker import get_breaker
+from EmotionDetection.emotion_detector import (
+    EmotionDetectionError, build_result
+)
+from EmotionDetection.live import LiveSession
+from benchmarks.stub_watson import start_stub_server
+from server_async import create_app
+
+JOYFUL = {'anger': 0.01, 'disgust': 0.02, 'fear': 0.03, 'joy': 0.9,
+          'sadness': 0.04}
+
+
+class FakeDetector:
+    """async_detect_emotions stand-in that records started and finished texts."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.started = []
+        self.finished = []
+
+    async def __call__(self, text):
+        self.started.append(text)
+        await asyncio.sleep(self.latency)
+        if text == 'down':
+            raise EmotionDetectionError("API connection failed",
+                                        kind='connection')
+        self.finished.append(text)
+        return build_result(JOYFUL)
+
+
+class TestLiveSession(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def run_session(self, detector, scenario, debounce=0.05):
+        """Runs scenario(session) and returns the messages sent."""
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        async def main():
+            session = LiveSession(send, debounce=debounce)
+            await scenario(session)
+            await session.close()
+
+        with patch('EmotionDetection.live.async_detect_emotions', detector):
+            asyncio.run(main())
+        return sent
+
+    def test_rapid_updates_are_debounced(self):
+        """Test a burst of keystrokes is analyzed once, as its last text"""
+        detector = FakeDetector()
+
+        async def typing(session):
+            for i in range(1, 11):
+                session.update("I am glad"[:i])
+                await asyncio.sleep(0.005)
+            await asyncio.sleep(0.1)
+
+        sent = self.run_session(detector, typing)
+        self.assertEqual(detector.started, ["I am glad"])
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(sent[0]['seq'], 10)
+        self.assertEqual(sent[0]['dominant_emotion'], 'joy')
+        self.assertIsNone(sent[0]['error'])
+        self.assertEqual(metrics.get_value(metrics.LIVE_UPDATES, 'debounced'),
+                         9)
+
+    def test_superseded_analysis_is_cancelled(self):
+        """Test an update arriving mid-analysis cancels the stale one"""
+        detector = FakeDetector(latency=0.1)
+
+        async def edit(session):
+            session.update("first draft", seq=1)
+            await asyncio.sleep(0.05)
+            self.assertEqual(detector.started, ["first draft"])
+            session.update("second draft", seq=2)
+            await asyncio.sleep(0.2)
+
+        sent = self.run_session(detector, edit, debounce=0.01)
+        self.assertEqual(detector.finished, ["second draft"])
+        self.assertEqual([message['seq'] for message in sent], [2])
+        self.assertEqual(metrics.get_value(metrics.LIVE_UPDATES, 'cancelled'),
+                         1)
+
+    def test_superseded_upstream_call_is_cancelled(self):
+        """Test a stale analysis stops its upstream call, not just waiting"""
+        upstream = []
+
+        async def detect_async(backend, text):
+            upstream.append(text)
+            try:
+                await asyncio.sleep(0.1)
+            except asyncio.CancelledError:
+                upstream.append('cancelled')
+                raise
+            return build_result(JOYFUL)
+
+        async def edit(session):
+            session.update("first draft", seq=1)
+            await asyncio.sleep(0.05)
+            session.update("second draft", seq=2)
+            await asyncio.sleep(0.2)
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        async def main():
+            session = LiveSession(send, debounce=0.01)
+            await edit(session)
+            await session.close()
+
+        with patch.object(config, 'BACKEND', 'local'), \
+                patch.object(config, 'CACHE_ENABLED', False), \
+                patch('EmotionDetection.micro_batch.detect_async',
+                      detect_async):
+            asyncio.run(main())
+        self.assertEqual(upstream,
+                         ["first draft", 'cancelled', "second draft"])
+        self.assertEqual([message['seq'] for message in sent], [2])
+
+    def test_failed_sends_are_not_reported_as_lost(self):
+        """Test a send failing after the client left logs no lost error"""
+        unhandled = []
+
+        async def send(message):
+            await asyncio.sleep(0.02)
+            raise ConnectionResetError("Cannot write to closing transport")
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            loop.set_exception_handler(
+                lambda loop, context: unhandled.append(context))
+            session = LiveSession(send, debounce=0)
+            # The first send is still in flight when its update is superseded
+            session.update("first draft", seq=1)
+            await asyncio.sleep(0.01)
+            session.update("second draft", seq=2)
+            await asyncio.sleep(0.05)
+            await session.close()
+            gc.collect()
+            await asyncio.sleep(0)
+
+        with patch('EmotionDetection.live.async_detect_emotions',
+                   FakeDetector()):
+            asyncio.run(main())
+        self.assertEqual(unhandled, [])
+
+    def test_failures_and_blank_text_are_reported(self):
+        """Test errors reach the client as None values with an error"""
+        detector = FakeDetector()
+
+        async def updates(session):
+            session.update("down")
+            await asyncio.sleep(0.03)
+            session.update("   ")
+            await asyncio.sleep(0.03)
+
+        sent = self.run_session(detector, updates, debounce=0)
+        self.assertEqual([message['error'] for message in sent],
+                         ["API connection failed", "Blank text"])
+        self.assertIsNone(sent[0]['dominant_emotion'])
+
+    def test_close_cancels_pending_work(self):
+        """Test closing the session drops an update still being debounced"""
+        detector = FakeDetector()
+
+        async def disconnect(session):
+            session.update("I am glad")
+
+        self.assertEqual(self.run_session(detector, disconnect), [])
+        self.assertEqual(detector.started, [])
+
+
+class TestLiveSocket(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.stub, cls.stub_url = start_stub_server(latency=0.02)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.shutdown()
+
+    def setUp(self):
+        clear_cache()
+        get_breaker().reset()
+        metrics.reset()
+        for patcher in (patch.object(config, 'WATSON_URL', self.stub_url),
+                        patch.object(config, 'LIVE_DEBOUNCE', 0.1),
+                        patch.object(config, 'RETRY_ENABLED', False)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _run(self, scenario):
+        """Runs scenario(client) against server_async on a fresh loop."""
+        async def main():
+            try:
+                async with TestClient(TestServer(create_app())) as client:
+                    return await scenario(client)
+            finally:
+                await close_async_session()
+        return asyncio.run(main())
+
+    def test_many_concurrent_clients(self):
+        """Test each of many clients gets only its latest text's scores"""
+        clients = 100
+        keystrokes = 5
+
+        async def user(client, n):
+            async with client.ws_connect('/live') as ws:
+                for seq in range(1, keystrokes + 1):
+                    await ws.send_json({'text': f"user {n} is glad {seq}",
+                                        'seq': seq})
+                    await asyncio.sleep(0.001)
+                message = await ws.receive_json(timeout=5)
+                # Nothing else arrives for the superseded updates
+                with self.assertRaises(asyncio.TimeoutError):
+                    await ws.receive_json(timeout=0.2)
+                return message
+
+        async def scenario(client):
+            return await asyncio.gather(
+                *(user(client, n) for n in range(clients)))
+
+        messages = self._run(scenario)
+        self.assertEqual([message['seq'] for message in messages],
+                         [keystrokes] * clients)
+        self.assertTrue(all(message['dominant_emotion'] == 'joy'
+                            for message in messages))
+        # One upstream call per client instead of one per keystroke
+        self.assertEqual(
+            metrics.get_value(metrics.UPSTREAM_RESPONSES, '200'), clients)
+        self.assertEqual(
+            metrics.get_value(metrics.LIVE_UPDATES, 'received'),
+            clients * keystrokes)
+        self.assertEqual(metrics.get_value(metrics.LIVE_CONNECTIONS), 0)
+
+    def test_plain_text_and_binary_frames(self):
+        """Test raw text frames are analyzed and binary ones rejected"""
+        async def scenario(client):
+            async with client.ws_connect('/live') as ws:
+                await ws.send_bytes(b'glad')
+                rejected = await ws.receive_json(timeout=5)
+                await ws.send_str("I am glad")
+                return rejected, await ws.receive_json(timeout=5)
+
+        rejected, message = self._run(scenario)
+        self.assertIn('error', rejected)
+        self.assertEqual(message['seq'], 1)
+        self.assertEqual(message['dominant_emotion'], 'joy')
+
+    def test_connection_limit(self):
+        """Test connections beyond the limit are refused with 503"""
+        async def scenario(client):
+            async with client.ws_connect('/live'):
+                with self.assertRaises(WSServerHandshakeError) as raised:
+                    await client.ws_connect('/live')
+                return raised.exception.status
+
+        with patch.object(config, 'LIVE_MAX_CONNECTIONS', 1):
+            self.assertEqual(self._run(scenario), 503)
+
+    def test_concurrent_handshakes_respect_limit(self):
+        """Test simultaneous handshakes cannot overshoot the limit"""
+        async def scenario(client):
+            attempts = await asyncio.gather(
+                *(client.ws_connect('/live') for _ in range(10)),
+                return_exceptions=True)
+            opened = [ws for ws in attempts
+                      if not isinstance(ws, BaseException)]
+            for ws in opened:
+                await ws.close()
+            return len(opened)
+
+        prepare = web.WebSocketResponse.prepare
+
+        async def slow_prepare(ws, request):
+            # A handshake that yields lets the others reach the check
+            await asyncio.sleep(0.01)
+            return await prepare(ws, request)
+
+        with patch.object(config, 'LIVE_MAX_CONNECTIONS', 2), \
+                patch.object(web.WebSocketResponse, 'prepare', slow_prepare):
+            self.assertEqual(self._run(scenario), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
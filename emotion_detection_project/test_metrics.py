@@ -0,0 +1,202 @@
+# test_metrics.py
+# Unit tests for the Prometheus-style metrics
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from EmotionDetection import config, emotion_detector, metrics
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.circuit_breaker import get_breaker
+from server import app
+
+WATSON_OK = ('{"emotionPredictions": [{"emotion": {"anger": 0.01, '
+             '"disgust": 0.02, "fear": 0.03, "joy": 0.9, "sadness": 0.04}}]}')
+
+
+class TestMetricTypes(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def test_counter_sums_across_threads(self):
+        """Test per-thread values, including exited threads, are summed"""
+        def work():
+            for _ in range(1000):
+                metrics.RESULTS.inc('joy')
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(metrics.get_value(metrics.RESULTS, 'joy'), 4000)
+        # Exited threads were folded in; a second collect keeps the total
+        self.assertEqual(metrics.get_value(metrics.RESULTS, 'joy'), 4000)
+
+    def test_gauge(self):
+        """Test gauges go up and down"""
+        metrics.UPSTREAM_REQUESTS_IN_FLIGHT.inc()
+        metrics.UPSTREAM_REQUESTS_IN_FLIGHT.inc()
+        metrics.UPSTREAM_REQUESTS_IN_FLIGHT.dec()
+        self.assertEqual(metrics.get_value(metrics.UPSTREAM_REQUESTS_IN_FLIGHT), 1)
+
+    def test_histogram_rendering(self):
+        """Test buckets are cumulative and followed by sum and count"""
+        metrics.UPSTREAM_REQUEST_DURATION.observe(0.004)
+        metrics.UPSTREAM_REQUEST_DURATION.observe(0.2)
+        metrics.UPSTREAM_REQUEST_DURATION.observe(30)
+        text = metrics.render()
+        name = 'emotion_upstream_request_duration_seconds'
+        self.assertIn(f'# TYPE {name} histogram', text)
+        self.assertIn(f'{name}_bucket{{le="0.005"}} 1\n', text)
+        self.assertIn(f'{name}_bucket{{le="0.25"}} 2\n', text)
+        self.assertIn(f'{name}_bucket{{le="10.0"}} 2\n', text)
+        self.assertIn(f'{name}_bucket{{le="+Inf"}} 3\n', text)
+        self.assertIn(f'{name}_count 3\n', text)
+
+    def test_label_escaping(self):
+        """Test label values are escaped"""
+        metrics.RESULTS.inc('a"b\\c')
+        self.assertIn(r'dominant_emotion="a\"b\\c"', metrics.render())
+
+
+class TestWorkerMetrics(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        patcher = patch.object(config, 'METRICS_DIR', self.directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fork_worker(self, results, in_flight):
+        """Runs a forked worker that records values and saves them."""
+        pid = os.fork()
+        if pid == 0:
+            metrics.reset()
+            metrics.RESULTS.inc('joy', amount=results)
+            metrics.UPSTREAM_REQUESTS_IN_FLIGHT.inc(amount=in_flight)
+            metrics.write_snapshot()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        return pid
+
+    def test_scrape_sums_workers(self):
+        """Test any worker's scrape reports every worker's values"""
+        self.fork_worker(results=3, in_flight=2)
+        self.fork_worker(results=4, in_flight=1)
+        metrics.RESULTS.inc('joy')
+        text = metrics.render()
+        self.assertIn('emotion_results_total{dominant_emotion="joy"} 8\n',
+                      text)
+        self.assertIn('emotion_upstream_requests_in_flight 3\n', text)
+        # This process's own values stay exact for tests
+        self.assertEqual(metrics.get_value(metrics.RESULTS, 'joy'), 1)
+
+    def test_dead_worker_keeps_counters_drops_gauges(self):
+        """Test an exited worker's totals survive without its gauges"""
+        pid = self.fork_worker(results=3, in_flight=2)
+        metrics.mark_process_dead(pid)
+        metrics.mark_process_dead(self.fork_worker(results=2, in_flight=1))
+        text = metrics.render()
+        self.assertIn('emotion_results_total{dominant_emotion="joy"} 5\n',
+                      text)
+        self.assertNotIn('emotion_upstream_requests_in_flight 2', text)
+        # Dead workers are folded into one file
+        self.assertEqual(sorted(name for name in os.listdir(self.directory)
+                                if name.endswith('.json')),
+                         ['metrics-dead.json'])
+
+    def test_clear_directory(self):
+        """Test a new server starts from empty totals"""
+        self.fork_worker(results=3, in_flight=0)
+        metrics.clear_directory()
+        self.assertNotIn('dominant_emotion="joy"', metrics.render())
+
+
+@patch('EmotionDetection.http_pool.get_session')
+class TestUpstreamMetrics(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        clear_cache()
+        get_breaker().reset()
+        # One upstream call per text, so counts are exact
+        patcher = patch.object(config, 'RETRY_ENABLED', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _respond(self, mock_get_session, status_code, text):
+        response = mock_get_session.return_value.post.return_value
+        response.status_code = status_code
+        response.text = text
+
+    def test_status_breakdown(self, mock_get_session):
+        """Test responses are counted per status branch"""
+        for status_code, label in ((200, '200'), (400, '400'),
+                                   (500, '500'), (503, 'other')):
+            clear_cache()
+            self._respond(mock_get_session, status_code, WATSON_OK)
+            emotion_detector(f"text {status_code}")
+            self.assertEqual(
+                metrics.get_value(metrics.UPSTREAM_RESPONSES, label), 1)
+        cells = metrics.get_value(metrics.UPSTREAM_REQUEST_DURATION)
+        self.assertEqual(sum(cells[:-1]), 4)
+        self.assertEqual(metrics.get_value(metrics.UPSTREAM_REQUESTS_IN_FLIGHT), 0)
+
+    def test_parse_errors_and_timeouts(self, mock_get_session):
+        """Test parse failures and timeouts are counted"""
+        self._respond(mock_get_session, 200, 'not json')
+        emotion_detector("first")
+        self.assertEqual(metrics.get_value(metrics.UPSTREAM_ERRORS, 'parse'), 1)
+
+        mock_get_session.return_value.post.side_effect = requests.Timeout()
+        emotion_detector("second")
+        self.assertEqual(
+            metrics.get_value(metrics.UPSTREAM_ERRORS, 'timeout'), 1)
+        self.assertEqual(metrics.get_value(metrics.UPSTREAM_REQUESTS_IN_FLIGHT), 0)
+
+    def test_dominant_emotion_distribution(self, mock_get_session):
+        """Test results, including cache hits, count their dominant emotion"""
+        self._respond(mock_get_session, 200, WATSON_OK)
+        emotion_detector("I am glad")
+        emotion_detector("I am glad")
+        self.assertEqual(metrics.get_value(metrics.RESULTS, 'joy'), 2)
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        clear_cache()
+        self.client = app.test_client()
+
+    def test_route_metrics(self):
+        """Test /metrics reports requests per route pattern"""
+        with patch.object(config, 'BACKEND', 'local'):
+            self.client.get('/emotionDetector?textToAnalyze=I%20am%20glad')
+            self.client.get('/api/v1/emotions?text=x')
+        self.client.get('/no-such-page')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/plain')
+        text = response.get_data(as_text=True)
+        self.assertIn('emotion_http_requests_total{route="/emotionDetector",'
+                      'method="GET",status="200"} 1', text)
+        self.assertIn('emotion_http_requests_total{route="/api/v1/emotions",'
+                      'method="GET",status="200"} 1', text)
+        self.assertIn('route="unmatched",method="GET",status="404"', text)
+        self.assertIn('emotion_results_total{dominant_emotion=', text)
+        self.assertIn('emotion_http_requests_in_flight{route="/metrics"} 1', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,253 @@
+# test_micro_batch.py
+# Unit tests for the micro-batching dispatcher
+
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from EmotionDetection import config, emotion_detector, metrics
+from EmotionDetection.async_detector import async_emotion_detector
+from EmotionDetection.backends import LocalBackend, get_backend
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.emotion_detector import EmotionDetectionError
+from EmotionDetection.micro_batch import (
+    AsyncMicroBatcher, MicroBatcher, batch_stats
+)
+
+
+class RecordingBackend:
+    """detect_many stand-in that records every batch it is given."""
+
+    def __init__(self):
+        self.batches = []
+
+    def detect_many(self, texts):
+        self.batches.append(list(texts))
+        return [EmotionDetectionError("bad", kind='bad_request')
+                if text == 'bad' else {'text': text} for text in texts]
+
+    async def detect_many_async(self, texts):
+        return self.detect_many(texts)
+
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def test_concurrent_calls_share_a_batch(self):
+        """Test concurrent texts go out as one batch, results in order"""
+        backend = RecordingBackend()
+        batcher = MicroBatcher(backend.detect_many, max_size=8, max_wait=5)
+        texts = [f"text {i}" for i in range(8)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(batcher.submit, texts))
+
+        self.assertEqual(results, [{'text': text} for text in texts])
+        self.assertEqual(len(backend.batches), 1)
+        self.assertEqual(sorted(backend.batches[0]), sorted(texts))
+        self.assertEqual(batcher.stats()['mean_size'], 8)
+
+    def test_window_closes(self):
+        """Test a lone text is dispatched once the window closes"""
+        backend = RecordingBackend()
+        batcher = MicroBatcher(backend.detect_many, max_size=8,
+                               max_wait=0.01)
+        start = time.perf_counter()
+        self.assertEqual(batcher.submit('alone'), {'text': 'alone'})
+        self.assertGreaterEqual(time.perf_counter() - start, 0.009)
+        self.assertEqual(backend.batches, [['alone']])
+
+    def test_errors_reach_only_their_caller(self):
+        """Test a per-text error is raised in that caller alone"""
+        backend = RecordingBackend()
+        batcher = MicroBatcher(backend.detect_many, max_size=2, max_wait=5)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            good = pool.submit(batcher.submit, 'good')
+            bad = pool.submit(batcher.submit, 'bad')
+            self.assertEqual(good.result(), {'text': 'good'})
+            with self.assertRaises(EmotionDetectionError):
+                bad.result()
+
+    def test_backend_failure_reaches_everyone(self):
+        """Test a failing batch call fails every caller"""
+        def detect_many(texts):
+            raise EmotionDetectionError("down", kind='connection')
+
+        batcher = MicroBatcher(detect_many, max_size=2, max_wait=5)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(batcher.submit, text)
+                       for text in ('a', 'b')]
+            for future in futures:
+                with self.assertRaises(EmotionDetectionError):
+                    future.result()
+
+    def test_short_result_list_fails_every_caller(self):
+        """Test a backend returning too few results strands nobody"""
+        batcher = MicroBatcher(lambda texts: [{'text': texts[0]}],
+                               max_size=2, max_wait=5)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(batcher.submit, text)
+                       for text in ('a', 'b')]
+            for future in futures:
+                with self.assertRaises(RuntimeError):
+                    future.result(timeout=2)
+
+    def test_interrupted_leader_wakes_the_others(self):
+        """Test a BaseException in the leader releases its followers"""
+        class Interrupted(BaseException):
+            pass
+
+        def detect_many(texts):
+            raise Interrupted()
+
+        batcher = MicroBatcher(detect_many, max_size=2, max_wait=5)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(batcher.submit, text)
+                       for text in ('a', 'b')]
+            errors = set()
+            for future in futures:
+                try:
+                    future.result(timeout=2)
+                except (Interrupted, RuntimeError) as e:
+                    errors.add(type(e))
+        self.assertEqual(errors, {Interrupted, RuntimeError})
+
+
+class TestAsyncMicroBatcher(unittest.TestCase):
+
+    def test_concurrent_tasks_share_a_batch(self):
+        """Test concurrent tasks go out as one batch"""
+        backend = RecordingBackend()
+        batcher = AsyncMicroBatcher(backend.detect_many_async, max_size=16,
+                                    max_wait=0.01)
+
+        async def many():
+            return await asyncio.gather(
+                *(batcher.submit(f"text {i}") for i in range(10)))
+
+        results = asyncio.run(many())
+        self.assertEqual(results, [{'text': f"text {i}"} for i in range(10)])
+        self.assertEqual(len(backend.batches), 1)
+
+    def test_cancelled_caller_does_not_strand_others(self):
+        """Test cancelling one waiter leaves the rest of the batch intact"""
+        backend = RecordingBackend()
+        batcher = AsyncMicroBatcher(backend.detect_many_async, max_size=16,
+                                    max_wait=0.01)
+
+        async def scenario():
+            first = asyncio.ensure_future(batcher.submit('first'))
+            second = asyncio.ensure_future(batcher.submit('second'))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        self.assertEqual(asyncio.run(scenario()), {'text': 'second'})
+
+    def test_running_batch_is_referenced(self):
+        """Test the batcher holds its in-flight tasks and fails short lists"""
+        started = []
+
+        async def detect_many(texts):
+            started.append(len(batcher._tasks))
+            await asyncio.sleep(0.01)
+            return []
+
+        batcher = AsyncMicroBatcher(detect_many, max_size=2, max_wait=5)
+
+        async def scenario():
+            return await asyncio.gather(
+                batcher.submit('a'), batcher.submit('b'),
+                return_exceptions=True)
+
+        results = asyncio.run(scenario())
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(started, [1])
+        self.assertEqual(batcher._tasks, set())
+
+
+class TestDetectorBatching(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        clear_cache()
+        for patcher in (patch.object(config, 'BACKEND', 'local'),
+                        patch.object(config, 'MICRO_BATCH_ENABLED', True),
+                        patch.object(config, 'MICRO_BATCH_MAX_WAIT', 0.02),
+                        patch('EmotionDetection.micro_batch._batchers', {}),
+                        patch('EmotionDetection.micro_batch._async_batchers',
+                              {})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_concurrent_detector_calls_are_batched(self):
+        """Test concurrent emotion_detector calls are scored together"""
+        texts = ["I am glad this happened", "I am so sad about this"] * 4
+        texts = [f"{text} #{i}" for i, text in enumerate(texts)]
+        barrier = threading.Barrier(len(texts))
+
+        def call(text):
+            barrier.wait()
+            return emotion_detector(text)['dominant_emotion']
+
+        with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+            dominant = list(pool.map(call, texts))
+        self.assertEqual(dominant, ['joy', 'sadness'] * 4)
+        cells = metrics.get_value(metrics.MICRO_BATCH_SIZE)
+        self.assertLess(sum(cells[:-1]), len(texts))
+
+    def test_async_detector_calls_are_batched(self):
+        """Test concurrent async_emotion_detector calls are scored together"""
+        async def many():
+            return await asyncio.gather(*(
+                async_emotion_detector(f"I am glad #{i}") for i in range(6)))
+
+        results = asyncio.run(many())
+        self.assertTrue(all(r['dominant_emotion'] == 'joy' for r in results))
+        cells = metrics.get_value(metrics.MICRO_BATCH_SIZE)
+        self.assertEqual(sum(cells[:-1]), 1)
+
+    def test_stats_include_async_batchers(self):
+        """Test /status reports batches made on event loops"""
+        async def many():
+            return await asyncio.gather(*(
+                async_emotion_detector(f"I am glad #{i}") for i in range(6)))
+
+        asyncio.run(many())
+        stats = batch_stats()
+        self.assertNotIn('local', stats)
+        self.assertEqual(stats['local (asyncio)']['batches'], 1)
+        self.assertEqual(stats['local (asyncio)']['texts'], 6)
+        self.assertEqual(stats['local (asyncio)']['mean_size'], 6)
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_watson_is_not_batched(self, mock_get_session):
+        """Test backends without a batch path keep one call per text"""
+        response = mock_get_session.return_value.post.return_value
+        response.status_code = 200
+        response.text = ('{"emotionPredictions": [{"emotion": {"anger": 0.1, '
+                         '"disgust": 0.1, "fear": 0.1, "joy": 0.6, '
+                         '"sadness": 0.1}}]}')
+        with patch.object(config, 'BACKEND', 'watson'):
+            self.assertFalse(get_backend().supports_batching)
+            self.assertEqual(emotion_detector("hello")['dominant_emotion'],
+                             'joy')
+        self.assertIsNone(metrics.get_value(metrics.MICRO_BATCH_SIZE))
+
+    def test_local_batch_matches_single_scores(self):
+        """Test vectorized batch scores agree with detect"""
+        backend = LocalBackend()
+        texts = ["I am glad this happened", "I am not happy at all",
+                 "I feel disgusted and afraid", "nothing to see here"]
+        for text, batched in zip(texts, backend.detect_many(texts)):
+            single = backend.detect(text)
+            self.assertEqual(batched['dominant_emotion'],
+                             single['dominant_emotion'])
+            for emotion in ('anger', 'disgust', 'fear', 'joy', 'sadness'):
+                self.assertAlmostEqual(batched[emotion], single[emotion],
+                                       places=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+# test_normalize.py
+# Unit tests for text canonicalization and fingerprints
+
+import json
+import unittest
+from unittest.mock import patch
+
+import http_cache
+from EmotionDetection import config, emotion_detector
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.circuit_breaker import get_breaker
+from EmotionDetection.normalize import canonicalize, fingerprint, normalize_text
+from server import app
+
+WATSON_OK = ('{"emotionPredictions": [{"emotion": {"anger": 0.01, '
+             '"disgust": 0.02, "fear": 0.03, "joy": 0.9, "sadness": 0.04}}]}')
+
+# "café" with a precomposed é, and with e + combining acute accent
+CAFE_NFC = 'caf\u00e9'
+CAFE_NFD = 'cafe\u0301'
+
+
+class TestNormalizeText(unittest.TestCase):
+
+    def test_unicode_forms_unified(self):
+        """Test composed and decomposed forms give the same text"""
+        self.assertNotEqual(CAFE_NFC, CAFE_NFD)
+        self.assertEqual(normalize_text(CAFE_NFD), CAFE_NFC)
+        self.assertEqual(normalize_text(CAFE_NFC), CAFE_NFC)
+
+    def test_whitespace_collapsed(self):
+        """Test surrounding whitespace is dropped and inner runs collapsed"""
+        self.assertEqual(normalize_text("  I am\t\tglad \n"), "I am glad")
+        # Non-ASCII whitespace, e.g. a no-break space, counts too
+        self.assertEqual(normalize_text("I\u00a0am glad"), "I am glad")
+
+    def test_case_policy(self):
+        """Test case is preserved by default and folded on request"""
+        self.assertEqual(normalize_text("I Am GLAD"), "I Am GLAD")
+        self.assertEqual(normalize_text("I Am GLAD", case='lower'),
+                         "i am glad")
+        self.assertEqual(normalize_text("Straße", case='casefold'),
+                         "strasse")
+        with patch.object(config, 'NORMALIZE_CASE', 'lower'):
+            self.assertEqual(normalize_text("GLAD"), "glad")
+        with self.assertRaises(ValueError):
+            normalize_text("glad", case='upper')
+
+    def test_trailing_punctuation(self):
+        """Test trailing punctuation is dropped only when enabled"""
+        self.assertEqual(normalize_text("I am glad!!!"), "I am glad!!!")
+        self.assertEqual(
+            normalize_text("I am glad !!! ", trailing_punctuation=True),
+            "I am glad")
+        self.assertEqual(normalize_text("?!", trailing_punctuation=True),
+                         "?!")
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def test_stable_values(self):
+        """Test fingerprints never change between runs or releases"""
+        self.assertEqual(fingerprint('I am glad', 64), 'ed92133fef11549a')
+        self.assertEqual(fingerprint('I am glad', 128),
+                         '9aaaa9b78f951178836ac4fa3629c030')
+        with self.assertRaises(ValueError):
+            fingerprint('I am glad', 32)
+
+    def test_variants_share_fingerprint(self):
+        """Test variants of a text canonicalize to one fingerprint"""
+        first = canonicalize(f"  I love this {CAFE_NFD} ")
+        second = canonicalize(f"I love this {CAFE_NFC}")
+        self.assertEqual(first, second)
+        self.assertEqual(len(first.fingerprint), 32)
+        self.assertNotEqual(first.fingerprint,
+                            canonicalize("I hate this café").fingerprint)
+
+
+@patch('EmotionDetection.http_pool.get_session')
+class TestCanonicalDetection(unittest.TestCase):
+
+    def setUp(self):
+        clear_cache()
+        get_breaker().reset()
+
+    def _respond(self, mock_get_session):
+        response = mock_get_session.return_value.post.return_value
+        response.status_code = 200
+        response.text = WATSON_OK
+
+    def test_variants_make_one_upstream_call(self, mock_get_session):
+        """Test variants are analyzed once, as their canonical text"""
+        self._respond(mock_get_session)
+        emotion_detector(f"I love this {CAFE_NFD}")
+        emotion_detector(f"  I love   this {CAFE_NFC}\n")
+        post = mock_get_session.return_value.post
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(post.call_args[1]['json']['raw_document']['text'],
+                         f"I love this {CAFE_NFC}")
+
+    def test_case_policy_shares_results(self, mock_get_session):
+        """Test a folding case policy merges case variants"""
+        self._respond(mock_get_session)
+        with patch.object(config, 'NORMALIZE_CASE', 'lower'):
+            emotion_detector("I AM GLAD")
+            emotion_detector("i am glad")
+        self.assertEqual(mock_get_session.return_value.post.call_count, 1)
+
+    def test_model_change_misses_cache(self, mock_get_session):
+        """Test a new model ID gets fresh results and a new ETag"""
+        self._respond(mock_get_session)
+        etag = http_cache.result_etag("I am glad")
+        emotion_detector("I am glad")
+        with patch.object(config, 'WATSON_MODEL_ID', 'emotion_v2'):
+            self.assertNotEqual(http_cache.result_etag("I am glad"), etag)
+            emotion_detector("I am glad")
+        self.assertEqual(mock_get_session.return_value.post.call_count, 2)
+
+    def test_etag_and_logs_use_fingerprint(self, mock_get_session):
+        """Test ETags match across variants and logs carry fingerprints"""
+        self._respond(mock_get_session)
+        self.assertEqual(http_cache.result_etag(CAFE_NFD),
+                         http_cache.result_etag(CAFE_NFC))
+        with self.assertLogs('EmotionDetection.tracing', 'INFO') as logs:
+            app.test_client().get('/emotionDetector?textToAnalyze=I%20am%20glad')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['fingerprints'],
+                         [canonicalize('I am glad').fingerprint])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# test_pages.py
+# Unit tests for the precompiled HTML pages and static stylesheet
+
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from aiohttp.test_utils import TestClient, TestServer
+
+import pages
+from EmotionDetection import config
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.circuit_breaker import get_breaker
+from server import app
+from server_async import create_app
+
+
+class TestRendering(unittest.TestCase):
+
+    def test_success_page_escapes_text(self):
+        """Test the analyzed text cannot inject markup"""
+        page = pages.render_success_page('<script>alert(1)</script>',
+                                         "The dominant emotion is joy.")
+        self.assertNotIn('<script>', page)
+        self.assertIn('&lt;script&gt;alert(1)&lt;/script&gt;', page)
+        self.assertIn('The dominant emotion is joy.', page)
+
+    def test_error_page_escapes_text(self):
+        """Test the analyzed text on error pages is escaped"""
+        page = pages.render_error_page(
+            "Analysis Error", "Invalid text! Please try again!", "Details",
+            "#fff3cd", "#ffeaa7", "#856404", '"><img src=x onerror=1>')
+        self.assertNotIn('<img', page)
+        self.assertIn('<h1>Analysis Error</h1>', page)
+        self.assertIn('<title>Analysis Error - Emotion Detection</title>', page)
+        self.assertIn('background-color: #fff3cd', page)
+
+    def test_pages_link_stylesheet_instead_of_inlining(self):
+        """Test no page carries inline CSS"""
+        page = pages.render_success_page('hi', 'result')
+        for html in (pages.INDEX_HTML, page):
+            self.assertNotIn('<style>', html)
+            self.assertIn(pages.STYLESHEET_URL, html)
+
+    def test_escape_text(self):
+        """Test only markup characters are escaped in text nodes"""
+        text = "it's \"fine\""
+        self.assertIs(pages.escape_text(text), text)
+        self.assertEqual(pages.escape_text('a < b & c'), 'a &lt; b &amp; c')
+
+
+class TestFlaskCaching(unittest.TestCase):
+
+    def setUp(self):
+        clear_cache()
+        get_breaker().reset()
+        self.client = app.test_client()
+
+    def test_index_conditional_get(self):
+        """Test the index page answers a matching If-None-Match with 304"""
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        etag = response.headers['ETag']
+
+        response = self.client.get('/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+    def test_stylesheet_headers(self):
+        """Test the stylesheet is served with long-lived caching"""
+        response = self.client.get(pages.STYLESHEET_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/css')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        response = self.client.get('/static/style.css', headers={
+            'If-None-Match': f'"{pages.STYLESHEET_ETAG}"'})
+        self.assertEqual(response.status_code, 304)
+
+    def test_result_page_escapes_text(self):
+        """Test the result page escapes the submitted text"""
+        with patch.object(config, 'BACKEND', 'local'):
+            response = self.client.get('/emotionDetector', query_string={
+                'textToAnalyze': 'I am glad <b>now</b>'})
+        body = response.get_data(as_text=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Analysis Result', body)
+        self.assertIn('glad &lt;b&gt;now&lt;/b&gt;', body)
+
+
+class TestAsyncCaching(unittest.TestCase):
+
+    def test_index_conditional_get(self):
+        """Test the aiohttp index page supports conditional GET"""
+        async def run():
+            async with TestClient(TestServer(create_app())) as client:
+                response = await client.get('/')
+                etag = response.headers['ETag']
+                self.assertEqual(response.status, 200)
+                self.assertEqual(await response.read(), pages.INDEX_BYTES)
+                response = await client.get(
+                    '/', headers={'If-None-Match': etag})
+                self.assertEqual(response.status, 304)
+                response = await client.get(pages.STYLESHEET_URL)
+                self.assertEqual(response.status, 200)
+                self.assertIn('immutable', response.headers['Cache-Control'])
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+# test_rate_limit.py
+# Unit tests for the upstream rate limiter and admission control
+
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from EmotionDetection import config, emotion_detector, metrics
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.circuit_breaker import get_breaker
+from EmotionDetection.rate_limit import (
+    FileTokenBucket, RateLimitedError, TokenBucket, acquire, acquire_async
+)
+from server import app
+
+WATSON_OK = ('{"emotionPredictions": [{"emotion": {"anger": 0.01, '
+             '"disgust": 0.02, "fear": 0.03, "joy": 0.9, "sadness": 0.04}}]}')
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_then_queue_then_shed(self):
+        """Test calls beyond the burst queue, then are shed"""
+        bucket = TokenBucket(rate=10, burst=2)
+        self.assertEqual(bucket.reserve(0), 0)
+        self.assertEqual(bucket.reserve(0), 0)
+        # Third and fourth calls queue behind each other
+        self.assertAlmostEqual(bucket.reserve(1), 0.1, places=2)
+        self.assertAlmostEqual(bucket.reserve(1), 0.2, places=2)
+        # Nobody waits longer than max_wait
+        self.assertIsNone(bucket.reserve(0.25))
+        stats = bucket.stats()
+        self.assertEqual((stats['admitted'], stats['rejected']), (4, 1))
+
+    def test_refill(self):
+        """Test tokens come back at the configured rate, up to the burst"""
+        bucket = TokenBucket(rate=10, burst=2)
+        bucket.reserve(0)
+        bucket.reserve(0)
+        self.assertIsNone(bucket.reserve(0))
+        bucket._updated -= 0.1
+        self.assertEqual(bucket.reserve(0), 0)
+        bucket._updated -= 60
+        self.assertEqual(bucket.stats()['tokens'], 2)
+
+    def test_retry_after(self):
+        """Test the suggested wait covers the queue"""
+        bucket = TokenBucket(rate=2, burst=1)
+        bucket.reserve(0)
+        bucket.reserve(1)
+        self.assertAlmostEqual(bucket.retry_after(), 1.0, places=2)
+
+
+class TestFileTokenBucket(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'bucket.state')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_shared_between_limiters(self):
+        """Test separate limiters on one file share a single budget"""
+        first = FileTokenBucket(rate=0.001, burst=3, path=self.path)
+        second = FileTokenBucket(rate=0.001, burst=3, path=self.path)
+        self.assertEqual(first.reserve(0), 0)
+        self.assertEqual(second.reserve(0), 0)
+        self.assertEqual(first.reserve(0), 0)
+        self.assertIsNone(second.reserve(0))
+        self.assertLess(first.stats()['tokens'], 0.01)
+
+    def test_shared_with_child_process(self):
+        """Test a forked worker draws from the parent's budget"""
+        bucket = FileTokenBucket(rate=0.001, burst=2, path=self.path)
+        bucket.reserve(0)
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if bucket.reserve(0) == 0 else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertIsNone(bucket.reserve(0))
+
+    def test_reset(self):
+        """Test reset refills the shared bucket"""
+        bucket = FileTokenBucket(rate=0.001, burst=1, path=self.path)
+        bucket.reserve(0)
+        bucket.reset()
+        self.assertEqual(bucket.reserve(0), 0)
+
+
+class TestAdmission(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        clear_cache()
+        get_breaker().reset()
+        self.bucket = TokenBucket(rate=20, burst=1)
+        for patcher in (patch.object(config, 'RATE_LIMIT_ENABLED', True),
+                        patch.object(config, 'RATE_LIMIT_MAX_WAIT', 0.1),
+                        patch('EmotionDetection.rate_limit._limiter',
+                              self.bucket)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_acquire_waits_for_token(self):
+        """Test a queued call sleeps until its token is due"""
+        acquire()
+        start = time.perf_counter()
+        acquire()
+        self.assertGreaterEqual(time.perf_counter() - start, 0.04)
+        cells = metrics.get_value(metrics.RATE_LIMIT_WAIT)
+        self.assertEqual(sum(cells[:-1]), 2)
+
+    def test_acquire_sheds_fast(self):
+        """Test a call that would wait too long fails at once"""
+        acquire()
+        start = time.perf_counter()
+        with patch.object(config, 'RATE_LIMIT_MAX_WAIT', 0.01), \
+                self.assertRaises(RateLimitedError) as context:
+            acquire()
+        self.assertLess(time.perf_counter() - start, 0.01)
+        self.assertGreater(context.exception.retry_after, 0)
+        self.assertEqual(metrics.get_value(metrics.RATE_LIMIT_REJECTED), 1)
+
+    def test_acquire_async(self):
+        """Test the async path queues and sheds the same way"""
+        async def burst():
+            await acquire_async()
+            start = time.perf_counter()
+            await acquire_async()
+            self.assertGreaterEqual(time.perf_counter() - start, 0.04)
+            with patch.object(config, 'RATE_LIMIT_MAX_WAIT', 0.01):
+                await acquire_async()
+
+        with self.assertRaises(RateLimitedError):
+            asyncio.run(burst())
+        self.assertEqual(self.bucket.stats()['admitted'], 2)
+
+    def test_disabled(self):
+        """Test RATE_LIMIT_ENABLED=False admits everything"""
+        with patch.object(config, 'RATE_LIMIT_ENABLED', False):
+            for _ in range(10):
+                acquire()
+        self.assertEqual(self.bucket.stats()['admitted'], 0)
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_detector_returns_none_values_when_shed(self, mock_get_session):
+        """Test library callers keep the None-values contract"""
+        response = mock_get_session.return_value.post.return_value
+        response.status_code = 200
+        response.text = WATSON_OK
+        with patch.object(config, 'RATE_LIMIT_MAX_WAIT', 0):
+            self.assertEqual(emotion_detector("I am glad")['dominant_emotion'],
+                             'joy')
+            self.assertIsNone(emotion_detector("I am sad")['dominant_emotion'])
+        self.assertEqual(mock_get_session.return_value.post.call_count, 1)
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_server_sheds_with_503(self, mock_get_session):
+        """Test the web page answers 503 with Retry-After when shed"""
+        response = mock_get_session.return_value.post.return_value
+        response.status_code = 200
+        response.text = WATSON_OK
+        client = app.test_client()
+        with patch.object(config, 'RATE_LIMIT_MAX_WAIT', 0):
+            ok = client.get('/emotionDetector?textToAnalyze=I%20am%20glad')
+            shed = client.get('/emotionDetector?textToAnalyze=I%20am%20sad')
+        self.assertEqual(ok.status_code, 200)
+        self.assertEqual(shed.status_code, 503)
+        self.assertGreaterEqual(int(shed.headers['Retry-After']), 1)
+        self.assertIn(b'Too many requests', shed.data)
+        self.assertNotIn('ETag', shed.headers)
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_api_sheds_with_503(self, mock_get_session):
+        """Test the JSON API answers 503 with Retry-After when shed"""
+        response = mock_get_session.return_value.post.return_value
+        response.status_code = 200
+        response.text = WATSON_OK
+        client = app.test_client()
+        with patch.object(config, 'RATE_LIMIT_MAX_WAIT', 0):
+            ok = client.get('/api/v1/emotions?text=I%20am%20glad')
+            shed = client.get('/api/v1/emotions?text=I%20am%20sad')
+            document = client.post('/api/v1/emotions/document',
+                                   json={'text': "I am angry."})
+            batch = client.post('/api/v1/emotions/batch',
+                                json={'texts': ["I am glad", "I am afraid"]})
+        self.assertEqual(ok.status_code, 200)
+        for shed_response in (shed, document):
+            self.assertEqual(shed_response.status_code, 503)
+            self.assertGreaterEqual(
+                int(shed_response.headers['Retry-After']), 1)
+            self.assertIn('Rate limit', shed_response.get_json()['error'])
+        # A batch keeps its scored texts; the shed one fails on its own
+        self.assertEqual(batch.status_code, 200)
+        glad, afraid = batch.get_json()['results']
+        self.assertIsNone(glad['error'])
+        self.assertIn('Rate limit', afraid['error'])
+
+    def test_status_reports_limiter(self):
+        """Test /status shows the limiter state"""
+        data = app.test_client().get('/status').get_json()
+        self.assertEqual(data['rate_limit']['rate'], 20)
+        self.assertEqual(data['rate_limit']['backend'], 'memory')
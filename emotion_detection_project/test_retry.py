@@ -0,0 +1,275 @@
+# test_retry.py
+# Unit tests for upstream retries, the retry budget and hedged requests
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from EmotionDetection import config, emotion_detector, metrics, retry
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.circuit_breaker import get_breaker
+from EmotionDetection.emotion_detector import EmotionDetectionError
+from EmotionDetection.retry import (
+    LatencyTracker, RetryBudget, backoff_delay, call_with_retry,
+    call_with_retry_async, get_latency_tracker, get_retry_budget,
+    is_retryable
+)
+
+WATSON_OK = ('{"emotionPredictions": [{"emotion": {"anger": 0.01, '
+             '"disgust": 0.02, "fear": 0.03, "joy": 0.9, "sadness": 0.04}}]}')
+
+
+def _error(kind, status_code=None):
+    return EmotionDetectionError(kind, kind=kind, status_code=status_code)
+
+
+class FlakyCall:
+    """Fails with the given errors, then returns 'ok'; records timeouts."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.timeouts = []
+
+    def __call__(self, text, timeout):
+        self.timeouts.append(timeout)
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+class RetryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        get_retry_budget().reset()
+        get_latency_tracker().reset()
+        patcher = patch.object(config, 'RETRY_BASE_DELAY', 0.001)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_retryable_errors(self):
+        """Test only transient failures are retried"""
+        for kind in ('connection', 'timeout', 'server_error'):
+            self.assertTrue(is_retryable(_error(kind)))
+        self.assertTrue(is_retryable(_error('api_error', 503)))
+        self.assertTrue(is_retryable(_error('api_error', 429)))
+        for kind in ('bad_request', 'parse', 'circuit_open'):
+            self.assertFalse(is_retryable(_error(kind)))
+        self.assertFalse(is_retryable(_error('api_error', 404)))
+
+    def test_backoff_is_capped_full_jitter(self):
+        """Test delays stay within the exponential ceiling"""
+        with patch.object(config, 'RETRY_BASE_DELAY', 0.1), \
+                patch.object(config, 'RETRY_MAX_DELAY', 0.3):
+            for _ in range(100):
+                self.assertLessEqual(backoff_delay(1), 0.1)
+                self.assertLessEqual(backoff_delay(2), 0.2)
+                self.assertLessEqual(backoff_delay(10), 0.3)
+
+    def test_budget(self):
+        """Test the budget refills per call and caps at its reserve"""
+        budget = RetryBudget(ratio=0.5, reserve=2)
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+        for _ in range(10):
+            budget.deposit()
+        self.assertEqual(budget.stats()['tokens'], 2)
+        self.assertEqual(budget.stats()['rejected'], 1)
+
+    def test_latency_percentile(self):
+        """Test the percentile needs enough samples"""
+        tracker = LatencyTracker(refresh=1)
+        self.assertIsNone(tracker.percentile(95, min_samples=1))
+        for ms in range(1, 101):
+            tracker.record(ms / 1000)
+        self.assertAlmostEqual(tracker.percentile(95), 0.096)
+        self.assertAlmostEqual(tracker.percentile(50), 0.051)
+
+
+class TestCallWithRetry(RetryTestCase):
+
+    def test_retries_then_succeeds(self):
+        """Test a transient failure is retried"""
+        fn = FlakyCall(_error('connection'), _error('server_error'))
+        self.assertEqual(call_with_retry(fn, 'text'), 'ok')
+        self.assertEqual(len(fn.timeouts), 3)
+        self.assertEqual(
+            metrics.get_value(metrics.UPSTREAM_RETRIES, 'connection'), 1)
+        self.assertEqual(get_retry_budget().stats()['withdrawn'], 2)
+
+    def test_gives_up_after_max_attempts(self):
+        """Test the last error is raised once attempts run out"""
+        fn = FlakyCall(*[_error('timeout')] * 5)
+        with patch.object(config, 'RETRY_MAX_ATTEMPTS', 2):
+            with self.assertRaises(EmotionDetectionError):
+                call_with_retry(fn, 'text')
+        self.assertEqual(len(fn.timeouts), 2)
+
+    def test_permanent_error_not_retried(self):
+        """Test a 400 fails at once"""
+        fn = FlakyCall(_error('bad_request', 400))
+        with self.assertRaises(EmotionDetectionError):
+            call_with_retry(fn, 'text')
+        self.assertEqual(len(fn.timeouts), 1)
+
+    def test_disabled(self):
+        """Test RETRY_ENABLED=False makes a single attempt"""
+        fn = FlakyCall(_error('connection'))
+        with patch.object(config, 'RETRY_ENABLED', False):
+            with self.assertRaises(EmotionDetectionError):
+                call_with_retry(fn, 'text')
+        self.assertEqual(len(fn.timeouts), 1)
+
+    def test_budget_exhausted(self):
+        """Test retries stop when the budget is empty"""
+        budget = get_retry_budget()
+        while budget.withdraw():
+            pass
+        fn = FlakyCall(_error('connection'))
+        with self.assertRaises(EmotionDetectionError):
+            call_with_retry(fn, 'text')
+        self.assertEqual(len(fn.timeouts), 1)
+        self.assertEqual(
+            metrics.get_value(metrics.RETRY_BUDGET_EXHAUSTED, 'retry'), 1)
+
+    def test_deadline_bounds_attempt_timeouts(self):
+        """Test no attempt may outlive the deadline"""
+        fn = FlakyCall(_error('timeout'))
+        with patch.object(config, 'RETRY_DEADLINE', 2), \
+                patch.object(config, 'REQUEST_TIMEOUT', 10):
+            self.assertEqual(call_with_retry(fn, 'text'), 'ok')
+        self.assertTrue(all(timeout <= 2 for timeout in fn.timeouts))
+
+    def test_deadline_stops_retries(self):
+        """Test no retry starts when the backoff would pass the deadline"""
+        fn = FlakyCall(_error('timeout'))
+        with patch.object(config, 'RETRY_DEADLINE', 0.2), \
+                patch.object(config, 'RETRY_BASE_DELAY', 1), \
+                patch('EmotionDetection.retry.random.uniform',
+                      return_value=1):
+            with self.assertRaises(EmotionDetectionError):
+                call_with_retry(fn, 'text')
+        self.assertEqual(len(fn.timeouts), 1)
+
+
+class TestHedging(RetryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for name, value in (('HEDGE_ENABLED', True),
+                            ('HEDGE_DEFAULT_DELAY', 0.05)):
+            patcher = patch.object(config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_hedge_wins_over_slow_request(self):
+        """Test the hedge's faster answer is returned without waiting"""
+        release = threading.Event()
+        self.addCleanup(release.set)
+        calls = []
+
+        def fn(text, timeout):
+            calls.append(text)
+            if len(calls) == 1:
+                release.wait(2)
+                return 'slow'
+            return 'fast'
+
+        start = time.perf_counter()
+        self.assertEqual(call_with_retry(fn, 'text'), 'fast')
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(metrics.get_value(metrics.UPSTREAM_HEDGES, 'sent'), 1)
+
+    def test_hedge_answers_when_slow_request_fails(self):
+        """Test a failed first request leaves the hedge to answer"""
+        hedged = threading.Event()
+        calls = []
+
+        def fn(text, timeout):
+            calls.append(text)
+            if len(calls) == 1:
+                hedged.wait(5)
+                raise _error('timeout')
+            hedged.set()
+            time.sleep(0.05)
+            return 'hedge'
+
+        self.assertEqual(call_with_retry(fn, 'text'), 'hedge')
+        self.assertEqual(len(calls), 2)
+
+    def test_busy_pool_runs_request_inline(self):
+        """Test a saturated pool neither delays the request nor hedges it"""
+        calls = []
+
+        def fn(text, timeout):
+            calls.append(threading.current_thread())
+            time.sleep(0.1)
+            return 'ok'
+
+        retry._get_hedge_pool()
+        with patch('EmotionDetection.retry._hedge_slots',
+                   threading.Semaphore(0)):
+            self.assertEqual(call_with_retry(fn, 'text'), 'ok')
+        self.assertEqual(calls, [threading.current_thread()])
+        self.assertIsNone(metrics.get_value(metrics.UPSTREAM_HEDGES, 'sent'))
+        self.assertEqual(
+            metrics.get_value(metrics.UPSTREAM_HEDGES, 'skipped'), 1)
+
+    def test_fast_request_not_hedged(self):
+        """Test no hedge is sent before the hedge delay"""
+        fn = FlakyCall()
+        self.assertEqual(call_with_retry(fn, 'text'), 'ok')
+        self.assertEqual(len(fn.timeouts), 1)
+        self.assertIsNone(metrics.get_value(metrics.UPSTREAM_HEDGES, 'sent'))
+
+    def test_async_hedge_cancels_loser(self):
+        """Test the slower async request is cancelled"""
+        cancelled = []
+
+        async def fn(text, timeout):
+            if not cancelled:
+                cancelled.append(False)
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled[0] = True
+                    raise
+                return 'slow'
+            return 'fast'
+
+        result = asyncio.run(call_with_retry_async(fn, 'text'))
+        self.assertEqual(result, 'fast')
+        self.assertEqual(cancelled, [True])
+
+
+@patch('EmotionDetection.http_pool.get_session')
+class TestWatsonRetries(RetryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        clear_cache()
+        get_breaker().reset()
+
+    def test_transient_upstream_error_recovers(self, mock_get_session):
+        """Test a dropped connection does not reach the user"""
+        ok = requests.Response()
+        ok.status_code = 200
+        ok._content = WATSON_OK.encode('utf-8')
+        mock_get_session.return_value.post.side_effect = [
+            requests.ConnectionError('reset'), ok]
+
+        result = emotion_detector("I am glad")
+        self.assertEqual(result['dominant_emotion'], 'joy')
+        self.assertEqual(mock_get_session.return_value.post.call_count, 2)
@@ -0,0 +1,57 @@
+# test_serving.py
+# Unit tests for the production serving configuration
+
+import os
+import runpy
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+
+class TestGunicornConfig(unittest.TestCase):
+
+    def _load(self, **env):
+        # Point the config at a directory the test owns; left unset, it
+        # would create one that only gunicorn's on_exit removes
+        metrics_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(metrics_dir.cleanup)
+        env.setdefault('EMOTION_METRICS_DIR', metrics_dir.name)
+        with patch.dict(os.environ, env):
+            return runpy.run_path('gunicorn.conf.py')
+
+    def test_environment_overrides(self):
+        """Test workers, threads and recycling come from the environment"""
+        settings = self._load(PORT='8123', WEB_CONCURRENCY='4',
+                              GUNICORN_THREADS='16',
+                              GUNICORN_MAX_REQUESTS='500')
+        self.assertEqual(settings['bind'], '0.0.0.0:8123')
+        self.assertEqual(settings['workers'], 4)
+        self.assertEqual(settings['threads'], 16)
+        self.assertEqual(settings['worker_class'], 'gthread')
+        self.assertEqual(settings['max_requests'], 500)
+
+    def test_access_log_can_be_disabled(self):
+        """Test an empty GUNICORN_ACCESS_LOG turns access logging off"""
+        self.assertIsNone(self._load(GUNICORN_ACCESS_LOG='')['accesslog'])
+
+    def test_own_metrics_dir_removed_on_exit(self):
+        """Test a metrics directory the config created is removed on exit"""
+        with patch.dict(os.environ):
+            os.environ.pop('EMOTION_METRICS_DIR', None)
+            settings = runpy.run_path('gunicorn.conf.py')
+            metrics_dir = os.environ['EMOTION_METRICS_DIR']
+            self.addCleanup(shutil.rmtree, metrics_dir, True)
+            self.assertTrue(os.path.isdir(metrics_dir))
+            settings['on_exit'](None)
+        self.assertFalse(os.path.exists(metrics_dir))
+
+    def test_wsgi_entry_point(self):
+        """Test wsgi:app is the Flask application"""
+        from wsgi import app
+        self.assertIn('/emotionDetector',
+                      [rule.rule for rule in app.url_map.iter_rules()])
+
+
+if __name__ == '__main__':
+    unittest.main()
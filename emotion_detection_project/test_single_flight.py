@@ -0,0 +1,177 @@
+# test_single_flight.py
+# Unit tests for request coalescing of identical in-flight texts
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+from EmotionDetection import config, emotion_detector, single_flight
+from EmotionDetection.async_detector import async_emotion_detector
+from EmotionDetection.circuit_breaker import get_breaker
+from EmotionDetection.single_flight import AsyncSingleFlight, SingleFlight
+from EmotionDetection.status import get_status
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def _run_concurrently(self, group, fn, callers=10):
+        """Call group.do from several threads at once"""
+        results, errors = [], []
+        barrier = threading.Barrier(callers)
+
+        def caller():
+            barrier.wait()
+            try:
+                results.append(group.do('key', fn))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=caller) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_callers_share_one_call(self):
+        """Test concurrent callers trigger a single call"""
+        group = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'value'
+
+        results, _ = self._run_concurrently(group, slow)
+
+        self.assertEqual(results, ['value'] * 10)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(group.stats()['saved'], 9)
+
+    def test_errors_propagate_and_are_not_cached(self):
+        """Test every waiter sees the error and the next call retries"""
+        group = SingleFlight()
+
+        def failing():
+            time.sleep(0.05)
+            raise ValueError('boom')
+
+        _, errors = self._run_concurrently(group, failing)
+        self.assertEqual(len(errors), 10)
+        self.assertEqual(group.do('key', lambda: 'ok'), 'ok')
+        self.assertEqual(group.stats()['in_flight'], 0)
+
+    def test_async_callers_share_one_call(self):
+        """Test concurrent coroutines share one awaited call"""
+        group = AsyncSingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'value'
+
+        async def many():
+            return await asyncio.gather(*(group.do('key', slow)
+                                          for _ in range(10)))
+
+        self.assertEqual(asyncio.run(many()), ['value'] * 10)
+        self.assertEqual(len(calls), 1)
+
+    def test_async_call_outlives_one_cancelled_waiter(self):
+        """Test cancelling one waiter leaves the shared call running"""
+        group = AsyncSingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return 'value'
+
+        async def scenario():
+            leaving = asyncio.ensure_future(group.do('key', slow))
+            staying = asyncio.ensure_future(group.do('key', slow))
+            await asyncio.sleep(0.01)
+            leaving.cancel()
+            return await staying
+
+        self.assertEqual(asyncio.run(scenario()), 'value')
+
+    def test_async_call_cancelled_with_last_waiter(self):
+        """Test the shared call stops once every waiter is cancelled"""
+        group = AsyncSingleFlight()
+        cancelled = []
+
+        async def slow():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return 'stale'
+
+        async def fast():
+            return 'fresh'
+
+        async def scenario():
+            waiters = [asyncio.ensure_future(group.do('key', slow))
+                       for _ in range(2)]
+            await asyncio.sleep(0.01)
+            for waiter in waiters:
+                waiter.cancel()
+            await asyncio.gather(*waiters, return_exceptions=True)
+            await asyncio.sleep(0)
+            self.assertEqual(group.stats()['in_flight'], 0)
+            # A later caller starts a new call instead of joining the old one
+            return await group.do('key', fast)
+
+        self.assertEqual(asyncio.run(scenario()), 'fresh')
+        self.assertEqual(cancelled, [True])
+
+    @patch('EmotionDetection.http_pool.get_session')
+    def test_emotion_detector_coalesces(self, mock_get_session):
+        """Test identical concurrent texts make one upstream call"""
+        get_breaker().reset()
+        def post(url, json, headers, timeout):
+            time.sleep(0.05)
+            response = MagicMock()
+            response.status_code = 200
+            response.text = ('{"emotionPredictions": [{"emotion": {'
+                             '"anger": 0.01, "disgust": 0.02, "fear": 0.03, '
+                             '"joy": 0.9, "sadness": 0.04}}]}')
+            return response
+        mock_get_session.return_value.post.side_effect = post
+
+        results = []
+        with patch.object(config, 'CACHE_ENABLED', False):
+            threads = [threading.Thread(
+                target=lambda: results.append(emotion_detector("viral")))
+                for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(r['dominant_emotion'] == 'joy' for r in results))
+        self.assertEqual(mock_get_session.return_value.post.call_count, 1)
+
+    def test_status_reports_async_group(self):
+        """Test /status counts the coalescing done on the event loop"""
+        async def many():
+            return await asyncio.gather(*(
+                async_emotion_detector("I am glad") for _ in range(4)))
+
+        with patch.object(config, 'BACKEND', 'local'), \
+                patch.object(config, 'CACHE_ENABLED', False), \
+                patch.object(single_flight, '_async_group',
+                             AsyncSingleFlight()):
+            asyncio.run(many())
+            status = get_status()
+        self.assertEqual(status['async_single_flight'],
+                         {'calls': 1, 'saved': 3, 'in_flight': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+# test_tracing.py
+# Unit tests for request tracing, Server-Timing and the slow-request profiler
+
+import asyncio
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from EmotionDetection import config, tracing
+from EmotionDetection.cache import clear_cache
+from EmotionDetection.circuit_breaker import get_breaker
+from server import app
+from server_async import create_app
+
+WATSON_OK = ('{"emotionPredictions": [{"emotion": {"anger": 0.01, '
+             '"disgust": 0.02, "fear": 0.03, "joy": 0.9, "sadness": 0.04}}]}')
+
+
+class TestTrace(unittest.TestCase):
+
+    def test_span_is_noop_outside_trace(self):
+        """Test spans cost nothing when no request is traced"""
+        self.assertIsNone(tracing.current_trace())
+        with tracing.span('upstream') as span:
+            self.assertIsNone(span)
+
+    def test_spans_are_summed(self):
+        """Test repeated spans add up and appear in Server-Timing"""
+        trace, token = tracing.start_trace('req-1')
+        try:
+            with tracing.span('upstream'):
+                pass
+            with tracing.span('upstream'):
+                pass
+            self.assertEqual(trace.spans['upstream'][1], 2)
+            self.assertEqual(tracing.current_request_id(), 'req-1')
+        finally:
+            tracing.finish_trace(token)
+        self.assertIsNone(tracing.current_trace())
+        header = trace.server_timing()
+        self.assertRegex(header, r'^upstream;dur=\d+\.\d\d, total;dur=\d+\.\d\d$')
+
+    def test_concurrent_spans_are_not_lost(self):
+        """Test threads sharing a trace (document chunks) all add up"""
+        trace = tracing.Trace('req-1')
+        switch = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                for _ in range(8):
+                    pool.submit(lambda: [trace.add('upstream', 1.0)
+                                         for _ in range(2000)])
+        finally:
+            sys.setswitchinterval(switch)
+        self.assertEqual(trace.spans['upstream'], [16000.0, 16000])
+
+    def test_request_id_validation(self):
+        """Test malformed incoming request IDs are replaced"""
+        self.assertEqual(tracing.request_id_from('abc-123'), 'abc-123')
+        for bad in (None, '', 'has space', 'x' * 200, 'new\nline'):
+            generated = tracing.request_id_from(bad)
+            self.assertRegex(generated, r'^[0-9a-f]{32}$')
+
+
+@patch('EmotionDetection.http_pool.get_session')
+class TestFlaskTracing(unittest.TestCase):
+
+    def setUp(self):
+        clear_cache()
+        get_breaker().reset()
+        self.client = app.test_client()
+
+    def _respond(self, mock_get_session):
+        response = mock_get_session.return_value.post.return_value
+        response.status_code = 200
+        response.text = WATSON_OK
+
+    def test_headers_and_propagation(self, mock_get_session):
+        """Test the request ID is echoed, forwarded upstream and timed"""
+        self._respond(mock_get_session)
+        response = self.client.get(
+            '/emotionDetector?textToAnalyze=I%20am%20glad',
+            headers={'X-Request-ID': 'abc-123'})
+
+        self.assertEqual(response.headers['X-Request-ID'], 'abc-123')
+        timing = response.headers['Server-Timing']
+        for name in ('validate', 'cache', 'upstream', 'parse', 'format',
+                     'render', 'total'):
+            self.assertIn(f'{name};dur=', timing)
+        upstream_headers = mock_get_session.return_value.post.call_args[1]['headers']
+        self.assertEqual(upstream_headers['X-Request-ID'], 'abc-123')
+
+    def test_structured_log(self, mock_get_session):
+        """Test each request is logged as one JSON line"""
+        self._respond(mock_get_session)
+        with self.assertLogs('EmotionDetection.tracing', 'INFO') as logs:
+            self.client.get('/emotionDetector?textToAnalyze=hello')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['route'], '/emotionDetector')
+        self.assertEqual(record['status'], 200)
+        self.assertIn('upstream', record['spans'])
+        self.assertRegex(record['request_id'], r'^[0-9a-f]{32}$')
+
+    def test_tracing_disabled(self, mock_get_session):
+        """Test no headers are added when tracing is off"""
+        self._respond(mock_get_session)
+        with patch.object(config, 'TRACING_ENABLED', False):
+            response = self.client.get('/emotionDetector?textToAnalyze=hi')
+        self.assertNotIn('Server-Timing', response.headers)
+        self.assertNotIn('X-Request-ID',
+                         mock_get_session.return_value.post.call_args[1]['headers'])
+
+    def test_profiler_keeps_slowest(self, mock_get_session):
+        """Test sampled requests keep only the slowest N profiles"""
+        self._respond(mock_get_session)
+        with tempfile.TemporaryDirectory() as directory:
+            recorder = tracing.SlowestRequests(2, directory)
+            with patch.object(tracing, '_profiler', recorder), \
+                    patch.object(config, 'TRACE_PROFILE_SAMPLE_RATE', 1.0):
+                for i in range(4):
+                    self.client.get(f'/emotionDetector?textToAnalyze=text{i}')
+            slowest = recorder.slowest()
+            self.assertEqual(len(slowest), 2)
+            self.assertGreaterEqual(slowest[0]['duration_ms'],
+                                    slowest[1]['duration_ms'])
+            self.assertEqual(sorted(os.listdir(directory)),
+                             sorted(os.path.basename(entry['profile'])
+                                    for entry in slowest))
+
+
+class TestAsyncTracing(unittest.TestCase):
+
+    def test_headers(self):
+        """Test the aiohttp server echoes request IDs and sends Server-Timing"""
+        clear_cache()
+
+        async def run():
+            async with TestClient(TestServer(create_app())) as client:
+                response = await client.get(
+                    '/emotionDetector?textToAnalyze=I%20am%20glad',
+                    headers={'X-Request-ID': 'async-1'})
+                self.assertEqual(response.headers['X-Request-ID'], 'async-1')
+                self.assertIn('score;dur=', response.headers['Server-Timing'])
+                self.assertIn('render;dur=', response.headers['Server-Timing'])
+
+        with patch.object(config, 'BACKEND', 'local'):
+            asyncio.run(run())
+
+
+class TestTraceLogging(unittest.TestCase):
+
+    def setUp(self):
+        logger = tracing.logger
+        saved = (logger.level, logger.propagate, list(logger.handlers))
+
+        def restore():
+            logger.setLevel(saved[0])
+            logger.propagate = saved[1]
+            logger.handlers[:] = saved[2]
+
+        self.addCleanup(restore)
+        logger.setLevel(logging.NOTSET)
+
+    def test_lines_written_without_logging_setup(self):
+        """Test trace lines reach the output when nothing configured logging"""
+        stream = io.StringIO()
+        with patch.object(logging.root, 'handlers', []), \
+                patch.object(logging.root, 'level', logging.WARNING):
+            tracing.configure_logging(stream)
+            trace, token = tracing.start_trace('abc-123')
+            tracing.finish_trace(token)
+            tracing.log_trace(trace, route='/emotionDetector')
+        self.assertEqual(json.loads(stream.getvalue())['request_id'],
+                         'abc-123')
+
+    def test_level_setting(self):
+        """Test EMOTION_TRACE_LOG_LEVEL silences the lines"""
+        with patch.object(logging.root, 'handlers', [logging.NullHandler()]), \
+                patch.object(config, 'TRACE_LOG_LEVEL', 'WARNING'):
+            tracing.configure_logging()
+        self.assertFalse(tracing.logger.isEnabledFor(logging.INFO))
+        # Applications with their own logging setup keep their handlers
+        self.assertEqual(tracing.logger.handlers, [])
+
+
+if __name__ == '__main__':
+    unittest.main()